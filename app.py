@@ -4,18 +4,28 @@
 import streamlit as st
 from datetime import datetime
 import os
-import pandas as pd
+import json
 import math # Importato math per math.floor
+import random
+import tempfile
+import uuid
 
 # Importa funzioni e costanti dai moduli separati
-from localization import TEXTS, get_text, format_text
+from localization import TEXTS, get_text, format_text, get_pdf_strings
 from config import (
-    DEFAULT_NUM_TESTS, EXAMPLE_IMAGE_PATH, ANALYSIS_IMAGE_PATH
+    DEFAULT_NUM_TESTS, EXAMPLE_IMAGE_PATH, ANALYSIS_IMAGE_PATH,
+    DEFAULT_RECENCY_WEIGHTING, DEFAULT_RECENCY_HALF_LIFE, DEFAULT_SAMPLING_MODE,
+    VALIDATION_MONTE_CARLO_RUNS, VALIDATION_JOB_MAX_WORKERS,
+    PDF_RENDER_MODE, PDF_RENDER_MAX_WORKERS, PDF_STREAM_MIN_COPIES, PDF_STREAM_OUTPUT_FORMAT, JOB_POLL_SECONDS
 )
 from file_handler import load_questions_from_excel
-from core_logic import generate_all_tests_data
-from test import run_all_tests
-from pdf_generator import generate_pdf_data, WEASYPRINT_AVAILABLE
+from parse_cache import content_hash
+from core_logic import generate_all_tests_data, new_seed
+from pdf_generator import generate_pdf_data, generate_pdf_file, weasyprint_available
+from jobs import JOB_MANAGER, JOB_PENDING
+from similarity_model import expected_dice_by_distance, expected_dice_table
+from seating import grid_adjacency
+from instrumentation import Profiler
 
 # ================================================================
 # Stato Sessione e Logica Lingua / Session State and Language Logic
@@ -26,6 +36,12 @@ if 'all_questions' not in st.session_state: st.session_state.all_questions = Non
 if 'block_requests' not in st.session_state: st.session_state.block_requests = {}
 if 'action_performed' not in st.session_state: st.session_state.action_performed = False
 if 'processed_filename' not in st.session_state: st.session_state.processed_filename = None
+if 'processed_file_hash' not in st.session_state: st.session_state.processed_file_hash = None
+if 'processed_file_id' not in st.session_state: st.session_state.processed_file_id = None
+if 'parse_profile' not in st.session_state: st.session_state.parse_profile = None
+if 'session_job_key' not in st.session_state: st.session_state.session_job_key = uuid.uuid4().hex
+if 'generation_job_id' not in st.session_state: st.session_state.generation_job_id = None
+if 'validation_job_id' not in st.session_state: st.session_state.validation_job_id = None
 
 def T(key): return get_text(st.session_state.lang, key)
 def F(key, **kwargs): kwargs = kwargs or {}; return format_text(st.session_state.lang, key, **kwargs)
@@ -53,7 +69,7 @@ with col_lang_en:
 # ================================================================
 st.title(T("MAIN_TITLE"))
 st.subheader(T("SUBHEADER_NEW"))
-if not WEASYPRINT_AVAILABLE: st.error(T("WEASYPRINT_ERROR")); st.stop()
+if not weasyprint_available(): st.error(T("WEASYPRINT_ERROR")); st.stop()
 
 # ================================================================
 # Istruzioni (Espandibili) / Instructions (Expandable)
@@ -93,11 +109,23 @@ def sidebar_status_callback(msg_type, msg_key, **kwargs):
      elif msg_type == "error": sidebar_status_placeholder.error(formatted_text)
 
 if uploaded_file is not None:
-    if st.session_state.processed_filename != uploaded_file.name:
-        all_q, blocks_sum, error_k = load_questions_from_excel(uploaded_file, sidebar_status_callback)
+    # Stesso caricamento del rerun precedente (file_id): nessun hash. Altrimenti rianalizza solo se cambia
+    # il contenuto (non il nome): l'hash è anche la chiave della cache condivisa
+    uploaded_file_id = getattr(uploaded_file, 'file_id', None) or (uploaded_file.name, uploaded_file.size)
+    uploaded_hash = st.session_state.processed_file_hash
+    if st.session_state.processed_file_id != uploaded_file_id:
+        uploaded_hash = content_hash(uploaded_file)
+        # Stesso contenuto ricaricato: basta ricordare il nuovo file_id
+        if st.session_state.processed_file_hash == uploaded_hash: st.session_state.processed_file_id = uploaded_file_id
+    if st.session_state.processed_file_hash != uploaded_hash:
+        parse_profiler = Profiler(metadata={'file': uploaded_file.name})
+        all_q, blocks_sum, error_k = load_questions_from_excel(uploaded_file, sidebar_status_callback,
+                                                               file_hash=uploaded_hash, profiler=parse_profiler)
         if error_k:
             st.session_state.all_questions = None; st.session_state.blocks_summary = None
             st.session_state.block_requests = {}; st.session_state.processed_filename = None
+            st.session_state.processed_file_hash = None; st.session_state.processed_file_id = None
+            st.session_state.parse_profile = None
         else:
             st.session_state.all_questions = all_q; st.session_state.blocks_summary = blocks_sum
             # MODIFICA 1: Imposta il valore predefinito a floor(n/3)
@@ -106,9 +134,14 @@ if uploaded_file is not None:
                 for b in blocks_sum
             }
             st.session_state.processed_filename = uploaded_file.name
+            st.session_state.processed_file_hash = uploaded_hash
+            st.session_state.processed_file_id = uploaded_file_id
+            st.session_state.parse_profile = parse_profiler.to_dict() # Incluso nel profilo delle generazioni
 elif st.session_state.processed_filename is not None:
      st.session_state.all_questions = None; st.session_state.blocks_summary = None
      st.session_state.block_requests = {}; st.session_state.processed_filename = None
+     st.session_state.processed_file_hash = None; st.session_state.processed_file_id = None
+     st.session_state.parse_profile = None
      sidebar_status_placeholder.empty()
 
 total_questions_requested = 0
@@ -178,7 +211,38 @@ if st.session_state.blocks_summary:
 
 st.sidebar.markdown("---")
 subject_name = st.sidebar.text_input(T("SUBJECT_LABEL"), value=T("SUBJECT_DEFAULT"), help=T("SUBJECT_HELP"))
-num_tests_input = st.sidebar.number_input(T("NUM_TESTS_LABEL"), min_value=1, value=DEFAULT_NUM_TESTS, step=1, help=T("NUM_TESTS_HELP"))
+sampling_mode_options = ["sequential", "global", "seating"]
+sampling_mode_input = st.sidebar.radio(
+    T("SAMPLING_MODE_LABEL"), options=sampling_mode_options, index=sampling_mode_options.index(DEFAULT_SAMPLING_MODE),
+    format_func=lambda mode: T(f"SAMPLING_MODE_OPTION_{mode.upper()}"), help=T("SAMPLING_MODE_HELP")
+)
+seating_input = None
+if sampling_mode_input == "seating":
+    # Aula a griglia: la copia n va al posto n (per file), il numero di copie è quello dei posti
+    seating_col1, seating_col2 = st.sidebar.columns(2)
+    seating_rows = seating_col1.number_input(T("SEATING_ROWS_LABEL"), min_value=1, max_value=100, value=5, step=1)
+    seating_cols = seating_col2.number_input(T("SEATING_COLS_LABEL"), min_value=1, max_value=100, value=6, step=1)
+    seating_diagonal = st.sidebar.checkbox(T("SEATING_DIAGONAL_LABEL"), value=True, help=T("SEATING_DIAGONAL_HELP"))
+    seating_input = grid_adjacency(int(seating_rows), int(seating_cols), seating_diagonal)
+    num_tests_input = len(seating_input)
+    st.sidebar.caption(F("SEATING_NUM_TESTS_NOTE", num_tests=num_tests_input))
+else:
+    num_tests_input = st.sidebar.number_input(T("NUM_TESTS_LABEL"), min_value=1, value=DEFAULT_NUM_TESTS, step=1, help=T("NUM_TESTS_HELP"))
+recency_options = ["exponential", "linear", "none"]
+recency_weighting_input, recency_half_life_input = DEFAULT_RECENCY_WEIGHTING, DEFAULT_RECENCY_HALF_LIFE
+if sampling_mode_input == "sequential":
+    recency_weighting_input = st.sidebar.selectbox(
+        T("RECENCY_LABEL"), options=recency_options, index=recency_options.index(DEFAULT_RECENCY_WEIGHTING),
+        format_func=lambda mode: T(f"RECENCY_OPTION_{mode.upper()}"), help=T("RECENCY_HELP")
+    )
+    if recency_weighting_input == "exponential":
+        recency_half_life_input = st.sidebar.number_input(
+            T("HALF_LIFE_LABEL"), min_value=0.5, value=float(DEFAULT_RECENCY_HALF_LIFE), step=0.5, help=T("HALF_LIFE_HELP")
+        )
+else:
+    st.sidebar.caption(T("SAMPLING_MODE_RECENCY_NOTE"))
+seed_input = st.sidebar.text_input(T("SEED_LABEL"), value="", help=T("SEED_HELP"))
+copies_input = st.sidebar.text_input(T("COPIES_LABEL"), value="", help=T("COPIES_HELP"))
 generate_button = st.sidebar.button(T("GENERATE_BUTTON_LABEL"), type="primary", use_container_width=True)
 
 st.sidebar.markdown("---")
@@ -189,6 +253,51 @@ validation_button = st.sidebar.button(
     use_container_width=True
 )
 
+# ================================================================
+# Modello Analitico di Similarità / Analytic Similarity Model
+# ================================================================
+# Dice atteso esatto (pesi uniformi, recency "none"): istantaneo, il Monte Carlo del test funzionale resta come verifica
+ANALYTIC_MAX_CURVES = 12
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def cached_expected_dice(block_shapes, max_distance):
+    """expected_dice_by_distance in cache per forme dei blocchi (tupla di (n, k)) e distanza massima."""
+    return expected_dice_by_distance(block_shapes, max_distance)
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def cached_expected_dice_table(n, k_values, max_distance):
+    """expected_dice_table in cache per (n, valori di k, distanza massima)."""
+    return expected_dice_table(n, k_values, max_distance)
+
+# on_change="rerun": il contenuto viene eseguito solo con l'espansore aperto, non a ogni rerun della pagina
+analytic_expander = st.expander(T("ANALYTIC_EXPANDER"), expanded=False, key="analytic_expander", on_change="rerun")
+if analytic_expander.open:
+    with analytic_expander:
+        st.markdown(T("ANALYTIC_INTRO"))
+        if recency_weighting_input != "none": st.caption(T("ANALYTIC_RECENCY_NOTE"))
+        analytic_col1, analytic_col2 = st.columns(2)
+        analytic_block_size = analytic_col1.number_input(T("ANALYTIC_BLOCK_SIZE_LABEL"), min_value=2, max_value=1000, value=12, step=1)
+        analytic_max_distance = analytic_col2.number_input(T("ANALYTIC_MAX_DISTANCE_LABEL"), min_value=1, max_value=200,
+                                                           value=max(1, min(14, num_tests_input - 1)), step=1)
+        analytic_curves = {}
+        # Richieste attuali sulla banca caricata (blocchi di dimensioni diverse)
+        if st.session_state.blocks_summary:
+            current_shapes = [(b['count'], st.session_state.block_requests.get(b['block_id'], 0)) for b in st.session_state.blocks_summary]
+            current_dice = cached_expected_dice(tuple((n, k) for n, k in current_shapes if k <= n), analytic_max_distance)
+            if current_dice:
+                st.markdown(F("ANALYTIC_CURRENT_REQUESTS", dice_1=current_dice[1], dice_2=current_dice.get(2, current_dice[1])))
+                analytic_curves[T("ANALYTIC_CURRENT_SERIES")] = current_dice
+        if st.toggle(T("ANALYTIC_SHOW_CHART")):
+            # Curve per un blocco di analytic_block_size domande, al più ANALYTIC_MAX_CURVES valori di k (solo per il grafico)
+            k_values = tuple(sorted({max(1, round(i * (analytic_block_size - 1) / ANALYTIC_MAX_CURVES))
+                                     for i in range(1, ANALYTIC_MAX_CURVES + 1)}))
+            for k, dice_by_distance in cached_expected_dice_table(analytic_block_size, k_values, analytic_max_distance).items():
+                analytic_curves[f"k={k}"] = dice_by_distance
+            import pandas as pd # Solo per il grafico: non caricato all'avvio
+            chart_data = pd.DataFrame(analytic_curves)
+            chart_data.index.name = T("ANALYTIC_DISTANCE_AXIS")
+            st.line_chart(chart_data, x_label=T("ANALYTIC_DISTANCE_AXIS"), y_label=T("ANALYTIC_DICE_AXIS"))
+
 # ================================================================
 # Area Output Principale e Gestione Messaggi / Main Output Area and Message Handling
 # ================================================================
@@ -224,64 +333,237 @@ def status_callback(msg_type, msg_key, **kwargs):
      display_critical_message(msg_type, msg_key, **kwargs)
 
 
+# ================================================================
+# Job in Background / Background Jobs
+# ================================================================
+# Generazione e validazione girano nel JobManager condiviso: la sessione conserva solo i job_id,
+# quindi un rerun (secondo click, widget modificato) non interrompe il lavoro né perde il risultato.
+session_job_key = st.session_state.session_job_key
+
+def run_validation_job(job, num_monte_carlo_runs, recency_weighting, recency_half_life):
+    """
+    Job di validazione con la pesatura di recenza scelta nella sidebar: Excel dei risultati
+    in una cartella temporanea propria del job (con "none" il Monte Carlo verifica il modello analitico).
+    Il pool di processi è limitato a VALIDATION_JOB_MAX_WORKERS: più sessioni possono validare insieme.
+    """
+    # Import al primo utilizzo: il modulo di validazione carica NumPy e pandas
+    from test import run_all_tests, OUTPUT_EXCEL_FILE
+    output_dir = tempfile.mkdtemp(prefix="verifiche_validazione_")
+    job.cleanup_paths.append(output_dir)
+    test_results, excel_file_created = run_all_tests(job.status_callback, num_monte_carlo_runs=num_monte_carlo_runs,
+                                                     max_workers=VALIDATION_JOB_MAX_WORKERS,
+                                                     output_excel_file=os.path.join(output_dir, OUTPUT_EXCEL_FILE),
+                                                     recency_weighting=recency_weighting, recency_half_life=recency_half_life)
+    return {'messages': test_results, 'excel_file': excel_file_created}
+
+def run_generation_job(job, all_questions, block_requests, num_tests, recency_weighting, recency_half_life,
+                       generation_seed, copy_numbers, subject, pdf_strings, parse_profile=None, sampling_mode=DEFAULT_SAMPLING_MODE,
+                       seating=None):
+    """
+    Job di generazione: campionamento delle verifiche e rendering del PDF (o del file per i lotti grandi).
+    Tempi per fase e contatori sono raccolti in un Profiler (job.profiler, letto dalla barra di avanzamento)
+    ed esportati nel risultato come profilo JSON, insieme a quello dell'analisi del file (parse_profile).
+    """
+    pdf_generated = False; pdf_data = None; final_generation_messages = []
+    pdf_output_path = None; pdf_output_format = "pdf"
+    num_copies_to_render = len(copy_numbers) if copy_numbers else num_tests
+    streamed = num_copies_to_render >= PDF_STREAM_MIN_COPIES
+    profiler = Profiler(run_id=job.job_id, metadata={
+        'num_tests': num_tests, 'num_copies': num_copies_to_render, 'seed': generation_seed,
+        'block_requests': {str(block_id): k for block_id, k in block_requests.items()},
+        'recency_weighting': recency_weighting, 'recency_half_life': recency_half_life, 'sampling_mode': sampling_mode,
+        'render_mode': PDF_RENDER_MODE, 'streamed': streamed, 'parse': parse_profile,
+    })
+    job.profiler = profiler
+    status_callback = profiler.wrap_callback(job.status_callback) # Warning/error e avanzamento raccolti nel job
+    try:
+        all_tests_data, generation_messages = generate_all_tests_data(
+            all_questions,
+            block_requests,
+            num_tests,
+            status_callback,
+            recency_weighting=recency_weighting,
+            recency_half_life=recency_half_life,
+            rng=random.Random(generation_seed),
+            profiler=profiler,
+            sampling_mode=sampling_mode,
+            seating=seating
+        )
+        final_generation_messages.extend(generation_messages) # Accumula tutti i messaggi
+
+        if all_tests_data is None: # Se la generazione dei dati fallisce criticamente
+            # Cerca un messaggio di errore specifico tra quelli raccolti
+            error_msg_from_core = next((m[1] for m in generation_messages if m[0] == 'error'), "Test data generation failed.")
+            raise ValueError(error_msg_from_core)
+
+        if streamed:
+            # Lotti grandi: una copia alla volta su file temporaneo (memoria costante)
+            pdf_output_path, pdf_output_format = generate_pdf_file(
+                all_tests_data, subject, status_callback, pdf_strings,
+                seed=generation_seed, copy_numbers=copy_numbers, output_format=PDF_STREAM_OUTPUT_FORMAT,
+                profiler=profiler)
+            if pdf_output_path: job.cleanup_paths.append(pdf_output_path)
+            pdf_data = pdf_output_path
+        else:
+            pdf_data = generate_pdf_data(all_tests_data, subject, status_callback, pdf_strings,
+                                         seed=generation_seed, copy_numbers=copy_numbers,
+                                         render_mode=PDF_RENDER_MODE, max_workers=PDF_RENDER_MAX_WORKERS,
+                                         profiler=profiler)
+
+        if pdf_data is None: # Se la generazione PDF fallisce
+            # Cerca un messaggio di errore specifico (es. da WeasyPrint)
+            _, _, job_messages = job.snapshot()
+            error_msg_from_pdf = next((m[1] for m in job_messages if m[0] == 'error' and m[1].startswith("PG_")), "PDF generation failed.")
+            raise ValueError(error_msg_from_pdf)
+        pdf_generated = True
+
+    except ValueError as ve: # Cattura errori sollevati esplicitamente
+        msg_key_or_text = str(ve)
+        # Aggiungi il messaggio di errore alla lista solo se non è già presente (per evitare duplicati)
+        # o se è un messaggio generico di fallimento.
+        is_known_key = msg_key_or_text in TEXTS['it'] or msg_key_or_text in TEXTS['en']
+        if not any(m[1] == msg_key_or_text for m in final_generation_messages):
+            if is_known_key:
+                final_generation_messages.append(("error", msg_key_or_text, {}))
+            else: # Messaggio di errore generico
+                final_generation_messages.append(("error", "GENERATION_FAILED_ERROR", {"error": msg_key_or_text}))
+    except Exception as e: # Cattura altri errori imprevisti
+        error_details = str(e)
+        if not any(m[1] == "GENERATION_FAILED_ERROR" and m[2].get("error") == error_details for m in final_generation_messages):
+            final_generation_messages.append(("error", "GENERATION_FAILED_ERROR", {"error": error_details}))
+
+    return {
+        'messages': final_generation_messages, 'pdf_generated': pdf_generated, 'pdf_data': pdf_data,
+        'pdf_output_path': pdf_output_path, 'pdf_output_format': pdf_output_format,
+        'num_copies': num_copies_to_render, 'num_tests': num_tests, 'seed': generation_seed, 'subject': subject,
+        'profile': profiler.to_dict()
+    }
+
+def show_job_progress(job):
+    """Stato di un job in corso: una barra per ogni fase che ha riportato avanzamento."""
+    status, progress, job_messages = job.snapshot()
+    st.info(T("VALIDATION_LOGIC_SPINNER") if job.kind == "validation" else T("GENERATING_DATA_SPINNER"))
+    if status == JOB_PENDING: st.caption(T("JOB_QUEUED"))
+    current_phase = job.profiler.current_phase if job.profiler is not None else None
+    if current_phase: st.caption(F("JOB_CURRENT_PHASE", phase=current_phase))
+    for phase_key, (done, total) in progress.items():
+        st.progress(min(done / total, 1.0) if total else 0.0, text=F(phase_key, done=done, total=total))
+    critical_messages = [m for m in job_messages if m[0] in ("warning", "error")]
+    if critical_messages: display_critical_message(*critical_messages[-1][:2], **critical_messages[-1][2])
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def job_progress_fragment(job_id):
+    """Aggiorna solo questo frammento finché il job è in corso; alla fine riesegue l'app per mostrare il risultato."""
+    job = JOB_MANAGER.get(session_job_key, job_id)
+    if job is None: return
+    if job.finished: st.rerun()
+    show_job_progress(job)
+
+def show_validation_result(job):
+    """Risultati del test funzionale (messaggi e download dell'Excel) da un job concluso."""
+    if job.error is not None:
+        st.error(F("CL_VALIDATION_UNEXPECTED_ERROR", error=str(job.error)))
+        return
+    test_results, excel_file_created = job.result['messages'], job.result['excel_file']
+    st.markdown(f"**{T('VALIDATION_RESULTS_HEADER')}**")
+    if not test_results and not excel_file_created: # Nessun messaggio o file
+        st.warning(T("VALIDATION_NO_MESSAGES"))
+    elif test_results: # Ci sono messaggi da visualizzare
+        for msg_type, msg_key, msg_kwargs in test_results:
+            final_formatted_text = F(msg_key, **msg_kwargs)
+            if msg_type == "info": st.info(final_formatted_text)
+            elif msg_type == "warning": st.warning(final_formatted_text)
+            elif msg_type == "error": st.error(final_formatted_text)
+            elif msg_type == "success": st.success(final_formatted_text)
+            else: st.write(f"[{msg_type.upper()}] {final_formatted_text}") # Fallback per tipi non gestiti
+
+    # Bottone per scaricare l'Excel dei risultati statistici
+    if excel_file_created and os.path.exists(excel_file_created):
+        try:
+            with open(excel_file_created, "rb") as fp:
+                excel_bytes = fp.read()
+            st.download_button(
+                label=T("DOWNLOAD_STATS_EXCEL_LABEL"),
+                data=excel_bytes,
+                file_name=os.path.basename(excel_file_created),
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                help=T("DOWNLOAD_STATS_EXCEL_HELP"),
+                key=f"download_excel_{job.job_id}"
+            )
+        except Exception as e:
+            st.error(f"Errore lettura file Excel per download: {e}")
+
+def show_generation_result(job):
+    """Messaggi finali e bottone di download da un job di generazione concluso."""
+    if job.error is not None:
+        st.error(F("GENERATION_FAILED_ERROR", error=str(job.error)))
+        return
+    result = job.result
+    final_generation_messages = result['messages']
+    # Ultimo warning/error riportato durante il lavoro (come il messaggio temporaneo della versione sincrona)
+    _, _, job_messages = job.snapshot()
+    critical_messages = [m for m in job_messages if m[0] in ("warning", "error")]
+    if critical_messages: display_critical_message(*critical_messages[-1][:2], **critical_messages[-1][2])
+
+    if final_generation_messages:
+        st.markdown(f"**{T('GENERATION_MESSAGES_HEADER')}**")
+        for msg_type, msg_key, msg_kwargs in final_generation_messages:
+            final_formatted_text = F(msg_key, **msg_kwargs)
+            if msg_type == "warning": st.warning(final_formatted_text)
+            elif msg_type == "error": st.error(final_formatted_text)
+            # Non mostrare messaggi di successo qui, solo warning/error
+
+    if result['pdf_generated'] and result['pdf_data']:
+        st.success(T("PDF_SUCCESS")) # Messaggio di successo
+        st.info(F("PDF_SEED_INFO", seed=result['seed']))
+        pdf_output_format = result['pdf_output_format']
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        safe_filename_subject = "".join(c if c.isalnum() else "_" for c in result['subject'])
+        pdf_filename = f"Verifiche_{safe_filename_subject}_{result['num_tests']}tests_seed{result['seed']}_{timestamp}.{pdf_output_format}"
+        download_label = T("ZIP_DOWNLOAD_BUTTON_LABEL") if pdf_output_format == "zip" else T("PDF_DOWNLOAD_BUTTON_LABEL")
+        download_mime = "application/zip" if pdf_output_format == "zip" else "application/pdf"
+        download_kwargs = dict(
+            label=download_label, file_name=pdf_filename, mime=download_mime,
+            help=F("PDF_DOWNLOAD_BUTTON_HELP", pdf_filename=pdf_filename),
+            use_container_width=True, type="primary", key=f"download_pdf_{job.job_id}"
+        )
+        if result['pdf_output_path']:
+            st.info(F("PDF_STREAMED_INFO", num_copies=result['num_copies']))
+            # Servito dal file temporaneo del job (eliminato quando il job viene scartato o scade)
+            with open(result['pdf_output_path'], "rb") as output_file:
+                st.download_button(data=output_file, **download_kwargs)
+        else:
+            st.download_button(data=result['pdf_data'], **download_kwargs)
+    elif not final_generation_messages and not result['pdf_generated']: # Nessun messaggio e nessun PDF
+        st.error(T("PDF_GENERATION_ERROR")) # Errore generico se non ci sono altri dettagli
+    show_run_profile(result['profile'], job.job_id)
+
+def show_run_profile(profile, job_id):
+    """Tempi per fase e contatori dell'esecuzione, con il download del profilo JSON completo."""
+    with st.expander(F("PROFILE_EXPANDER", seconds=profile['elapsed_seconds'])):
+        phases = dict((profile['metadata'].get('parse') or {}).get('phases', {}), **profile['phases'])
+        st.table([{T("PROFILE_PHASE_COLUMN"): name, T("PROFILE_SECONDS_COLUMN"): f"{p['seconds']:.3f}",
+                   T("PROFILE_CALLS_COLUMN"): p['calls']} for name, p in phases.items()])
+        st.json(profile['counters'], expanded=False)
+        st.download_button(label=T("PROFILE_DOWNLOAD_BUTTON_LABEL"), data=json.dumps(profile, ensure_ascii=False, indent=2),
+                           file_name=f"profilo_{job_id[:8]}.json", mime="application/json", key=f"download_profile_{job_id}")
+
 # ================================================================
 # Logica per il Test Funzionale / Logic for Functional Test
 # ================================================================
 if validation_button:
-    output_placeholder.empty() # Pulisce output precedente
     transient_status_placeholder.empty() # Pulisce messaggi temporanei precedenti
-    excel_file_created = None
-    test_results = []
     st.session_state.action_performed = True # Indica che un'azione è stata eseguita
-
-    with st.spinner(T("VALIDATION_LOGIC_SPINNER")):
-        try:
-            # La status_callback per run_all_tests ora usa display_critical_message
-            # per mostrare errori critici del test nel transient_status_placeholder
-            test_results, excel_file_created = run_all_tests(status_callback)
-        except Exception as e:
-             # Errore imprevisto nell'esecuzione di run_all_tests
-             with output_placeholder: # Mostra errore nell'area principale
-                 st.error(F("CL_VALIDATION_UNEXPECTED_ERROR", error=str(e)))
-             test_results = None # Assicura che non si tenti di processare risultati nulli
-
-    # Visualizza i risultati del test nell'area principale
-    with output_placeholder:
-        if test_results is not None: # Solo se test_results è stato popolato
-            st.markdown(f"**{T('VALIDATION_RESULTS_HEADER')}**")
-            if not test_results and not excel_file_created: # Nessun messaggio o file
-                st.warning(T("VALIDATION_NO_MESSAGES"))
-            elif test_results: # Ci sono messaggi da visualizzare
-                for msg_type, msg_key, msg_kwargs in test_results:
-                    final_formatted_text = F(msg_key, **msg_kwargs)
-                    if msg_type == "info": st.info(final_formatted_text)
-                    elif msg_type == "warning": st.warning(final_formatted_text)
-                    elif msg_type == "error": st.error(final_formatted_text)
-                    elif msg_type == "success": st.success(final_formatted_text)
-                    else: st.write(f"[{msg_type.upper()}] {final_formatted_text}") # Fallback per tipi non gestiti
-
-            # Bottone per scaricare l'Excel dei risultati statistici
-            if excel_file_created and os.path.exists(excel_file_created):
-                try:
-                    with open(excel_file_created, "rb") as fp:
-                        excel_bytes = fp.read()
-                    st.download_button(
-                        label=T("DOWNLOAD_STATS_EXCEL_LABEL"),
-                        data=excel_bytes,
-                        file_name=excel_file_created,
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                        help=T("DOWNLOAD_STATS_EXCEL_HELP")
-                    )
-                except Exception as e:
-                    st.error(f"Errore lettura file Excel per download: {e}")
-        # Se test_results è None (a causa di un errore imprevisto in run_all_tests),
-        # l'errore è già stato mostrato sopra.
+    JOB_MANAGER.discard(session_job_key, st.session_state.validation_job_id) # Sostituisce il job precedente
+    st.session_state.validation_job_id = JOB_MANAGER.submit(
+        session_job_key, "validation", run_validation_job, VALIDATION_MONTE_CARLO_RUNS,
+        recency_weighting_input, recency_half_life_input)
 
 # ================================================================
 # Logica Principale per Generazione PDF / Main Logic for PDF Generation
 # ================================================================
 if generate_button:
-    output_placeholder.empty(); transient_status_placeholder.empty()
+    transient_status_placeholder.empty()
     st.session_state.action_performed = True
     current_block_requests = st.session_state.get('block_requests', {})
     active_block_requests = {bid: k for bid, k in current_block_requests.items() if k > 0}
@@ -294,78 +576,37 @@ if generate_button:
     if total_requested <= 0:
         output_placeholder.error(T("TOTAL_QUESTIONS_ZERO_ERROR_BLOCKS")); st.stop()
 
-    pdf_generated = False; pdf_data = None; final_generation_messages = []
-
-    with st.spinner(T("GENERATING_DATA_SPINNER")):
-        try:
-            all_tests_data, generation_messages = generate_all_tests_data(
-                st.session_state.all_questions,
-                active_block_requests,
-                num_tests_input,
-                status_callback # Usa la callback per mostrare warning/error nel transient placeholder
-            )
-            final_generation_messages.extend(generation_messages) # Accumula tutti i messaggi
-
-            if all_tests_data is None: # Se la generazione dei dati fallisce criticamente
-                # Cerca un messaggio di errore specifico tra quelli raccolti
-                error_msg_from_core = next((m[1] for m in generation_messages if m[0] == 'error'), "Test data generation failed.")
-                raise ValueError(error_msg_from_core)
-
-            pdf_strings = {
-                "title_format": T("PDF_TEST_TITLE"), "name_label": T("PDF_NAME_LABEL"),
-                "date_label": T("PDF_DATE_LABEL"), "class_label": T("PDF_CLASS_LABEL"),
-                "missing_question": T("PDF_MISSING_QUESTION"), "no_options": T("PDF_NO_OPTIONS")
-            }
-            pdf_data = generate_pdf_data(all_tests_data, subject_name, status_callback, pdf_strings)
-
-            if pdf_data is None: # Se la generazione PDF fallisce
-                 # Cerca un messaggio di errore specifico (es. da WeasyPrint)
-                error_msg_from_pdf = next((m[1] for m in generation_messages if m[0] == 'error' and m[1].startswith("PG_")), "PDF generation failed.")
-                raise ValueError(error_msg_from_pdf)
-            pdf_generated = True
-
-        except ValueError as ve: # Cattura errori sollevati esplicitamente
-            msg_key_or_text = str(ve)
-            # Aggiungi il messaggio di errore alla lista solo se non è già presente (per evitare duplicati)
-            # o se è un messaggio generico di fallimento.
-            is_known_key = msg_key_or_text in TEXTS['it'] or msg_key_or_text in TEXTS['en']
-            if not any(m[1] == msg_key_or_text for m in final_generation_messages):
-                if is_known_key:
-                    final_generation_messages.append(("error", msg_key_or_text, {}))
-                else: # Messaggio di errore generico
-                    final_generation_messages.append(("error", "GENERATION_FAILED_ERROR", {"error": msg_key_or_text}))
-        except Exception as e: # Cattura altri errori imprevisti
-            error_details = str(e)
-            if not any(m[1] == "GENERATION_FAILED_ERROR" and m[2].get("error") == error_details for m in final_generation_messages):
-                final_generation_messages.append(("error", "GENERATION_FAILED_ERROR", {"error": error_details}))
-
-    # Visualizza i messaggi finali e il bottone di download nell'area principale
-    with output_placeholder:
-        if final_generation_messages:
-            st.markdown(f"**{T('GENERATION_MESSAGES_HEADER')}**")
-            for msg_type, msg_key, msg_kwargs in final_generation_messages:
-                final_formatted_text = F(msg_key, **msg_kwargs)
-                if msg_type == "warning": st.warning(final_formatted_text)
-                elif msg_type == "error": st.error(final_formatted_text)
-                # Non mostrare messaggi di successo qui, solo warning/error
-
-        if pdf_generated and pdf_data:
-            st.success(T("PDF_SUCCESS")) # Messaggio di successo
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            safe_filename_subject = "".join(c if c.isalnum() else "_" for c in subject_name)
-            pdf_filename = f"Verifiche_{safe_filename_subject}_{num_tests_input}tests_{timestamp}.pdf"
-            st.download_button(
-                label=T("PDF_DOWNLOAD_BUTTON_LABEL"),
-                data=pdf_data,
-                file_name=pdf_filename,
-                mime="application/pdf",
-                help=F("PDF_DOWNLOAD_BUTTON_HELP", pdf_filename=pdf_filename),
-                use_container_width=True,
-                type="primary"
-            )
-        elif not final_generation_messages and not pdf_generated : # Nessun messaggio e nessun PDF
-            st.error(T("PDF_GENERATION_ERROR")) # Errore generico se non ci sono altri dettagli
+    # Seed: vuoto = nuovo seed casuale, registrato nel PDF per poter rigenerare le stesse copie
+    try:
+        generation_seed = int(seed_input.strip()) if seed_input.strip() else new_seed()
+    except ValueError:
+        output_placeholder.error(F("SEED_INVALID_ERROR", value=seed_input)); st.stop()
+    # Copie da ristampare (es. "3, 7"): vuoto = tutte
+    try:
+        selected_copy_numbers = sorted({int(c) for c in copies_input.replace(';', ',').split(',') if c.strip()}) or None
+        if selected_copy_numbers and not all(1 <= c <= num_tests_input for c in selected_copy_numbers): raise ValueError
+    except ValueError:
+        output_placeholder.error(F("COPIES_INVALID_ERROR", value=copies_input, num_tests=num_tests_input)); st.stop()
+
+    # Testi del PDF risolti ora (la lingua è nello stato della sessione, non accessibile dal job)
+    pdf_strings = get_pdf_strings(st.session_state.lang)
+    JOB_MANAGER.discard(session_job_key, st.session_state.generation_job_id) # Sostituisce il job precedente
+    st.session_state.generation_job_id = JOB_MANAGER.submit(
+        session_job_key, "generation", run_generation_job,
+        st.session_state.all_questions, active_block_requests, num_tests_input,
+        recency_weighting_input, recency_half_life_input, generation_seed, selected_copy_numbers,
+        subject_name, pdf_strings, st.session_state.parse_profile, sampling_mode_input, seating_input
+    )
 
+# ================================================================
+# Stato dei Job e Risultati / Job Status and Results
+# ================================================================
+with output_placeholder:
+    for job_id_key, show_result in (("validation_job_id", show_validation_result), ("generation_job_id", show_generation_result)):
+        job = JOB_MANAGER.get(session_job_key, st.session_state[job_id_key])
+        if job is None: continue
+        if job.finished: show_result(job)
+        else: job_progress_fragment(job.job_id)
 
 # ================================================================
 # Messaggio Iniziale / Initial Message
@@ -0,0 +1,230 @@
+# batch_design.py
+# Campionamento "globale": l'intero lotto è costruito in una volta sola, minimizzando la massima
+# sovrapposizione (quindi il massimo Dice) tra QUALSIASI coppia di copie, non solo tra copie adiacenti.
+# Disegno iniziale a turni (ogni turno usa domande tutte diverse), poi ricerca locale a scambi singoli
+# con valutazione incrementale delle sovrapposizioni. Usato da generate_all_tests_data(sampling_mode="global").
+import time
+
+from instrumentation import NULL_PROFILER
+
+CANDIDATES_PER_MOVE = 8 # Domande sostitutive valutate per ogni mossa
+TIME_CHECK_INTERVAL = 64 # Iterazioni tra due letture dell'orologio
+PROGRESS_INTERVAL = 1024 # Iterazioni tra due messaggi di avanzamento
+NEUTRAL_MOVE = (0, 0, 0)
+
+# ================================================================
+# Disegno Iniziale / Initial Design
+# ================================================================
+def _round_design(n, k, num_tests, rng):
+    """
+    Selezioni (posizioni 0..n-1) di un blocco per num_tests copie: ogni turno è una permutazione nuova
+    divisa in floor(n/k) gruppi disgiunti. Il primo gruppo di un turno è preso fuori dall'ultima copia
+    del turno precedente (quando 2k <= n), così anche le copie consecutive tra due turni restano disgiunte.
+    """
+    per_round = n // k
+    selections = []
+    previous = []
+    while len(selections) < num_tests:
+        previous_set = set(previous)
+        others = [pos for pos in range(n) if pos not in previous_set]
+        rng.shuffle(others)
+        if len(others) >= k:
+            rest = others[k:] + previous
+            rng.shuffle(rest)
+            permutation = others[:k] + rest
+        else:
+            permutation = others + previous
+            rng.shuffle(permutation)
+        for group in range(min(per_round, num_tests - len(selections))):
+            selections.append(permutation[group * k:(group + 1) * k])
+        previous = selections[-1]
+    return selections
+
+def _overlap_lower_bound(block_shapes, num_tests):
+    """
+    Minimo teorico della massima sovrapposizione tra due copie: con utilizzi il più bilanciati possibile
+    (T*k domande su n, cioè floor o ceil di T*k/n copie per domanda) la sovrapposizione media è
+    sum C(u_q, 2) / C(T, 2), e la massima non può essere inferiore alla media.
+    """
+    if num_tests < 2: return 0
+    shared_pairs = 0
+    for n, k in block_shapes:
+        usage, extra = divmod(num_tests * k, n)
+        shared_pairs += (n - extra) * usage * (usage - 1) // 2 + extra * (usage + 1) * usage // 2
+    total_pairs = num_tests * (num_tests - 1) // 2
+    return -(-shared_pairs // total_pairs)
+
+# ================================================================
+# Ricerca Locale / Local Search
+# ================================================================
+class _BatchState:
+    """
+    Stato della ricerca locale sul lotto:
+    - members[b][t]: insieme delle posizioni del blocco b nella copia t;
+    - users[b][q]: insieme delle copie che contengono la posizione q del blocco b;
+    - overlap[i][j]: domande in comune tra le copie i e j (somma sui blocchi);
+    - histogram[v]: numero di coppie con sovrapposizione v.
+    Una mossa sostituisce una domanda q con r nella copia c di un blocco: cambia solo la riga c
+    della matrice (copie di users[q] e users[r]), quindi costa O(|users[q]| + |users[r]|).
+    """
+    def __init__(self, selections, block_sizes, num_tests, max_overlap):
+        self.num_tests = num_tests
+        self.block_sizes = block_sizes
+        self.members = [[set(selection) for selection in block_selections] for block_selections in selections]
+        self.users = []
+        for n, block_members in zip(block_sizes, self.members):
+            users = [set() for _ in range(n)]
+            for t, positions in enumerate(block_members):
+                for pos in positions: users[pos].add(t)
+            self.users.append(users)
+        self.overlap = [[0] * num_tests for _ in range(num_tests)]
+        for users in self.users:
+            for copies in users:
+                copies = sorted(copies)
+                for a, i in enumerate(copies):
+                    row = self.overlap[i]
+                    for j in copies[a + 1:]:
+                        row[j] += 1; self.overlap[j][i] += 1
+        self.histogram = [0] * (max_overlap + 2)
+        for i in range(num_tests):
+            row = self.overlap[i]
+            for j in range(i + 1, num_tests): self.histogram[row[j]] += 1
+
+    @property
+    def max_overlap(self):
+        histogram = self.histogram
+        for value in range(len(histogram) - 1, -1, -1):
+            if histogram[value]: return value
+        return 0
+
+    def pairs_at(self, value):
+        """Coppie (i, j) con sovrapposizione value (scansione O(T^2), solo quando la lista corrente è esaurita)."""
+        overlap = self.overlap
+        return [(i, j) for i in range(self.num_tests) for j in range(i + 1, self.num_tests) if overlap[i][j] == value]
+
+    def move_changes(self, block, copy, old_pos, new_pos):
+        """(copie che perdono una domanda in comune con copy, copie che ne guadagnano una)."""
+        old_users, new_users = self.users[block][old_pos], self.users[block][new_pos]
+        return [d for d in old_users if d != copy and d not in new_users], [d for d in new_users if d not in old_users]
+
+    def move_delta(self, copy, decreased, increased):
+        """
+        Effetto della mossa sull'istogramma come chiave ordinabile (minore = migliore), dal valore più alto
+        la cui frequenza cambia: (-1, -valore, variazione) se diminuisce, NEUTRAL_MOVE se nessuna frequenza
+        cambia, (1, valore, variazione) se aumenta.
+        """
+        row = self.overlap[copy]
+        lowered, raised = list(map(row.__getitem__, decreased)), list(map(row.__getitem__, increased))
+        # Variazione della frequenza di ogni valore, dall'alto: v -> v - 1 per lowered, v -> v + 1 per raised
+        value = max(max(lowered, default=-1), max(raised, default=-2) + 1)
+        while value >= 0:
+            change = lowered.count(value + 1) - lowered.count(value) + raised.count(value - 1) - raised.count(value)
+            if change: return (-1, -value, change) if change < 0 else (1, value, change)
+            value -= 1
+        return NEUTRAL_MOVE
+
+    def apply_move(self, block, copy, old_pos, new_pos, decreased, increased):
+        row, histogram, overlap = self.overlap[copy], self.histogram, self.overlap
+        for d in decreased:
+            histogram[row[d]] -= 1; row[d] -= 1; overlap[d][copy] -= 1; histogram[row[d]] += 1
+        for d in increased:
+            histogram[row[d]] -= 1; row[d] += 1; overlap[d][copy] += 1; histogram[row[d]] += 1
+        members = self.members[block][copy]
+        members.discard(old_pos); members.add(new_pos)
+        self.users[block][old_pos].discard(copy); self.users[block][new_pos].add(copy)
+
+def _improve(state, block_requests_k, avoid_adjacent, rng, max_iterations, deadline, stall_iterations, lower_bound,
+             status_callback):
+    """
+    Ricerca locale: prende una coppia con la sovrapposizione massima, una domanda che condividono e
+    la sostituisce in una delle due copie con la migliore di CANDIDATES_PER_MOVE alternative.
+    Accetta le mosse che migliorano l'istogramma (prima la coppia peggiore, poi il numero di coppie
+    a quel valore, e così via) e quelle neutre (per uscire dai plateau). Con avoid_adjacent[b]
+    la domanda sostitutiva non può stare nelle copie adiacenti (stessa garanzia del campionamento sequenziale).
+    Si ferma al limite inferiore, dopo max_iterations, dopo stall_iterations senza miglioramenti
+    o alla scadenza del tempo; ogni PROGRESS_INTERVAL iterazioni invia il progress CL_GLOBAL_SEARCH.
+    Restituisce (iterazioni, mosse applicate, tempo esaurito).
+    """
+    num_tests = state.num_tests
+    movable_blocks = [b for b, k in enumerate(block_requests_k) if k < state.block_sizes[b]]
+    if num_tests < 2 or not movable_blocks: return 0, 0, False
+    hot_pairs, hot_value = [], None
+    iterations = moves = since_improvement = 0
+    while iterations < max_iterations and since_improvement < stall_iterations:
+        if iterations % TIME_CHECK_INTERVAL == 0 and time.perf_counter() > deadline: return iterations, moves, True
+        if iterations % PROGRESS_INTERVAL == 0: status_callback("progress", "CL_GLOBAL_SEARCH", done=iterations, total=max_iterations)
+        current_max = state.max_overlap
+        if current_max <= lower_bound: break
+        iterations += 1; since_improvement += 1
+        if not hot_pairs or hot_value != current_max:
+            hot_pairs, hot_value = state.pairs_at(current_max), current_max
+            rng.shuffle(hot_pairs)
+        i, j = hot_pairs.pop()
+        if state.overlap[i][j] != current_max: continue
+        copy, other = (i, j) if rng.random() < 0.5 else (j, i)
+        shared = [(b, pos) for b in movable_blocks for pos in state.members[b][copy] & state.members[b][other]]
+        if not shared: continue
+        block, old_pos = shared[rng.randrange(len(shared))]
+        n, members = state.block_sizes[block], state.members[block]
+        forbidden = set(members[copy])
+        if avoid_adjacent[block]:
+            if copy > 0: forbidden |= members[copy - 1]
+            if copy + 1 < num_tests: forbidden |= members[copy + 1]
+        best = None
+        for _ in range(CANDIDATES_PER_MOVE):
+            new_pos = rng.randrange(n)
+            if new_pos in forbidden: continue
+            decreased, increased = state.move_changes(block, copy, old_pos, new_pos)
+            delta = state.move_delta(copy, decreased, increased)
+            if best is None or delta < best[0]: best = (delta, new_pos, decreased, increased)
+        if best is None or best[0] > NEUTRAL_MOVE: continue
+        delta, new_pos, decreased, increased = best
+        state.apply_move(block, copy, old_pos, new_pos, decreased, increased)
+        moves += 1
+        if delta < NEUTRAL_MOVE: since_improvement = 0
+        if state.overlap[i][j] == current_max: hot_pairs.append((i, j)) # Ancora al massimo: riprovare
+    return iterations, moves, False
+
+# ================================================================
+# Lotto Completo / Full Batch
+# ================================================================
+def _nop_callback(*args, **kwargs): pass
+
+def design_batch(block_indices, block_requests, num_tests, rng, time_budget, max_iterations,
+                 status_callback=None, profiler=None):
+    """
+    Selezioni di tutte le copie in una volta: {block_id: lista di num_tests liste di original_index}.
+    block_indices: {block_id: sequenza degli original_index del blocco}; block_requests: {block_id: k}
+    (blocchi già validati, 0 < k <= n). Ogni copia ha esattamente k domande per blocco.
+    Con lo stesso rng il risultato è riproducibile, a meno che la ricerca non sia interrotta da time_budget
+    (secondi). Restituisce (selezioni, statistiche) con statistiche = dizionario di max_overlap_initial,
+    max_overlap_final, lower_bound, iterations, moves e time_budget_reached.
+    """
+    if profiler is None: profiler = NULL_PROFILER
+    if status_callback is None: status_callback = _nop_callback
+    block_ids = list(block_requests)
+    block_sizes = [len(block_indices[block_id]) for block_id in block_ids]
+    block_requests_k = [block_requests[block_id] for block_id in block_ids]
+    deadline = time.perf_counter() + time_budget
+    with profiler.phase("sampling.global_design"):
+        selections = [_round_design(n, k, num_tests, rng) for n, k in zip(block_sizes, block_requests_k)]
+        state = _BatchState(selections, block_sizes, num_tests, sum(block_requests_k))
+    lower_bound = _overlap_lower_bound(zip(block_sizes, block_requests_k), num_tests)
+    initial_max = state.max_overlap
+    with profiler.phase("sampling.global_search"):
+        iterations, moves, time_budget_reached = _improve(
+            state, block_requests_k, [2 * k < n for n, k in zip(block_sizes, block_requests_k)], rng,
+            max_iterations, deadline, stall_iterations=max(2000, 20 * num_tests), lower_bound=lower_bound,
+            status_callback=status_callback)
+    status_callback("progress", "CL_GLOBAL_SEARCH", done=max_iterations, total=max_iterations)
+    profiler.count("sampling.global_iterations", iterations)
+    profiler.count("sampling.global_moves", moves)
+
+    # Posizioni in ordine crescente: la copia viene comunque mescolata da generate_all_tests_data
+    result = {}
+    for b, block_id in enumerate(block_ids):
+        indices = block_indices[block_id]
+        result[block_id] = [[indices[pos] for pos in sorted(members)] for members in state.members[b]]
+    stats = {'max_overlap_initial': initial_max, 'max_overlap_final': state.max_overlap, 'lower_bound': lower_bound,
+             'iterations': iterations, 'moves': moves, 'time_budget_reached': time_budget_reached}
+    return result, stats
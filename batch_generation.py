@@ -0,0 +1,73 @@
+# batch_generation.py
+# Generazione parallela di più lotti di verifiche (es. una per classe) dalla stessa banca domande.
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+from core_logic import generate_all_tests_data
+from pdf_generator import generate_pdf_data, HtmlFragmentCache
+
+# Stato per-processo impostato dall'initializer del pool (evita di serializzare la banca per ogni job)
+_worker_questions = None
+_worker_pdf_strings = None
+_worker_fragment_cache = None # Frammenti HTML delle domande, condivisi da tutti i job del processo
+
+def _init_worker(all_questions_list, pdf_strings):
+    global _worker_questions, _worker_pdf_strings, _worker_fragment_cache
+    _worker_questions = all_questions_list
+    _worker_pdf_strings = pdf_strings
+    _worker_fragment_cache = HtmlFragmentCache(missing_question_text=pdf_strings.get("missing_question", "MISSING QUESTION"))
+
+def _clear_worker():
+    """Rilascia lo stato di _init_worker dopo l'esecuzione in sequenza nel processo corrente."""
+    global _worker_questions, _worker_pdf_strings, _worker_fragment_cache
+    _worker_questions = _worker_pdf_strings = _worker_fragment_cache = None
+
+def _run_job(job):
+    """
+    Esegue un singolo job (campionamento + rendering PDF) nel processo corrente.
+    Il job usa un proprio random.Random(seed) (e il seed per le risposte delle copie),
+    quindi il risultato non dipende da quale worker lo esegue né dall'ordine di esecuzione.
+    """
+    messages = []
+    def collect_callback(msg_type, msg_key, **kwargs):
+        if msg_type != "progress": messages.append((msg_type, msg_key, kwargs))
+
+    result = {'subject': job['subject'], 'seed': job['seed'], 'pdf': None, 'messages': messages}
+    try:
+        tests_data, generation_messages = generate_all_tests_data(
+            _worker_questions, job['block_requests'], job['num_tests'], collect_callback,
+            rng=random.Random(job['seed'])
+        )
+        messages.extend(generation_messages)
+        if any(m[0] == 'error' for m in generation_messages):
+            return result
+        result['pdf'] = generate_pdf_data(tests_data, job['subject'], collect_callback, _worker_pdf_strings,
+                                          seed=job['seed'], fragment_cache=_worker_fragment_cache)
+    except Exception as e:
+        messages.append(("error", "GENERATION_FAILED_ERROR", {"error": str(e)}))
+    return result
+
+def generate_batch_pdfs(all_questions_list, jobs, pdf_strings, max_workers=None):
+    """
+    Genera un PDF per ogni job, distribuendo i job su un ProcessPoolExecutor.
+    Ogni job è un dizionario {'subject', 'block_requests', 'num_tests', 'seed'}.
+    Restituisce, nello stesso ordine dei job, dizionari
+    {'subject', 'seed', 'pdf' (bytes o None), 'messages' (lista (type, key, kwargs))}.
+    Con max_workers=1 i job vengono eseguiti in sequenza nel processo corrente.
+    """
+    required_keys = ('subject', 'block_requests', 'num_tests', 'seed')
+    for job in jobs:
+        missing = [key for key in required_keys if key not in job]
+        if missing: raise ValueError(f"Job incompleto, chiavi mancanti: {missing}")
+    if not jobs: return []
+
+    if max_workers == 1 or len(jobs) == 1:
+        _init_worker(all_questions_list, pdf_strings)
+        try:
+            return [_run_job(job) for job in jobs]
+        finally:
+            _clear_worker() # La banca non resta nelle variabili del modulo dopo il lotto
+
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                             initargs=(all_questions_list, pdf_strings)) as executor:
+        return list(executor.map(_run_job, jobs))
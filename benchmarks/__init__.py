@@ -0,0 +1,3 @@
+# benchmarks/__init__.py
+# Script di benchmark (non test funzionali). Eseguire dalla root del progetto, es.:
+#   python -m benchmarks.sampling
@@ -0,0 +1,70 @@
+# benchmarks/csv_ingest.py
+# Lettura di un CSV grande (~50 MB) con virgola e con punto e virgola:
+# percorso attuale (sniffing su prefisso + singola lettura in streaming) vs
+# percorso precedente (decodifica completa, pandas con ',' e nuovo tentativo con ';').
+# Uso: python -m benchmarks.csv_ingest
+import io
+import os
+import tempfile
+import time
+
+from file_handler import load_questions_from_excel
+
+TARGET_BYTES = 50 * 1024 * 1024
+BLOCK_SIZE = 200
+
+def write_synthetic_csv(path, delimiter, target_bytes):
+    """CSV con blocchi MC separati da righe vuote; il testo contiene virgole (come nei file reali)."""
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        written, i = 0, 0
+        while written < target_bytes:
+            if i and i % BLOCK_SIZE == 0:
+                line = delimiter * 4 + '\n'
+            else:
+                line = delimiter.join([f"Domanda {i}, quale tra queste è corretta", "Risposta A", "Risposta B", "Risposta C", "Risposta D"]) + '\n'
+            f.write(line); written += len(line.encode('utf-8')); i += 1
+
+def _legacy_load(path):
+    """
+    Percorso precedente: getvalue() + decode completo, ',' e poi ';' in caso di errore,
+    fillna/astype e scansione iterrows (senza la costruzione dei dizionari domanda).
+    """
+    import pandas as pd
+    with open(path, 'rb') as f: content_bytes = f.read()
+    try:
+        df = pd.read_csv(io.StringIO(content_bytes.decode('utf-8-sig')), header=None, sep=',', skipinitialspace=True, lineterminator='\n')
+    except Exception:
+        df = pd.read_csv(io.StringIO(content_bytes.decode('utf-8-sig')), header=None, sep=';', skipinitialspace=True, lineterminator='\n')
+    df = df.fillna('').astype(str)
+    for _, row in df.iterrows():
+        _ = [str(cell).strip() for cell in row]
+
+def run_benchmark():
+    def nop_callback(*args, **kwargs): pass
+    try:
+        import pandas # noqa: F401
+        legacy_available = True
+    except ImportError:
+        legacy_available = False
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for delimiter, label in ((',', 'virgola'), (';', 'punto e virgola')):
+            path = os.path.join(tmp_dir, f"bank_{label.replace(' ', '_')}.csv")
+            write_synthetic_csv(path, delimiter, TARGET_BYTES)
+            size_mb = os.path.getsize(path) / 1024 / 1024
+
+            start = time.perf_counter()
+            with open(path, 'rb') as f:
+                all_questions, blocks_summary, error_key = load_questions_from_excel(f, nop_callback, cache=None) # Solo il parser
+            t_new = time.perf_counter() - start
+            assert error_key is None, error_key
+
+            line = f"{label:>16} ({size_mb:.0f} MB, {len(all_questions)} domande): streaming {t_new:.2f} s"
+            if legacy_available:
+                start = time.perf_counter()
+                _legacy_load(path)
+                t_legacy = time.perf_counter() - start
+                line += f", precedente (pandas + iterrows) {t_legacy:.2f} s"
+            print(line)
+
+if __name__ == "__main__":
+    run_benchmark()
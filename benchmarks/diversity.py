@@ -0,0 +1,150 @@
+# benchmarks/diversity.py
+# Suite parametrica su banche sintetiche in memoria: per ogni configurazione (dimensioni dei blocchi,
+# griglia di k, lunghezza delle sequenze) misura diversità (Dice medio per distanza, Monte Carlo e
+# valore esatto a pesi uniformi), tempo di generazione e memoria di picco; i risultati vanno in JSON.
+# Uso: python -m benchmarks.diversity [--config suite.json] [--output risultati.json] [--quick]
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+from config import DEFAULT_RECENCY_WEIGHTING, DEFAULT_RECENCY_HALF_LIFE
+from core_logic import CompiledQuestionBank, generate_all_tests_data
+from question_bank import QuestionBank
+from test import run_similarity_analysis
+
+RESULTS_FORMAT_VERSION = 1
+DEFAULT_OUTPUT = os.path.join("benchmarks", "results", "diversity.json")
+DEFAULT_SEED = 1234
+TIMING_REPEATS = 5
+
+# Configurazioni predefinite; un file --config contiene una lista di dizionari con le stesse chiavi
+# (runs, recency_weighting e recency_half_life sono facoltativi)
+DEFAULT_SUITE = [
+    {'name': "fixture_4x12", 'block_sizes': [12] * 4, 'k_values': list(range(1, 12)), 'num_tests': 15, 'runs': 30},
+    {'name': "small_blocks_6x8", 'block_sizes': [8] * 6, 'k_values': [1, 2, 3, 4], 'num_tests': 30, 'runs': 30},
+    {'name': "mixed_8_to_1000", 'block_sizes': [8, 40, 200, 1000], 'k_values': [1, 2, 4, 8], 'num_tests': 30, 'runs': 20},
+    {'name': "large_4x5000", 'block_sizes': [5000] * 4, 'k_values': [5, 20, 100], 'num_tests': 30, 'runs': 10},
+]
+
+def make_synthetic_bank(block_sizes):
+    """QuestionBank sintetica (domande aperte) con un blocco per dimensione; restituisce (banca, blocks_summary)."""
+    bank = QuestionBank()
+    original_index = 0
+    for block_id, size in enumerate(block_sizes, 1):
+        for _ in range(size):
+            bank.append(f"Domanda {original_index}", (), original_index, 'Aperte', block_id)
+            original_index += 1
+    blocks_summary = [{'block_id': block_id, 'type': 'Aperte', 'count': size} for block_id, size in enumerate(block_sizes, 1)]
+    return bank, blocks_summary
+
+def _measure(func):
+    """(risultato, secondi, picco tracemalloc in byte) di func()."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = func()
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, elapsed, peak
+
+def run_config(config, seed, max_workers, runs_override=None):
+    """Misura una configurazione; restituisce il dizionario dei risultati (serializzabile in JSON)."""
+    recency_weighting = config.get('recency_weighting', DEFAULT_RECENCY_WEIGHTING)
+    recency_half_life = config.get('recency_half_life', DEFAULT_RECENCY_HALF_LIFE)
+    num_tests, runs = config['num_tests'], runs_override or config.get('runs', 30)
+    def nop_callback(*args, **kwargs): pass
+
+    (bank, blocks_summary), _, bank_peak = _measure(lambda: make_synthetic_bank(config['block_sizes']))
+    start = time.perf_counter(); make_synthetic_bank(config['block_sizes']); bank_seconds = time.perf_counter() - start
+    compiled = CompiledQuestionBank(bank)
+
+    analysis = run_similarity_analysis(bank, blocks_summary, nop_callback, config['k_values'], num_tests,
+                                       runs, seed, max_workers, recency_weighting, recency_half_life)
+    rows_by_k = {}
+    for row in analysis['rows']: rows_by_k.setdefault(row['k_per_block'], []).append(row)
+
+    results = []
+    for k, rows in sorted(rows_by_k.items()):
+        block_requests = {b['block_id']: k for b in blocks_summary if b['count'] >= k}
+        def generate(repeat=0):
+            return generate_all_tests_data(compiled, block_requests, num_tests, nop_callback,
+                                           recency_weighting=recency_weighting, recency_half_life=recency_half_life,
+                                           rng=random.Random(f"{seed}:{k}:{repeat}"))
+        # Tempi senza tracemalloc (che rallenta le allocazioni), poi un'esecuzione misurata per la memoria
+        timings = []
+        for repeat in range(TIMING_REPEATS):
+            start = time.perf_counter(); generate(repeat); timings.append(time.perf_counter() - start)
+        _, _, generation_peak = _measure(generate)
+        seconds = statistics.median(timings)
+        mean_dice = {str(row['distance']): row['avg_dice'] for row in rows}
+        valid_dice = [value for value in mean_dice.values() if value is not None]
+        results.append({
+            'k': k,
+            'method': analysis['methods'].get(k),
+            'dice_mean_by_distance': mean_dice,
+            'dice_ci95_by_distance': {str(row['distance']): row['ci95_half_width'] for row in rows},
+            'dice_exact_uniform_by_distance': {str(d): value for d, value in analysis['analytic'].get(k, {}).items()},
+            'dice_distance_1': mean_dice.get("1"),
+            'dice_max_over_distances': max(valid_dice) if valid_dice else None,
+            'fallback_runs': analysis['fallback_runs'].get(k, 0),
+            'generation_seconds': seconds,
+            'tests_per_second': num_tests / seconds if seconds else None,
+            'generation_peak_bytes': generation_peak,
+        })
+
+    return {
+        'name': config['name'], 'block_sizes': config['block_sizes'], 'k_values': config['k_values'],
+        'num_tests': num_tests, 'runs': runs, 'recency_weighting': recency_weighting, 'recency_half_life': recency_half_life,
+        'bank_questions': len(bank), 'bank_build_seconds': bank_seconds, 'bank_peak_bytes': bank_peak,
+        'messages': [[msg_type, msg_key, {key: str(value) for key, value in kwargs.items()}]
+                     for msg_type, msg_key, kwargs in analysis['messages'] if msg_type in ("warning", "error")],
+        'results': results,
+    }
+
+def run_benchmark(suite=DEFAULT_SUITE, output=DEFAULT_OUTPUT, seed=DEFAULT_SEED, max_workers=None, runs_override=None):
+    report = {
+        'version': RESULTS_FORMAT_VERSION,
+        'created_at': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'python': sys.version.split()[0], 'platform': platform.platform(), 'seed': seed,
+        'configs': [],
+    }
+    for config in suite:
+        start = time.perf_counter()
+        result = run_config(config, seed, max_workers, runs_override)
+        report['configs'].append(result)
+        print(f"{config['name']}: {result['bank_questions']} domande, {len(result['results'])} valori di k "
+              f"({time.perf_counter() - start:.1f} s)")
+        for row in result['results']:
+            print(f"  k={row['k']:<4} {row['method']:<13} Dice d=1 {row['dice_distance_1']:.3f}  "
+                  f"max {row['dice_max_over_distances']:.3f}  {row['tests_per_second']:,.0f} test/s  "
+                  f"picco {row['generation_peak_bytes'] / 1024:.0f} KiB")
+    if output:
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, "w", encoding="utf-8") as f: json.dump(report, f, indent=2)
+        print(f"Risultati scritti in {output}")
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Diversità, tempi e memoria su banche sintetiche.")
+    parser.add_argument("--config", help="file JSON con la lista delle configurazioni (default: suite predefinita)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="file JSON dei risultati (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--workers", type=int, default=None, help="processi per il Monte Carlo (default: n. CPU)")
+    parser.add_argument("--runs", type=int, default=None, help="run Monte Carlo per ogni k (sostituisce quelle delle configurazioni)")
+    parser.add_argument("--quick", action="store_true", help="3 run Monte Carlo per k (verifica rapida della suite)")
+    args = parser.parse_args(argv)
+    suite = DEFAULT_SUITE
+    if args.config:
+        with open(args.config, encoding="utf-8") as f: suite = json.load(f)
+    run_benchmark(suite, args.output, args.seed, args.workers, 3 if args.quick else args.runs)
+
+if __name__ == "__main__":
+    main()
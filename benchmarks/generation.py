@@ -0,0 +1,64 @@
+# benchmarks/generation.py
+# Micro-benchmark di generate_all_tests_data su una banca sintetica grande.
+# Uso: python -m benchmarks.generation
+import random
+import time
+
+from core_logic import CompiledQuestionBank, generate_all_tests_data
+
+NUM_QUESTIONS = 100_000
+NUM_BLOCKS = 4
+NUM_TESTS = 1_000
+K_PER_BLOCK = 5
+LEGACY_NUM_TESTS = 10 # La ricostruzione per-test è O(n): misurata su pochi test ed estrapolata
+
+def make_synthetic_questions(num_questions, num_blocks):
+    """Domande sintetiche distribuite uniformemente su num_blocks blocchi."""
+    block_size = num_questions // num_blocks
+    return [{
+        'question': f"Domanda {i}", 'answers': [], 'original_index': i,
+        'type': 'Aperte', 'block_id': 1 + i // block_size
+    } for i in range(block_size * num_blocks)]
+
+def _legacy_rebuild_per_test(all_questions_list, block_requests, num_tests):
+    """Riproduce il costo della versione precedente: indici/dizionari ricostruiti per ogni test e blocco."""
+    questions_by_block = {}
+    for q in all_questions_list: questions_by_block.setdefault(q['block_id'], []).append(q)
+    last_used = {block_id: set() for block_id in questions_by_block}
+    for _ in range(num_tests):
+        for block_id, k in block_requests.items():
+            block_questions = questions_by_block[block_id]
+            index_set = set(q['original_index'] for q in block_questions)
+            candidates = list(index_set - last_used[block_id])
+            selected = random.sample(candidates, k)
+            questions_dict = {q['original_index']: q for q in block_questions}
+            _ = [questions_dict[idx] for idx in selected]
+            last_used[block_id] = set(selected)
+
+def run_benchmark():
+    random.seed(1234)
+    questions = make_synthetic_questions(NUM_QUESTIONS, NUM_BLOCKS)
+    block_requests = {block_id: K_PER_BLOCK for block_id in range(1, NUM_BLOCKS + 1)}
+    def nop_callback(*args, **kwargs): pass
+
+    start = time.perf_counter()
+    bank = CompiledQuestionBank(questions)
+    t_compile = time.perf_counter() - start
+
+    start = time.perf_counter()
+    tests, messages = generate_all_tests_data(bank, block_requests, NUM_TESTS, nop_callback)
+    t_generate = time.perf_counter() - start
+    assert len(tests) == NUM_TESTS and not messages
+
+    start = time.perf_counter()
+    _legacy_rebuild_per_test(questions, block_requests, LEGACY_NUM_TESTS)
+    t_legacy_per_test = (time.perf_counter() - start) / LEGACY_NUM_TESTS
+
+    print(f"Banca: {NUM_QUESTIONS} domande in {NUM_BLOCKS} blocchi, k={K_PER_BLOCK}/blocco, {NUM_TESTS} test")
+    print(f"  Compilazione banca (una tantum): {t_compile * 1000:.1f} ms")
+    print(f"  Generazione {NUM_TESTS} test:      {t_generate * 1000:.1f} ms ({t_generate / NUM_TESTS * 1e6:.1f} µs/test)")
+    print(f"  Ricostruzione per-test (legacy): {t_legacy_per_test * 1000:.1f} ms/test "
+          f"-> ~{t_legacy_per_test * NUM_TESTS:.1f} s stimati per {NUM_TESTS} test")
+
+if __name__ == "__main__":
+    run_benchmark()
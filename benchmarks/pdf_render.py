@@ -0,0 +1,64 @@
+# benchmarks/pdf_render.py
+# Latenza per rendering: HTML con <style> inline analizzato a ogni chiamata (precedente)
+# vs PdfRenderer persistente (CSS analizzato una volta, FontConfiguration condivisa).
+# Uso: python -m benchmarks.pdf_render
+import random
+import time
+
+import pdf_generator
+from benchmarks.generation import make_synthetic_questions
+from core_logic import generate_all_tests_data
+
+NUM_QUESTIONS = 200
+NUM_BLOCKS = 4
+K_PER_BLOCK = 5
+NUM_TESTS = 5 # Copie per rendering (un "click" piccolo: domina il costo fisso)
+REPEATS = 10
+
+def _legacy_render(body_html):
+    """Percorso precedente: foglio di stile inline, nessuna FontConfiguration condivisa."""
+    document = (f'<!DOCTYPE html><html><head><meta charset="UTF-8"><title>Verifiche Generate</title>'
+                f'<style>{pdf_generator.PDF_CSS}</style></head><body>{body_html}</body></html>')
+    return pdf_generator.HTML(string=document).write_pdf()
+
+def _time_per_call(func, repeats):
+    func() # Riscaldamento (import pigri, cache di fontconfig)
+    start = time.perf_counter()
+    for _ in range(repeats): func()
+    return (time.perf_counter() - start) / repeats
+
+def run_benchmark():
+    load_error = pdf_generator.load_weasyprint() if pdf_generator.weasyprint_available() else "non installato"
+    if load_error is not None:
+        print(f"WeasyPrint non disponibile ({load_error}): benchmark saltato.")
+        return
+    rng = random.Random(1234)
+    questions = make_synthetic_questions(NUM_QUESTIONS, NUM_BLOCKS)
+    # Blocchi dispari a scelta multipla, pari aperti (tipo uniforme per blocco, come dopo il parsing)
+    for q in questions:
+        if q['block_id'] % 2: q['type'], q['answers'] = 'Scelta Multipla', ['Vero', 'Falso', 'Non so']
+    block_requests = {block_id: K_PER_BLOCK for block_id in range(1, NUM_BLOCKS + 1)}
+    tests, _ = generate_all_tests_data(questions, block_requests, NUM_TESTS, lambda *a, **k: None, rng=rng)
+
+    # HTML del corpo costruito una volta sola: si misura solo il rendering
+    captured = {}
+    class _CaptureRenderer:
+        def render(self, body_html): captured['body'] = body_html; return self
+        def write_pdf(self): return b''
+    original_get_renderer = pdf_generator.get_renderer
+    pdf_generator.get_renderer = lambda: _CaptureRenderer()
+    try:
+        pdf_generator.generate_pdf_data(tests, "Benchmark", lambda *a, **k: None, {}, seed=1)
+    finally:
+        pdf_generator.get_renderer = original_get_renderer
+    body_html = captured['body']
+
+    renderer = pdf_generator.PdfRenderer()
+    t_legacy = _time_per_call(lambda: _legacy_render(body_html), REPEATS)
+    t_renderer = _time_per_call(lambda: renderer.write_pdf(body_html), REPEATS)
+    print(f"{NUM_TESTS} copie, {REPEATS} rendering ciascuno:")
+    print(f"  <style> inline (precedente): {t_legacy * 1000:.1f} ms/rendering")
+    print(f"  PdfRenderer persistente:     {t_renderer * 1000:.1f} ms/rendering ({t_legacy / t_renderer:.2f}x)")
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,231 @@
+# benchmarks/pipeline.py
+# Suite di regressione delle prestazioni dell'intera pipeline, con seed fissi e fixture generate:
+# analisi della banca (.xlsx e .csv, da 1k a 200k righe), campionamento WRSwOR (vari n, k),
+# generate_all_tests_data (blocchi x copie) e generate_pdf_data (10-500 copie, saltato senza WeasyPrint).
+# I risultati vanno in JSON e possono essere confrontati con una baseline salvata in precedenza
+# sulla stessa macchina (uscita 1 se un caso rallenta oltre la tolleranza).
+# Uso: python -m benchmarks.pipeline [--quick] [--only GRUPPO] [--save-baseline] [--baseline FILE]
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import pdf_generator
+from benchmarks.diversity import make_synthetic_bank
+from config import PDF_RENDER_MODE, PDF_RENDER_MAX_WORKERS
+from core_logic import CompiledQuestionBank, generate_all_tests_data, weighted_random_sample_without_replacement
+from file_handler import load_questions_from_excel
+
+RESULTS_FORMAT_VERSION = 1
+DEFAULT_OUTPUT = os.path.join("benchmarks", "results", "pipeline.json")
+DEFAULT_BASELINE = os.path.join("benchmarks", "results", "pipeline_baseline.json")
+DEFAULT_SEED = 1234
+DEFAULT_TOLERANCE = 0.20 # Rallentamento relativo oltre il quale un caso è una regressione
+REPEATS = 5
+MAX_CASE_SECONDS = 20.0 # Oltre questo tempo cumulato un caso smette di ripetere (es. xlsx da 200k righe)
+WARMUP_MAX_SECONDS = 1.0 # Solo le chiamate più brevi hanno un riscaldamento scartato
+FIXTURE_BLOCK_SIZE = 200
+GROUPS = ("parse", "sampling", "generation", "pdf")
+
+# Griglie dei casi: (completa, --quick)
+PARSE_ROWS = ([1_000, 20_000, 200_000], [1_000, 10_000])
+SAMPLING_SHAPES = ([(100, 5), (1_000, 5), (1_000, 50), (10_000, 5), (10_000, 500), (100_000, 5), (100_000, 50)],
+                   [(100, 5), (10_000, 5), (10_000, 500)])
+SAMPLING_CALLS = 200 # Estrazioni per misura (con rng a seed fisso)
+GENERATION_SHAPES = ([(4, 30), (4, 300), (4, 1_000), (20, 30), (20, 300), (20, 1_000)], [(4, 30), (20, 300)])
+GENERATION_BLOCK_SIZE = 200
+GENERATION_K = 5
+PDF_COPIES = ([10, 100, 500], [10])
+PDF_BLOCKS = 4
+
+# ================================================================
+# Fixture / Fixtures
+# ================================================================
+def _fixture_row(i):
+    """Riga i della banca sintetica: blocchi di FIXTURE_BLOCK_SIZE righe a scelta multipla, separati da una riga vuota."""
+    if i and i % (FIXTURE_BLOCK_SIZE + 1) == FIXTURE_BLOCK_SIZE: return [""] * 5
+    return [f"Domanda {i}, quale tra queste è corretta", "Risposta A", "Risposta B", "Risposta C", "Risposta D"]
+
+def write_bank_csv(path, num_rows):
+    import csv
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        for i in range(num_rows): writer.writerow(_fixture_row(i))
+
+def write_bank_xlsx(path, num_rows):
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    for i in range(num_rows): sheet.append([cell or None for cell in _fixture_row(i)])
+    workbook.save(path)
+
+# ================================================================
+# Misura / Measurement
+# ================================================================
+def _time_case(func, repeats=REPEATS, max_seconds=MAX_CASE_SECONDS):
+    """Tempi di func() in secondi: la prima chiamata è scartata se breve (riscaldamento), poi al più repeats misure."""
+    start = time.perf_counter(); func(); first = time.perf_counter() - start
+    timings = [] if first < WARMUP_MAX_SECONDS else [first]
+    while len(timings) < repeats and sum(timings) + first < max_seconds:
+        start = time.perf_counter(); func(); timings.append(time.perf_counter() - start)
+    return timings
+
+def _case_result(group, params, timings, items=None, unit=None):
+    median = statistics.median(timings)
+    result = {'group': group, 'params': params, 'seconds_median': median, 'seconds_min': min(timings), 'repeats': len(timings)}
+    if items: result.update(items=items, unit=unit, items_per_second=items / median if median else None)
+    return result
+
+def _nop_callback(*args, **kwargs): pass
+
+# ================================================================
+# Casi / Cases
+# ================================================================
+def parse_cases(tmp_dir, quick):
+    for num_rows in PARSE_ROWS[quick]:
+        for extension, writer in ((".csv", write_bank_csv), (".xlsx", write_bank_xlsx)):
+            path = os.path.join(tmp_dir, f"bank_{num_rows}{extension}")
+            writer(path, num_rows)
+            def load(path=path):
+                with open(path, "rb") as f:
+                    all_questions, _, error_key = load_questions_from_excel(f, _nop_callback, cache=None)
+                if error_key: raise RuntimeError(f"{path}: {error_key}")
+                return all_questions
+            num_questions = len(load())
+            yield (f"parse{extension}.{num_rows}", _case_result(
+                "parse", {'format': extension.lstrip("."), 'rows': num_rows, 'bytes': os.path.getsize(path)},
+                _time_case(load), num_questions, "domande"))
+
+def sampling_cases(seed, quick):
+    for n, k in SAMPLING_SHAPES[quick]:
+        population = list(range(n))
+        weights = [1.0 + (i % 7) for i in range(n)] # Pesi non uniformi ma deterministici
+        def sample():
+            rng = random.Random(f"{seed}:{n}:{k}")
+            for _ in range(SAMPLING_CALLS): weighted_random_sample_without_replacement(population, weights, k, rng=rng)
+        yield (f"sampling.n{n}.k{k}", _case_result(
+            "sampling", {'n': n, 'k': k, 'calls': SAMPLING_CALLS}, _time_case(sample), SAMPLING_CALLS, "estrazioni"))
+
+def generation_cases(seed, quick):
+    for num_blocks, num_tests in GENERATION_SHAPES[quick]:
+        bank, _ = make_synthetic_bank([GENERATION_BLOCK_SIZE] * num_blocks)
+        compiled = CompiledQuestionBank(bank)
+        block_requests = {block_id: GENERATION_K for block_id in range(1, num_blocks + 1)}
+        def generate():
+            tests, messages = generate_all_tests_data(compiled, block_requests, num_tests, _nop_callback,
+                                                      rng=random.Random(f"{seed}:{num_blocks}:{num_tests}"))
+            if len(tests) != num_tests or messages: raise RuntimeError(f"Generazione non riuscita: {messages}")
+        yield (f"generation.b{num_blocks}.t{num_tests}", _case_result(
+            "generation", {'blocks': num_blocks, 'block_size': GENERATION_BLOCK_SIZE, 'k': GENERATION_K, 'tests': num_tests},
+            _time_case(generate), num_tests, "verifiche"))
+
+def pdf_cases(seed, quick):
+    load_error = pdf_generator.load_weasyprint() if pdf_generator.weasyprint_available() else "non installato"
+    if load_error is not None:
+        print(f"WeasyPrint non disponibile ({load_error}): casi PDF saltati.")
+        return
+    bank, _ = make_synthetic_bank([GENERATION_BLOCK_SIZE] * PDF_BLOCKS)
+    compiled = CompiledQuestionBank(bank)
+    block_requests = {block_id: GENERATION_K for block_id in range(1, PDF_BLOCKS + 1)}
+    for num_tests in PDF_COPIES[quick]:
+        tests, _ = generate_all_tests_data(compiled, block_requests, num_tests, _nop_callback, rng=random.Random(seed))
+        def render():
+            pdf_generator._COPY_RENDER_CACHE.clear() # Ogni misura parte a freddo
+            pdf_data = pdf_generator.generate_pdf_data(tests, "Benchmark", _nop_callback, {}, seed=seed,
+                                                       render_mode=PDF_RENDER_MODE, max_workers=PDF_RENDER_MAX_WORKERS)
+            if pdf_data is None: raise RuntimeError("Rendering PDF non riuscito")
+        yield (f"pdf.t{num_tests}", _case_result(
+            "pdf", {'tests': num_tests, 'render_mode': PDF_RENDER_MODE, 'max_workers': PDF_RENDER_MAX_WORKERS},
+            _time_case(render, repeats=3), num_tests, "copie"))
+
+# ================================================================
+# Confronto con la Baseline / Baseline Comparison
+# ================================================================
+def compare_reports(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Righe (caso, mediana baseline, mediana attuale, rapporto, esito) per i casi presenti in entrambi i report;
+    esito "regressione" se rapporto > 1 + tolerance, "più veloce" se < 1 - tolerance, altrimenti "ok".
+    """
+    rows = []
+    for case_id, result in report['cases'].items():
+        previous = baseline.get('cases', {}).get(case_id)
+        if previous is None or previous.get('params') != result['params']: continue
+        ratio = result['seconds_median'] / previous['seconds_median'] if previous['seconds_median'] else None
+        if ratio is None: outcome = "ok"
+        elif ratio > 1 + tolerance: outcome = "regressione"
+        elif ratio < 1 - tolerance: outcome = "più veloce"
+        else: outcome = "ok"
+        rows.append((case_id, previous['seconds_median'], result['seconds_median'], ratio, outcome))
+    return rows
+
+def print_comparison(rows, report, baseline):
+    if (baseline.get('python'), baseline.get('platform')) != (report['python'], report['platform']):
+        print(f"Attenzione: baseline registrata su {baseline.get('platform')} / Python {baseline.get('python')}")
+    print(f"Confronto con la baseline del {baseline.get('created_at')}:")
+    for case_id, previous, current, ratio, outcome in rows:
+        ratio_text = f"x{ratio:.2f}" if ratio is not None else "-"
+        print(f"  {case_id:<28} {previous * 1000:>10.1f} ms -> {current * 1000:>10.1f} ms  {ratio_text:>7}  {outcome}")
+
+# ================================================================
+# Esecuzione / Run
+# ================================================================
+def run_benchmark(groups=GROUPS, seed=DEFAULT_SEED, quick=False, output=DEFAULT_OUTPUT):
+    report = {
+        'version': RESULTS_FORMAT_VERSION,
+        'created_at': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'python': sys.version.split()[0], 'platform': platform.platform(), 'seed': seed, 'quick': quick,
+        'cases': {},
+    }
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        case_sources = {
+            'parse': lambda: parse_cases(tmp_dir, quick),
+            'sampling': lambda: sampling_cases(seed, quick),
+            'generation': lambda: generation_cases(seed, quick),
+            'pdf': lambda: pdf_cases(seed, quick),
+        }
+        for group in groups:
+            for case_id, result in case_sources[group]():
+                report['cases'][case_id] = result
+                rate = f"  {result['items_per_second']:,.0f} {result['unit']}/s" if result.get('items_per_second') else ""
+                print(f"{case_id:<28} {result['seconds_median'] * 1000:>10.1f} ms (mediana di {result['repeats']}){rate}")
+    if output:
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, "w", encoding="utf-8") as f: json.dump(report, f, indent=2)
+        print(f"Risultati scritti in {output}")
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Regressione delle prestazioni della pipeline (parsing, campionamento, generazione, PDF).")
+    parser.add_argument("--only", choices=GROUPS, action="append", help="esegue solo questo gruppo di casi (ripetibile)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="file JSON dei risultati (default: %(default)s)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline da confrontare / salvare (default: %(default)s)")
+    parser.add_argument("--save-baseline", action="store_true", help="salva i risultati come nuova baseline invece di confrontarli")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="rallentamento relativo tollerato prima di segnalare una regressione (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--quick", action="store_true", help="griglie ridotte (verifica rapida della suite)")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.only or GROUPS, args.seed, args.quick, args.output)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f: json.dump(report, f, indent=2)
+        print(f"Baseline salvata in {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"Nessuna baseline in {args.baseline} (crearla con --save-baseline)")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f: baseline = json.load(f)
+    rows = compare_reports(report, baseline, args.tolerance)
+    print_comparison(rows, report, baseline)
+    regressions = [row for row in rows if row[4] == "regressione"]
+    if regressions: print(f"{len(regressions)} casi più lenti della baseline oltre il {args.tolerance:.0%}")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,45 @@
+# benchmarks/sampling.py
+# Confronto motore Python vs NumPy per weighted_random_sample_without_replacement.
+# Uso: python -m benchmarks.sampling
+import random
+import time
+
+import core_logic
+from core_logic import weighted_random_sample_without_replacement, weighted_random_sample_batch
+
+POPULATION_SIZES = [1_000, 10_000, 50_000]
+K_VALUES = [5, 50]
+REPEATS = 20
+BATCH_NUM_TESTS = 1_000
+
+def _time_call(func, repeats):
+    """Restituisce il tempo medio (secondi) di func() su repeats esecuzioni."""
+    start = time.perf_counter()
+    for _ in range(repeats): func()
+    return (time.perf_counter() - start) / repeats
+
+def run_benchmark():
+    if not core_logic.NUMPY_AVAILABLE:
+        print("NumPy non disponibile: benchmark saltato.")
+        return
+    random.seed(1234)
+    print(f"{'n':>8} {'k':>4} {'python ms':>11} {'numpy ms':>10} {'speedup':>8}")
+    for n in POPULATION_SIZES:
+        population = list(range(n))
+        weights = [random.randint(1, 10) for _ in range(n)]
+        for k in K_VALUES:
+            t_py = _time_call(lambda: weighted_random_sample_without_replacement(population, weights, k), REPEATS)
+            t_np = _time_call(lambda: weighted_random_sample_without_replacement(population, weights, k, engine="numpy"), REPEATS)
+            print(f"{n:>8} {k:>4} {t_py * 1000:>11.2f} {t_np * 1000:>10.2f} {t_py / t_np:>7.1f}x")
+
+    # Forma batch: BATCH_NUM_TESTS campionamenti in una sola chiamata
+    n, k = 10_000, 5
+    population = list(range(n))
+    weights = [1] * n
+    t_py = _time_call(lambda: [weighted_random_sample_without_replacement(population, weights, k) for _ in range(BATCH_NUM_TESTS)], 1)
+    t_np = _time_call(lambda: weighted_random_sample_batch(population, weights, k, BATCH_NUM_TESTS), 1)
+    print(f"\nBatch {BATCH_NUM_TESTS} campioni (n={n}, k={k}): python {t_py * 1000:.1f} ms, "
+          f"numpy batch {t_np * 1000:.1f} ms ({t_py / t_np:.1f}x)")
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,45 @@
+# benchmarks/startup.py
+# Tempo di import dei moduli caricati all'avvio di app.py, in un interprete nuovo (avvio a freddo).
+# Uso: python -m benchmarks.startup
+import statistics
+import subprocess
+import sys
+import time
+
+REPEATS = 5
+HEAVY_MODULES = ("weasyprint", "pandas", "numpy", "openpyxl")
+
+# Moduli importati da app.py prima di disegnare la pagina
+APP_IMPORTS = "import streamlit, localization, config, file_handler, parse_cache, core_logic, pdf_generator"
+# Versione precedente: in più pandas (app.py), numpy/pandas (test.py, core_logic) e WeasyPrint (pdf_generator)
+LEGACY_EXTRA_IMPORTS = """
+import pandas, numpy, test
+try:
+    import weasyprint
+except OSError:
+    pass
+"""
+
+def _run(code):
+    """Esegue code in un nuovo interprete; restituisce (secondi, moduli pesanti caricati)."""
+    probe = f"import sys; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", f"{code}\n{probe}"], capture_output=True, text=True, check=True)
+    elapsed = time.perf_counter() - start
+    return elapsed, result.stdout.strip().splitlines()[-1] if result.stdout.strip() else ""
+
+def _median_run(code):
+    runs = [_run(code) for _ in range(REPEATS)]
+    return statistics.median(t for t, _ in runs), runs[-1][1]
+
+def run_benchmark():
+    t_baseline, _ = _median_run("import streamlit")
+    t_app, loaded_app = _median_run(APP_IMPORTS)
+    t_legacy, loaded_legacy = _median_run(APP_IMPORTS + LEGACY_EXTRA_IMPORTS)
+    print(f"Mediana su {REPEATS} avvii a freddo (interprete nuovo):")
+    print(f"  solo streamlit:            {t_baseline:.2f} s")
+    print(f"  import pigri (attuale):    {t_app:.2f} s  moduli pesanti caricati: {loaded_app or 'nessuno'}")
+    print(f"  import all'avvio (prec.):  {t_legacy:.2f} s  moduli pesanti caricati: {loaded_legacy or 'nessuno'}")
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,209 @@
+# cli.py
+# Generazione delle verifiche da riga di comando, senza Streamlit (es. lotti notturni per ogni corso).
+# Uso: python cli.py domande.xlsx --k 1=4 --k 2=3 --copies 30 --seed 1234 --output verifiche.pdf
+import argparse
+import math
+import os
+import random
+import sys
+
+from config import (
+    DEFAULT_NUM_TESTS, DEFAULT_RECENCY_WEIGHTING, DEFAULT_RECENCY_HALF_LIFE,
+    DEFAULT_SAMPLING_MODE, GLOBAL_SAMPLING_TIME_BUDGET,
+    PDF_RENDER_MODE, PDF_RENDER_MAX_WORKERS, PDF_STREAM_MIN_COPIES
+)
+from core_logic import generate_all_tests_data, new_seed
+from file_handler import load_questions_from_excel
+from instrumentation import Profiler
+from localization import TEXTS, get_text, format_text, get_pdf_strings
+from pdf_generator import generate_pdf_data, generate_pdf_file
+from seating import grid_adjacency, load_adjacency_json
+
+RECENCY_OPTIONS = ("exponential", "linear", "none")
+SAMPLING_MODES = ("sequential", "global", "seating")
+OUTPUT_EXTENSIONS = (".pdf", ".zip")
+
+# ================================================================
+# Argomenti / Arguments
+# ================================================================
+def _block_request(value):
+    """'BLOCCO=K' -> (block_id, k)."""
+    try:
+        block_id, k = value.split("=")
+        block_id, k = int(block_id), int(k)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"atteso BLOCCO=K (es. 2=4), ricevuto {value!r}")
+    if k < 0: raise argparse.ArgumentTypeError(f"k negativo per il blocco {block_id}")
+    return block_id, k
+
+def _copy_numbers(value):
+    """'3,7' -> [3, 7] (stesso formato del campo Copie dell'app)."""
+    try:
+        return sorted({int(c) for c in value.replace(';', ',').split(',') if c.strip()}) or None
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"copie non valide: {value!r}")
+
+def _seating_layout(value, diagonal):
+    """'RIGHExCOLONNE' (es. 10x30) o percorso di un JSON di adiacenza -> lista dei vicini di ogni posto."""
+    rows, separator, cols = value.lower().partition("x")
+    if separator and rows.strip().isdigit() and cols.strip().isdigit():
+        return grid_adjacency(int(rows), int(cols), diagonal)
+    return load_adjacency_json(value)
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="cli.py", description="Genera le verifiche PDF da una banca domande (.xlsx, .xls, .csv) senza interfaccia.")
+    parser.add_argument("bank", help="file della banca domande (blocchi separati da una riga vuota)")
+    parser.add_argument("-k", "--k", dest="block_requests", metavar="BLOCCO=K", type=_block_request, action="append",
+                        help="domande da estrarre dal blocco (ripetibile); i blocchi non indicati usano floor(n/3) come l'app")
+    parser.add_argument("-n", "--copies", type=int, default=None,
+                        help=f"numero di copie (default: {DEFAULT_NUM_TESTS}, o un posto per copia con --seating)")
+    parser.add_argument("-s", "--seed", type=int, default=None, help="seed del lotto (default: nuovo seed casuale, stampato sulle copie)")
+    parser.add_argument("-o", "--output", required=True, help="file di output: .pdf (unico PDF) o .zip (un PDF per copia)")
+    parser.add_argument("--subject", default=None, help="materia stampata nel titolo")
+    parser.add_argument("--lang", choices=sorted(TEXTS), default="it", help="lingua di PDF e messaggi (default: %(default)s)")
+    parser.add_argument("--recency", choices=RECENCY_OPTIONS, default=DEFAULT_RECENCY_WEIGHTING,
+                        help="pesatura di recenza WRSwOR (default: %(default)s)")
+    parser.add_argument("--half-life", type=float, default=DEFAULT_RECENCY_HALF_LIFE,
+                        help="emivita in test della pesatura esponenziale (default: %(default)s)")
+    parser.add_argument("--sampling", choices=SAMPLING_MODES, default=None,
+                        help=f"sequential: copia per copia con recenza; global: intero lotto ottimizzato su tutte le coppie; "
+                             f"seating: nessuna domanda in comune tra posti vicini (default: {DEFAULT_SAMPLING_MODE}, seating con --seating)")
+    parser.add_argument("--time-budget", type=float, default=GLOBAL_SAMPLING_TIME_BUDGET,
+                        help="secondi massimi dell'ottimizzazione globale (default: %(default)s)")
+    parser.add_argument("--seating", default=None, metavar="RIGHExCOLONNE|FILE.json",
+                        help="disposizione dei posti (copia i al posto i, per righe): griglia (es. 10x30) o JSON con i vicini di ogni posto")
+    parser.add_argument("--no-diagonal", action="store_true", help="nella griglia i vicini in diagonale non contano")
+    parser.add_argument("--only-copies", type=_copy_numbers, default=None, metavar="N[,N...]",
+                        help="ristampa solo queste copie del lotto (richiede lo stesso --seed)")
+    parser.add_argument("--profile", default=None, metavar="FILE.json", help="scrive il profilo dei tempi dell'esecuzione in JSON")
+    parser.add_argument("-q", "--quiet", action="store_true", help="non mostra l'avanzamento")
+    return parser
+
+# ================================================================
+# Esecuzione / Run
+# ================================================================
+def make_status_callback(lang, show_progress):
+    """status_callback che scrive warning/error (e, se richiesto, l'avanzamento) su stderr."""
+    def status_callback(msg_type, msg_key, **kwargs):
+        if msg_type == "progress":
+            if show_progress:
+                end = "\n" if kwargs.get("done") == kwargs.get("total") else ""
+                print(f"\r{format_text(lang, msg_key, **kwargs)}", end=end, file=sys.stderr, flush=True)
+            return
+        if msg_type not in ("warning", "error"): return
+        formatted_text = format_text(lang, msg_key, **kwargs)
+        if formatted_text.startswith("MISSING_TEXT["): formatted_text = f"{msg_key}: {kwargs}"
+        print(f"[{msg_type}] {formatted_text}", file=sys.stderr)
+    return status_callback
+
+def run(args):
+    """Analisi del file, campionamento e rendering. Restituisce il codice di uscita (0 = successo)."""
+    lang = args.lang
+    _, output_extension = os.path.splitext(args.output)
+    output_extension = output_extension.lower()
+    if output_extension not in OUTPUT_EXTENSIONS:
+        print(f"[error] Estensione di output non supportata: {args.output} (usa .pdf o .zip)", file=sys.stderr)
+        return 2
+    sampling_mode = args.sampling or ("seating" if args.seating else DEFAULT_SAMPLING_MODE)
+    seating = None
+    if sampling_mode == "seating":
+        if not args.seating:
+            print("[error] --sampling seating richiede --seating", file=sys.stderr)
+            return 2
+        try:
+            seating = _seating_layout(args.seating, diagonal=not args.no_diagonal)
+        except (ValueError, OSError) as e:
+            print(f"[error] Disposizione dei posti non valida ({args.seating}): {e}", file=sys.stderr)
+            return 2
+    elif args.seating:
+        print(f"[error] --seating non è compatibile con --sampling {sampling_mode}", file=sys.stderr)
+        return 2
+    num_tests = args.copies if args.copies is not None else (len(seating) if seating else DEFAULT_NUM_TESTS)
+    if seating is not None and num_tests != len(seating):
+        print(f"[error] --copies ({num_tests}) diverso dal numero di posti ({len(seating)})", file=sys.stderr)
+        return 2
+    if num_tests < 1:
+        print("[error] --copies deve essere almeno 1", file=sys.stderr)
+        return 2
+    if args.only_copies and not all(1 <= c <= num_tests for c in args.only_copies):
+        print(format_text(lang, "COPIES_INVALID_ERROR", value=args.only_copies, num_tests=num_tests), file=sys.stderr)
+        return 2
+
+    profiler = Profiler(metadata={'bank': os.path.basename(args.bank), 'output': os.path.basename(args.output)})
+    status_callback = profiler.wrap_callback(make_status_callback(lang, show_progress=not args.quiet and sys.stderr.isatty()))
+
+    output_directory = os.path.dirname(os.path.abspath(args.output))
+    if not os.path.isdir(output_directory):
+        print(f"[error] Cartella di output inesistente: {output_directory}", file=sys.stderr)
+        return 2
+    try:
+        with open(args.bank, "rb") as bank_file:
+            all_questions, blocks_summary, error_key = load_questions_from_excel(
+                bank_file, status_callback, cache=None, profiler=profiler) # Un solo uso: la cache non serve
+    except OSError as e:
+        print(f"[error] Impossibile leggere la banca domande ({args.bank}): {e}", file=sys.stderr)
+        return 2
+    if error_key: return 1
+
+    block_sizes = {b['block_id']: b['count'] for b in blocks_summary}
+    block_requests = {block_id: math.floor(count / 3) for block_id, count in block_sizes.items()}
+    for block_id, k in args.block_requests or ():
+        if block_id not in block_sizes:
+            status_callback("error", "BLOCK_NOT_FOUND_OR_EMPTY", block_id=block_id)
+            return 1
+        block_requests[block_id] = k
+    if not any(k > 0 for k in block_requests.values()):
+        status_callback("error", "TOTAL_QUESTIONS_ZERO_ERROR_BLOCKS")
+        return 1
+
+    seed = args.seed if args.seed is not None else new_seed()
+    subject = args.subject if args.subject is not None else get_text(lang, "SUBJECT_DEFAULT")
+    profiler.metadata.update(num_tests=num_tests, seed=seed, recency_weighting=args.recency, sampling_mode=sampling_mode,
+                             block_requests={str(block_id): k for block_id, k in block_requests.items()})
+
+    tests_data, generation_messages = generate_all_tests_data(
+        all_questions, block_requests, num_tests, status_callback,
+        recency_weighting=args.recency, recency_half_life=args.half_life,
+        rng=random.Random(seed), profiler=profiler, sampling_mode=sampling_mode, global_time_budget=args.time_budget,
+        seating=seating
+    )
+    for msg_type, msg_key, msg_kwargs in generation_messages: status_callback(msg_type, msg_key, **msg_kwargs)
+    if any(m[0] == 'error' for m in generation_messages): return 1
+
+    pdf_strings = get_pdf_strings(lang)
+    num_copies = len(args.only_copies) if args.only_copies else num_tests
+    try:
+        if output_extension == ".zip" or num_copies >= PDF_STREAM_MIN_COPIES:
+            # Una copia alla volta su file temporaneo nella cartella di destinazione, poi rinominato
+            output_format = output_extension.lstrip(".")
+            path, written_format = generate_pdf_file(tests_data, subject, status_callback, pdf_strings, seed=seed,
+                                                     copy_numbers=args.only_copies, output_format=output_format,
+                                                     directory=output_directory, profiler=profiler)
+            if path is None: return 1
+            output_path = args.output if written_format == output_format else os.path.splitext(args.output)[0] + f".{written_format}"
+            try:
+                os.replace(path, output_path)
+            except OSError:
+                os.remove(path)
+                raise
+        else:
+            pdf_data = generate_pdf_data(tests_data, subject, status_callback, pdf_strings, seed=seed,
+                                         copy_numbers=args.only_copies, render_mode=PDF_RENDER_MODE,
+                                         max_workers=PDF_RENDER_MAX_WORKERS, profiler=profiler)
+            if pdf_data is None: return 1
+            output_path = args.output
+            with open(output_path, "wb") as f: f.write(pdf_data)
+    except OSError as e:
+        print(f"[error] Impossibile scrivere l'output ({args.output}): {e}", file=sys.stderr)
+        return 2
+
+    if args.profile: profiler.write_json(args.profile)
+    print(f"{output_path}\t{num_copies} copie\tseed {seed}")
+    return 0
+
+def main(argv=None):
+    return run(build_parser().parse_args(argv))
+
+if __name__ == "__main__":
+    sys.exit(main())
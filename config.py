@@ -6,3 +6,45 @@ DEFAULT_NUM_TESTS = 30
 # Path delle immagini di esempio (relativo allo script app.py)
 EXAMPLE_IMAGE_PATH = "excel_example.jpg"
 ANALYSIS_IMAGE_PATH = "analisi.jpg" # <-- NUOVA COSTANTE
+
+# Pesatura di recenza per WRSwOR: "exponential", "linear" o "none"
+DEFAULT_RECENCY_WEIGHTING = "exponential"
+# Emivita (in numero di test) della penalità per le domande usate di recente
+DEFAULT_RECENCY_HALF_LIFE = 2.0
+
+# Campionamento: "sequential" (copia per copia, WRSwOR con recenza) o "global" (intero lotto ottimizzato
+# per la massima sovrapposizione tra qualsiasi coppia di copie, vedi batch_design.py)
+DEFAULT_SAMPLING_MODE = "sequential"
+# Iterazioni della ricerca locale globale (criterio di arresto deterministico: stesso seed, stesso lotto)
+GLOBAL_SAMPLING_MAX_ITERATIONS = 20_000
+# Tempo massimo (secondi) della ricerca globale; se interrompe la ricerca, il lotto può dipendere dalla macchina
+GLOBAL_SAMPLING_TIME_BUDGET = 10.0
+
+# Numero di run Monte Carlo del test funzionale (eseguite in parallelo su più processi)
+VALIDATION_MONTE_CARLO_RUNS = 200
+# Processi del Monte Carlo di validazione quando il chiamante non li indica (al più il numero di CPU)
+VALIDATION_MAX_WORKERS = 4
+# Processi per ogni job di validazione avviato dall'app (al più JOB_MAX_WORKERS job insieme nel server)
+VALIDATION_JOB_MAX_WORKERS = 2
+
+# Cache delle banche domande analizzate (chiave: SHA-256 del file), condivisa tra le sessioni
+PARSE_CACHE_MAX_BYTES = 64 * 1024 * 1024 # Limite sui dati compressi
+PARSE_CACHE_DIR = None # Cartella per la persistenza su disco (es. ".parse_cache"); None = solo in memoria
+
+# Rendering PDF: "per_copy" (un documento per copia, pagine unite) o "single" (un unico documento)
+PDF_RENDER_MODE = "per_copy"
+# Processi per il rendering "per_copy" (1 = nel processo corrente; > 1 richiede pypdf per l'unione)
+PDF_RENDER_MAX_WORKERS = 1
+# PDF delle copie renderizzate tenuti in cache (chiave: hash dell'HTML della copia); 0 = nessuna cache
+PDF_COPY_CACHE_MAX_BYTES = 16 * 1024 * 1024
+
+# Da questo numero di copie il PDF viene scritto su file temporaneo una copia alla volta
+PDF_STREAM_MIN_COPIES = 100
+# Formato dell'output su file: "zip" (un PDF per copia) o "pdf" (unico, richiede pypdf)
+PDF_STREAM_OUTPUT_FORMAT = "zip"
+
+# Job in background (generazione/validazione): thread condivisi dal server e durata dei risultati
+JOB_MAX_WORKERS = 2
+JOB_RESULT_TTL_SECONDS = 3600
+# Intervallo (secondi) di aggiornamento della barra di avanzamento nell'app
+JOB_POLL_SECONDS = 1.0
@@ -2,146 +2,558 @@
 import random
 import math
 import heapq
+import importlib.util
+from array import array
 from collections import defaultdict # Necessario per raggruppare domande
 
+# NumPy (motore di campionamento vettoriale opzionale): solo verifica di presenza all'avvio,
+# il modulo viene importato al primo utilizzo del motore "numpy" (_require_numpy)
+NUMPY_AVAILABLE = importlib.util.find_spec("numpy") is not None
+np = None
+
+from batch_design import design_batch
+from config import (
+    DEFAULT_RECENCY_WEIGHTING, DEFAULT_RECENCY_HALF_LIFE,
+    DEFAULT_SAMPLING_MODE, GLOBAL_SAMPLING_MAX_ITERATIONS, GLOBAL_SAMPLING_TIME_BUDGET
+)
+from instrumentation import NULL_PROFILER
+from question_bank import QuestionBank
+from seating import assign_seating
+
+_EXP_REBASE_HALF_LIVES = 256 # Età massima (in emivite) distinta dalla pesatura esponenziale
+
+# ================================================================
+# Generatori Casuali / Random Generators
+# ================================================================
+def new_seed():
+    """Nuovo seed casuale (32 bit) da registrare per rendere riproducibile una generazione."""
+    return random.SystemRandom().randrange(2**32)
+
+def _resolve_rng(rng):
+    """Restituisce rng, o un nuovo random.Random indipendente se rng è None (mai lo stato globale)."""
+    return rng if rng is not None else random.Random()
+
 # ================================================================
 # Funzione Helper WRSwOR / WRSwOR Helper Function
 # ================================================================
-def weighted_random_sample_without_replacement(population, weights, k):
+def _is_valid_weight(w):
+    """Un peso è valido se numerico e strettamente positivo."""
+    return isinstance(w, (int, float)) and w > 0
+
+def weighted_random_sample_without_replacement(population, weights, k, engine="python", rng=None):
     """
     Seleziona k elementi unici da una popolazione data, senza reinserimento,
-    utilizzando un campionamento ponderato. (Implementazione A-ExpJ)
+    utilizzando un campionamento ponderato (A-ExpJ, vedi weighted_random_sample_stream).
+    engine="numpy" usa il motore vettoriale (richiede NumPy), con la stessa semantica.
+    rng: random.Random (o numpy Generator con engine="numpy"); None = generatore nuovo.
     """
+    if engine == "numpy":
+        return _weighted_sample_numpy(population, weights, k, rng)
+    if engine != "python": raise ValueError(f"Motore di campionamento sconosciuto: {engine}")
+    rng = _resolve_rng(rng)
     n = len(population)
     if k < 0: raise ValueError("k non può essere negativo")
     if k == 0: return []
     if k >= n:
         shuffled_population = list(population)
-        random.shuffle(shuffled_population)
+        rng.shuffle(shuffled_population)
         return shuffled_population
     if n != len(weights): raise ValueError("Lunghezze popolazione e pesi non coincidono")
-    valid_indices = [i for i, w in enumerate(weights) if isinstance(w, (int, float)) and w > 0]
-    if k > len(valid_indices): raise ValueError(f"k ({k}) > n. elementi con peso positivo ({len(valid_indices)})")
-    population_valid = [population[i] for i in valid_indices]
-    weights_valid = [weights[i] for i in valid_indices]
-    if k >= len(population_valid):
-         shuffled_valid = list(population_valid)
-         random.shuffle(shuffled_valid)
+    n_valid = sum(1 for w in weights if _is_valid_weight(w))
+    if k > n_valid: raise ValueError(f"k ({k}) > n. elementi con peso positivo ({n_valid})")
+    if k >= n_valid:
+         shuffled_valid = [item for item, w in zip(population, weights) if _is_valid_weight(w)]
+         rng.shuffle(shuffled_valid)
          return shuffled_valid
-    min_heap = []
-    for i, item in enumerate(population_valid):
-        weight = weights_valid[i]; u = random.uniform(1e-9, 1.0)
-        try: key = u**(1.0 / (weight + 1e-9))
-        except OverflowError: key = float('inf')
-        except ZeroDivisionError: key = float('inf')
-        if len(min_heap) < k: heapq.heappush(min_heap, (key, item))
-        elif key > min_heap[0][0]: heapq.heapreplace(min_heap, (key, item))
-    return [item for key, item in min_heap]
+    return weighted_random_sample_stream(zip(population, weights), k, rng)
+
+def weighted_random_sample_stream(weighted_items, k, rng=None):
+    """
+    Campionamento ponderato senza reinserimento su un iterabile di coppie
+    (elemento, peso), in un solo passaggio e con memoria O(k).
+    Implementa A-ExpJ (Efraimidis-Spirakis, salti esponenziali): dopo aver riempito
+    il reservoir, estrae un numero casuale solo per l'elemento che conclude il salto,
+    saltando gli altri senza chiamate al generatore. Chiavi in spazio logaritmico
+    (log(u)/w) per evitare underflow con pesi grandi.
+    Elementi con peso non numerico o <= 0 vengono ignorati.
+    Solleva ValueError se gli elementi con peso positivo sono meno di k.
+    """
+    if k < 0: raise ValueError("k non può essere negativo")
+    if k == 0: return []
+    rng = _resolve_rng(rng)
+    min_heap = [] # (chiave_log, contatore, elemento): il contatore evita confronti tra elementi
+    items_iter = iter(weighted_items)
+    counter = 0
+    # 1. Riempie il reservoir con i primi k elementi validi
+    for item, weight in items_iter:
+        if not _is_valid_weight(weight): continue
+        key = math.log(1.0 - rng.random()) / weight
+        heapq.heappush(min_heap, (key, counter, item)); counter += 1
+        if len(min_heap) == k: break
+    if len(min_heap) < k:
+        raise ValueError(f"k ({k}) > n. elementi con peso positivo ({len(min_heap)})")
+    # 2. Salti esponenziali sul resto dello stream
+    threshold = min_heap[0][0] # log della chiave minima (<= 0)
+    jump = math.log(1.0 - rng.random()) / threshold if threshold < 0 else float('inf')
+    for item, weight in items_iter:
+        if not _is_valid_weight(weight): continue
+        jump -= weight
+        if jump > 0: continue
+        # L'elemento corrente entra nel reservoir con chiave in (soglia, 0]
+        t_w = math.exp(threshold * weight)
+        u = rng.uniform(t_w, 1.0)
+        key = math.log(u) / weight if u > 0 else threshold
+        heapq.heapreplace(min_heap, (max(key, threshold), counter, item)); counter += 1
+        threshold = min_heap[0][0]
+        jump = math.log(1.0 - rng.random()) / threshold if threshold < 0 else float('inf')
+    return [item for key, cnt, item in min_heap]
+
+# ================================================================
+# Motore NumPy WRSwOR / NumPy WRSwOR Engine
+# ================================================================
+def _require_numpy():
+    """Importa NumPy al primo utilizzo (non all'import del modulo, per non rallentare l'avvio dell'app)."""
+    global np
+    if np is None:
+        if not NUMPY_AVAILABLE: raise RuntimeError("NumPy non disponibile: usare engine='python'")
+        import numpy
+        np = numpy
+    return np
+
+def _get_numpy_rng(rng=None):
+    """
+    Restituisce un numpy Generator: rng stesso se lo è già, uno derivato in modo
+    deterministico se rng è un random.Random, altrimenti uno nuovo.
+    """
+    _require_numpy()
+    if rng is None: return np.random.default_rng()
+    if isinstance(rng, random.Random): return np.random.default_rng(rng.getrandbits(128))
+    return rng
+
+def _valid_weight_indices_numpy(population, weights, k):
+    """
+    Valida i pesi come la versione Python e restituisce (indici_validi, pesi_validi)
+    come array NumPy, considerando solo gli elementi con peso numerico positivo.
+    """
+    n = len(population)
+    if n != len(weights): raise ValueError("Lunghezze popolazione e pesi non coincidono")
+    try: weights_arr = np.asarray(weights)
+    except (ValueError, TypeError): weights_arr = None
+    if weights_arr is not None and weights_arr.ndim == 1 and weights_arr.dtype.kind in "biuf":
+        # Caso comune: pesi tutti numerici, validazione interamente vettoriale
+        weights_arr = weights_arr.astype(np.float64, copy=False)
+        valid_indices = np.flatnonzero(weights_arr > 0)
+    else:
+        valid_indices = np.fromiter(
+            (i for i, w in enumerate(weights) if _is_valid_weight(w)),
+            dtype=np.intp)
+        weights_arr = np.fromiter((float(w) if isinstance(w, (int, float)) else 0.0 for w in weights),
+                                  dtype=np.float64, count=n)
+    if k > len(valid_indices): raise ValueError(f"k ({k}) > n. elementi con peso positivo ({len(valid_indices)})")
+    return valid_indices, weights_arr[valid_indices]
+
+def _weighted_sample_numpy(population, weights, k, rng=None):
+    """
+    Versione vettoriale di weighted_random_sample_without_replacement.
+    Chiavi in spazio logaritmico log(u)/w (stesso ordinamento di u**(1/w)),
+    i k massimi sono scelti con argpartition.
+    """
+    n = len(population)
+    if k < 0: raise ValueError("k non può essere negativo")
+    if k == 0: return []
+    gen = _get_numpy_rng(rng)
+    if k >= n:
+        return [population[i] for i in gen.permutation(n).tolist()]
+    valid_indices, weights_valid = _valid_weight_indices_numpy(population, weights, k)
+    n_valid = len(valid_indices)
+    if k >= n_valid:
+        return [population[i] for i in valid_indices[gen.permutation(n_valid)].tolist()]
+    keys = np.log(gen.uniform(1e-9, 1.0, size=n_valid)) / weights_valid
+    top = np.argpartition(-keys, k - 1)[:k]
+    return [population[i] for i in valid_indices[top].tolist()]
+
+def weighted_random_sample_batch(population, weights, k, num_samples, rng=None):
+    """
+    Esegue num_samples campionamenti WRSwOR indipendenti sulla stessa popolazione
+    in un'unica operazione NumPy (matrice di chiavi num_samples x n).
+    Restituisce una lista di num_samples liste da k elementi ciascuna.
+    """
+    if num_samples < 0: raise ValueError("num_samples non può essere negativo")
+    n = len(population)
+    if k < 0: raise ValueError("k non può essere negativo")
+    if k == 0 or num_samples == 0: return [[] for _ in range(num_samples)]
+    gen = _get_numpy_rng(rng)
+    if k >= n:
+        perms = gen.permuted(np.tile(np.arange(n), (num_samples, 1)), axis=1)
+        return [[population[i] for i in row] for row in perms.tolist()]
+    valid_indices, weights_valid = _valid_weight_indices_numpy(population, weights, k)
+    n_valid = len(valid_indices)
+    if k >= n_valid:
+        perms = gen.permuted(np.tile(valid_indices, (num_samples, 1)), axis=1)
+        return [[population[i] for i in row] for row in perms.tolist()]
+    keys = np.log(gen.uniform(1e-9, 1.0, size=(num_samples, n_valid))) / weights_valid
+    top = np.argpartition(-keys, k - 1, axis=1)[:, :k]
+    return [[population[i] for i in row] for row in valid_indices[top].tolist()]
+
+# ================================================================
+# Banca Domande Compilata / Compiled Question Bank
+# ================================================================
+class CompiledQuestionBank:
+    """
+    Strutture indice per blocco costruite una sola volta da all_questions_list:
+    array degli original_index per blocco e mappa original_index -> domanda.
+    Con una QuestionBank colonnare usa direttamente le sue fette per blocco e la sua
+    ricerca per original_index, senza copiare le domande.
+    Non cambia durante la generazione e può essere riusata tra più chiamate.
+    """
+    __slots__ = ('block_indices', 'questions_by_index')
+
+    def __init__(self, all_questions_list):
+        if isinstance(all_questions_list, QuestionBank):
+            self.block_indices = {block_id: all_questions_list.block_original_indices(block_id)
+                                  for block_id in all_questions_list.block_ranges}
+            self.questions_by_index = all_questions_list.by_original_index
+            return
+        indices_by_block = defaultdict(lambda: array('q'))
+        self.questions_by_index = {}
+        for q in all_questions_list:
+            indices_by_block[q['block_id']].append(q['original_index'])
+            self.questions_by_index[q['original_index']] = q
+        self.block_indices = dict(indices_by_block)
+
+    def block_size(self, block_id):
+        indices = self.block_indices.get(block_id)
+        return len(indices) if indices is not None else 0
+
+    def new_block_state(self, block_id, rng, recency_weighting="none", recency_half_life=DEFAULT_RECENCY_HALF_LIFE):
+        """
+        Crea lo stato di campionamento di un blocco per una singola generazione:
+        rotazione uniforme per recency_weighting="none", altrimenti pesi di recenza
+        mantenuti incrementalmente ("linear" o "exponential"). Estrae da rng.
+        """
+        if recency_weighting == "none":
+            return _BlockRotation(self.block_indices[block_id], rng)
+        return _RecencyWeightedBlock(self.block_indices[block_id], rng, recency_weighting, recency_half_life)
+
+
+class _BlockRotation:
+    """
+    Stato 'last_used' di un blocco senza insiemi: pool è una permutazione degli
+    indici del blocco in cui gli ultimi num_recent elementi sono quelli usati nel
+    test precedente. Il complemento di last_used è quindi il prefisso pool[:available],
+    e ogni aggiornamento costa O(k) scambi.
+    """
+    __slots__ = ('pool', 'positions', 'num_recent', 'rng')
+
+    def __init__(self, block_indices, rng):
+        self.rng = rng
+        self.pool = array('q', block_indices)
+        self.positions = {idx: pos for pos, idx in enumerate(self.pool)}
+        self.num_recent = 0
+
+    @property
+    def available(self):
+        return len(self.pool) - self.num_recent
+
+    def sample_available(self, k, i_test):
+        """k indici uniformi dal complemento di last_used (O(k))."""
+        pool = self.pool
+        return [pool[pos] for pos in self.rng.sample(range(self.available), k)]
+
+    def sample_all(self, k):
+        """k indici uniformi dall'intero blocco (O(k))."""
+        pool = self.pool
+        return [pool[pos] for pos in self.rng.sample(range(len(pool)), k)]
+
+    def mark_recent(self, selected_indices, i_test):
+        """Sposta in coda gli indici selezionati: diventano il nuovo last_used."""
+        pool, positions = self.pool, self.positions
+        tail = len(pool) - 1
+        for offset, idx in enumerate(selected_indices):
+            pos, target = positions[idx], tail - offset
+            other = pool[target]
+            pool[pos], pool[target] = other, idx
+            positions[other], positions[idx] = pos, target
+        self.num_recent = len(selected_indices)
+
+
+class _RecencyWeightedBlock:
+    """
+    Stato di un blocco con pesatura di recenza, mantenuto in un segment tree sui
+    pesi per-domanda. Ogni test aggiorna solo le foglie delle k domande estratte e
+    delle k del test precedente: O(k log n), senza ricalcolare i pesi del blocco.
+    - "linear": peso = i_test - last_used + 1 (come old_evilprof). Il nodo conserva
+      (n. disponibili, somma dei last_used) in interi, così il peso di un sottoalbero
+      (i_test + 1) * count - sum è esatto per ogni test senza aggiornamenti.
+    - "exponential": peso = 2 ** ((i_test - last_used) / half_life), cioè la
+      penalità di una domanda usata si dimezza ogni half_life test. Il fattore
+      comune 2 ** (i_test / half_life) non cambia le probabilità, quindi le foglie
+      restano costanti finché la domanda non viene riestratta (ribasamento O(n)
+      solo ogni _EXP_REBASE_HALF_LIVES emivite, per evitare underflow).
+    Le domande del test precedente hanno peso 0 (garanzia di diversità adiacente).
+    """
+    __slots__ = ('indices', 'positions', 'last_used', 'mode', 'half_life', 'base',
+                 'size', 'tree_count', 'tree_sum', 'recent_positions', 'rng')
+
+    def __init__(self, block_indices, rng, mode, half_life):
+        if mode not in ("linear", "exponential"): raise ValueError(f"Pesatura di recenza sconosciuta: {mode}")
+        if mode == "exponential" and not half_life > 0: raise ValueError("recency_half_life deve essere positivo")
+        self.rng = rng
+        self.indices = array('q', block_indices)
+        self.positions = {idx: pos for pos, idx in enumerate(self.indices)}
+        self.last_used = [0] * len(self.indices) # 0 = mai usata (come old_evilprof)
+        self.mode, self.half_life, self.base = mode, half_life, 0
+        self.size = 1
+        while self.size < len(self.indices): self.size *= 2
+        self.recent_positions = []
+        self._rebuild()
+
+    def _leaf_values(self, pos):
+        """Valori (count, sum) della foglia pos se la domanda è disponibile."""
+        if self.mode == "linear":
+            return 1, self.last_used[pos]
+        exponent = min(self.base - self.last_used[pos], _EXP_REBASE_HALF_LIVES * self.half_life) / self.half_life
+        return 2.0 ** exponent, 0
+
+    def _rebuild(self):
+        """Ricostruisce l'intero albero (O(n)): solo all'inizio e ai ribasamenti."""
+        size, zero = self.size, (0 if self.mode == "linear" else 0.0)
+        self.tree_count = [zero] * (2 * size)
+        self.tree_sum = [0] * (2 * size)
+        recent = set(self.recent_positions)
+        for pos in range(len(self.indices)):
+            if pos not in recent:
+                self.tree_count[size + pos], self.tree_sum[size + pos] = self._leaf_values(pos)
+        for node in range(size - 1, 0, -1):
+            self.tree_count[node] = self.tree_count[2 * node] + self.tree_count[2 * node + 1]
+            self.tree_sum[node] = self.tree_sum[2 * node] + self.tree_sum[2 * node + 1]
+
+    def _set_leaf(self, pos, count, total):
+        """Imposta una foglia e ricalcola gli antenati come somma dei figli (nessuna deriva numerica)."""
+        node = self.size + pos
+        tree_count, tree_sum = self.tree_count, self.tree_sum
+        tree_count[node], tree_sum[node] = count, total
+        node //= 2
+        while node:
+            tree_count[node] = tree_count[2 * node] + tree_count[2 * node + 1]
+            tree_sum[node] = tree_sum[2 * node] + tree_sum[2 * node + 1]
+            node //= 2
+
+    @property
+    def available(self):
+        return len(self.indices) - len(self.recent_positions)
+
+    def sample_available(self, k, i_test):
+        """k indici dal complemento di last_used, estratti in sequenza proporzionalmente ai pesi."""
+        if k > self.available: raise ValueError(f"k ({k}) > n. candidati disponibili ({self.available})")
+        if self.mode == "exponential" and i_test - self.base > _EXP_REBASE_HALF_LIVES * self.half_life:
+            self.base = i_test; self._rebuild()
+        tree_count, tree_sum, size = self.tree_count, self.tree_sum, self.size
+        scale = i_test + 1 if self.mode == "linear" else 1
+        zero = 0 if self.mode == "linear" else 0.0
+        picked_positions = []
+        for _ in range(k):
+            total = scale * tree_count[1] - tree_sum[1]
+            target = self.rng.randrange(total) if self.mode == "linear" else self.rng.random() * total
+            node = 1
+            while node < size:
+                left, right = 2 * node, 2 * node + 1
+                weight_left = scale * tree_count[left] - tree_sum[left]
+                weight_right = scale * tree_count[right] - tree_sum[right]
+                if target < weight_left or weight_right <= 0: node = left
+                else: target -= weight_left; node = right
+            pos = node - size
+            picked_positions.append(pos)
+            self._set_leaf(pos, zero, 0) # Esclusa dalle estrazioni successive
+        return [self.indices[pos] for pos in picked_positions]
+
+    def sample_all(self, k):
+        """k indici uniformi dall'intero blocco (fallback, ignora i pesi)."""
+        indices = self.indices
+        return [indices[pos] for pos in self.rng.sample(range(len(indices)), k)]
+
+    def mark_recent(self, selected_indices, i_test):
+        """Riattiva le domande del test precedente e registra le nuove come last_used."""
+        zero = 0 if self.mode == "linear" else 0.0
+        new_positions = [self.positions[idx] for idx in selected_indices]
+        for pos in self.recent_positions:
+            self._set_leaf(pos, *self._leaf_values(pos))
+        for pos in new_positions:
+            self.last_used[pos] = i_test
+            self._set_leaf(pos, zero, 0)
+        self.recent_positions = new_positions
 
 # ================================================================
 # Logica Generazione Test basata su Blocchi / Block-Based Test Generation Logic
 # ================================================================
-def generate_all_tests_data(all_questions_list, block_requests, num_tests, status_callback):
+def generate_all_tests_data(all_questions_list, block_requests, num_tests, status_callback,
+                            recency_weighting=DEFAULT_RECENCY_WEIGHTING, recency_half_life=DEFAULT_RECENCY_HALF_LIFE,
+                            rng=None, profiler=None, sampling_mode=DEFAULT_SAMPLING_MODE,
+                            global_time_budget=GLOBAL_SAMPLING_TIME_BUDGET, global_max_iterations=GLOBAL_SAMPLING_MAX_ITERATIONS,
+                            seating=None):
     """
     Genera dati test. Usa Simple Random Sampling se k richiesto >= n_blocco / 2,
-    altrimenti usa WRSwOR. Chiama status_callback solo per warning/error critici.
+    altrimenti usa WRSwOR. Chiama status_callback per warning/error critici e, dopo ogni test,
+    con msg_type "progress" (CL_TESTS_SAMPLED, done/total).
+    all_questions_list può essere anche una CompiledQuestionBank già costruita.
+    recency_weighting ("exponential", "linear" o "none") sceglie i pesi WRSwOR in base
+    a quanti test sono passati dall'ultimo utilizzo di ogni domanda.
+    rng: random.Random usato per tutte le estrazioni (es. random.Random(seed) per
+    rigenerare esattamente lo stesso lotto); None = generatore nuovo e indipendente.
+    profiler: Profiler (instrumentation) che riceve le fasi sampling.compile e sampling.tests
+    e i contatori sampling.tests_generated e sampling.fallback_activations (per block_id).
+    sampling_mode="global": l'intero lotto è costruito da batch_design (la pesatura di recenza
+    non si applica), con global_max_iterations e global_time_budget (secondi) come limiti della ricerca.
+    sampling_mode="seating": seating è la lista dei vicini di ogni posto (da 0, vedi seating.py), con un
+    posto per copia; le copie di posti vicini non hanno domande in comune (warning CL_SEATING_CONFLICTS se impossibile).
     Restituisce (lista_dati_test, lista_messaggi_finali).
     """
     all_tests_question_data = []
     final_messages = []
     fallback_activated_ever = False
+    rng = _resolve_rng(rng)
+    if profiler is None: profiler = NULL_PROFILER
+
+    if sampling_mode not in ("sequential", "global", "seating"): raise ValueError(f"Modalità di campionamento sconosciuta: {sampling_mode}")
+    if sampling_mode == "seating" and (seating is None or len(seating) != num_tests):
+        raise ValueError(f"La disposizione dei posti deve avere un posto per copia ({num_tests})")
 
-    # Raggruppa le domande per block_id
-    questions_by_block = defaultdict(list)
-    for q in all_questions_list:
-        questions_by_block[q['block_id']].append(q)
+    # Strutture per blocco costruite una sola volta (non per ogni test)
+    with profiler.phase("sampling.compile"):
+        if isinstance(all_questions_list, CompiledQuestionBank):
+            bank = all_questions_list
+        else:
+            bank = CompiledQuestionBank(all_questions_list)
+        questions_by_index = bank.questions_by_index
 
-    # Stato WRSwOR per ogni blocco
-    wors_state_per_block = {}
-    for block_id, questions in questions_by_block.items():
-        wors_state_per_block[block_id] = {
-            'last_used_indices': set(),
-            'questions': questions,
-            'n_block': len(questions)
-        }
+        # Stato WRSwOR per ogni blocco richiesto (solo per il campionamento sequenziale)
+        rotation_per_block = {block_id: bank.new_block_state(block_id, rng, recency_weighting, recency_half_life)
+                              for block_id, k in block_requests.items()
+                              if sampling_mode == "sequential" and k > 0 and bank.block_size(block_id) > 0}
+    if sampling_mode == "global":
+        # Intero lotto ottimizzato (batch_design): k esatto per blocco, massima sovrapposizione tra qualsiasi
+        # coppia minimizzata, copie adiacenti disgiunte nei blocchi con 2k < n come nel campionamento sequenziale
+        def design(block_indices, valid_requests):
+            selections, stats = design_batch(block_indices, valid_requests, num_tests, rng, global_time_budget,
+                                             global_max_iterations, status_callback=status_callback, profiler=profiler)
+            profiler.count("sampling.global_max_overlap", stats['max_overlap_final'])
+            if not stats['time_budget_reached']: return selections, []
+            return selections, [("warning", "CL_GLOBAL_TIME_BUDGET_REACHED",
+                                 {"seconds": global_time_budget, "iterations": stats['iterations']})]
+        return _generate_designed_tests(bank, block_requests, num_tests, status_callback, rng, profiler, design)
+    if sampling_mode == "seating":
+        # Copia i al posto i: nessuna domanda in comune tra posti vicini (seating.assign_seating)
+        def design(block_indices, valid_requests):
+            selections, conflicts = assign_seating(block_indices, valid_requests, seating, rng,
+                                                   status_callback=status_callback, profiler=profiler)
+            return selections, [("warning", "CL_SEATING_CONFLICTS", {"block_id": block_id, "pairs": pairs})
+                                for block_id, pairs in conflicts.items() if pairs]
+        return _generate_designed_tests(bank, block_requests, num_tests, status_callback, rng, profiler, design)
 
     # Ciclo principale per generare ogni test
-    for i_test in range(1, num_tests + 1):
-        current_test_questions = []
-
-        # Itera sui blocchi richiesti dall'utente
-        for block_id, k_requested in block_requests.items():
-            if k_requested <= 0: continue
-
-            block_state = wors_state_per_block.get(block_id)
-            if not block_state or not block_state['questions']:
-                final_messages.append(("error", "BLOCK_NOT_FOUND_OR_EMPTY", {"block_id": block_id}))
-                continue
-
-            block_questions = block_state['questions']
-            last_used_indices_block = block_state['last_used_indices']
-            n_block = block_state['n_block']
-            block_question_indices_set = set(q['original_index'] for q in block_questions)
-
-            if k_requested > n_block:
-                 final_messages.append(("error", "BLOCK_REQUEST_EXCEEDS_AVAILABLE", {"block_id": block_id, "k": k_requested, "n": n_block}))
-                 continue
-
-            selected_indices_for_block = []
-            use_simple_random = (k_requested * 2 >= n_block)
-
-            if use_simple_random:
-                # --- Usa Campionamento Casuale Semplice ---
-                candidate_indices_simple = list(block_question_indices_set)
-                try:
-                    actual_k = min(k_requested, len(candidate_indices_simple))
-                    if actual_k < k_requested:
-                         final_messages.append(("warning", "BLOCK_K_ADJUSTED_IN_FALLBACK", {"block_id": block_id, "requested": k_requested, "actual": actual_k}))
-                    selected_indices_for_block = random.sample(candidate_indices_simple, actual_k)
-                except ValueError:
-                    final_messages.append(("error", "BLOCK_CRITICAL_SAMPLING_ERROR", {"block_id": block_id, "k": k_requested, "n": len(candidate_indices_simple)}))
+    with profiler.phase("sampling.tests"):
+        for i_test in range(1, num_tests + 1):
+            current_test_questions = []
+
+            # Itera sui blocchi richiesti dall'utente
+            for block_id, k_requested in block_requests.items():
+                if k_requested <= 0: continue
+
+                rotation = rotation_per_block.get(block_id)
+                if rotation is None:
+                    final_messages.append(("error", "BLOCK_NOT_FOUND_OR_EMPTY", {"block_id": block_id}))
                     continue
-            else:
-                # --- Usa WRSwOR (k < n/2) ---
-                candidate_indices_wrswor = list(block_question_indices_set - last_used_indices_block)
-                if len(candidate_indices_wrswor) < k_requested:
-                    # Fallback *all'interno* di WRSwOR
-                    fallback_activated_ever = True
-                    status_callback("warning", "BLOCK_FALLBACK_WARNING",
-                                    block_id=block_id, test_num=i_test,
-                                    candidates=len(candidate_indices_wrswor), k=k_requested)
-                    candidate_indices_fallback = list(block_question_indices_set)
+
+                n_block = bank.block_size(block_id)
+                if k_requested > n_block:
+                     final_messages.append(("error", "BLOCK_REQUEST_EXCEEDS_AVAILABLE", {"block_id": block_id, "k": k_requested, "n": n_block}))
+                     continue
+
+                selected_indices_for_block = []
+                use_simple_random = (k_requested * 2 >= n_block)
+
+                if use_simple_random:
+                    # --- Usa Campionamento Casuale Semplice ---
                     try:
-                        actual_k = min(k_requested, len(candidate_indices_fallback))
+                        actual_k = min(k_requested, n_block)
                         if actual_k < k_requested:
                              final_messages.append(("warning", "BLOCK_K_ADJUSTED_IN_FALLBACK", {"block_id": block_id, "requested": k_requested, "actual": actual_k}))
-                        selected_indices_for_block = random.sample(candidate_indices_fallback, actual_k)
+                        selected_indices_for_block = rotation.sample_all(actual_k)
                     except ValueError:
-                        final_messages.append(("error", "BLOCK_CRITICAL_SAMPLING_ERROR", {"block_id": block_id, "k": k_requested, "n": len(candidate_indices_fallback)}))
+                        final_messages.append(("error", "BLOCK_CRITICAL_SAMPLING_ERROR", {"block_id": block_id, "k": k_requested, "n": n_block}))
                         continue
                 else:
-                    # WRSwOR normale
-                    weights = [1] * len(candidate_indices_wrswor)
-                    try:
-                         selected_indices_for_block = weighted_random_sample_without_replacement(candidate_indices_wrswor, weights, k_requested)
-                    except ValueError as e:
-                         final_messages.append(("error", "BLOCK_WRSWOR_ERROR", {"block_id": block_id, "k": k_requested, "error": str(e)}))
-                         continue
-                # Aggiorna last_used solo quando si usa WRSwOR
-                block_state['last_used_indices'] = set(selected_indices_for_block)
-
-            # Aggiunge domande selezionate
-            questions_dict_in_block = {q['original_index']: q for q in block_questions}
-            for idx in selected_indices_for_block:
-                if idx in questions_dict_in_block:
-                    current_test_questions.append(questions_dict_in_block[idx])
-                else:
-                    print(f"ERRORE GRAVE: Indice {idx} selezionato ma non trovato nel Blocco {block_id}")
+                    # --- Usa WRSwOR (k < n/2) ---
+                    # I candidati (complemento di last_used) sono il prefisso disponibile della rotazione
+                    num_candidates_wrswor = rotation.available
+                    if num_candidates_wrswor < k_requested:
+                        # Fallback *all'interno* di WRSwOR
+                        fallback_activated_ever = True
+                        profiler.count("sampling.fallback_activations", label=block_id)
+                        status_callback("warning", "BLOCK_FALLBACK_WARNING",
+                                        block_id=block_id, test_num=i_test,
+                                        candidates=num_candidates_wrswor, k=k_requested)
+                        try:
+                            actual_k = min(k_requested, n_block)
+                            if actual_k < k_requested:
+                                 final_messages.append(("warning", "BLOCK_K_ADJUSTED_IN_FALLBACK", {"block_id": block_id, "requested": k_requested, "actual": actual_k}))
+                            selected_indices_for_block = rotation.sample_all(actual_k)
+                        except ValueError:
+                            final_messages.append(("error", "BLOCK_CRITICAL_SAMPLING_ERROR", {"block_id": block_id, "k": k_requested, "n": n_block}))
+                            continue
+                    else:
+                        # WRSwOR normale: k candidati dal complemento di last_used, pesati per recenza
+                        try:
+                             selected_indices_for_block = rotation.sample_available(k_requested, i_test)
+                        except ValueError as e:
+                             final_messages.append(("error", "BLOCK_WRSWOR_ERROR", {"block_id": block_id, "k": k_requested, "error": str(e)}))
+                             continue
+                    # Aggiorna last_used solo quando si usa WRSwOR
+                    rotation.mark_recent(selected_indices_for_block, i_test)
+
+                # Aggiunge domande selezionate
+                current_test_questions.extend(questions_by_index[idx] for idx in selected_indices_for_block)
 
-        random.shuffle(current_test_questions)
-        all_tests_question_data.append(current_test_questions)
+            rng.shuffle(current_test_questions)
+            all_tests_question_data.append(current_test_questions)
+            status_callback("progress", "CL_TESTS_SAMPLED", done=i_test, total=num_tests)
+    profiler.count("sampling.tests_generated", len(all_tests_question_data))
 
     if fallback_activated_ever and not any(m[0] == 'error' for m in final_messages):
          final_messages.append(("warning", "CL_FINAL_FALLBACK_ACTIVE", {}))
 
     return all_tests_question_data, final_messages
+
+def _generate_designed_tests(bank, block_requests, num_tests, status_callback, rng, profiler, design):
+    """
+    Modalità "global" e "seating" di generate_all_tests_data: le selezioni di tutte le copie vengono
+    da design(block_indices, valid_requests) -> (selezioni {block_id: una lista di original_index per copia},
+    messaggi). Stessi messaggi di errore per blocco del campionamento sequenziale (una volta sola, non per ogni test).
+    """
+    final_messages = []
+    valid_requests = {}
+    for block_id, k_requested in block_requests.items():
+        if k_requested <= 0: continue
+        n_block = bank.block_size(block_id)
+        if n_block == 0:
+            final_messages.append(("error", "BLOCK_NOT_FOUND_OR_EMPTY", {"block_id": block_id}))
+        elif k_requested > n_block:
+            final_messages.append(("error", "BLOCK_REQUEST_EXCEEDS_AVAILABLE", {"block_id": block_id, "k": k_requested, "n": n_block}))
+        else:
+            valid_requests[block_id] = k_requested
+
+    selections = {}
+    if valid_requests:
+        selections, design_messages = design({block_id: bank.block_indices[block_id] for block_id in valid_requests}, valid_requests)
+        final_messages.extend(design_messages)
+
+    all_tests_question_data = []
+    questions_by_index = bank.questions_by_index
+    with profiler.phase("sampling.tests"):
+        for i_test in range(num_tests):
+            current_test_questions = [questions_by_index[idx] for block_id in valid_requests for idx in selections[block_id][i_test]]
+            rng.shuffle(current_test_questions)
+            all_tests_question_data.append(current_test_questions)
+            status_callback("progress", "CL_TESTS_SAMPLED", done=i_test + 1, total=num_tests)
+    profiler.count("sampling.tests_generated", len(all_tests_question_data))
+    return all_tests_question_data, final_messages
@@ -1,15 +1,162 @@
 # file_handler.py
-import pandas as pd
-import streamlit as st
+import codecs
+import csv
+import io
+import math
 import os
 
-def load_questions_from_excel(uploaded_file, status_callback):
+from instrumentation import NULL_PROFILER
+from parse_cache import PARSE_CACHE, ParseCache, content_hash
+from question_bank import QuestionBank
+
+CSV_SNIFF_BYTES = 64 * 1024 # Prefisso letto per rilevare codifica e delimitatore dei CSV
+CSV_DELIMITERS = ",;"
+
+# ================================================================
+# Lettura Righe in Streaming / Streaming Row Readers
+# ================================================================
+def _cell_to_str(value):
+    """
+    Converte una cella non testuale in stringa: vuoto/NaN -> '', numeri interi salvati come float
+    (es. 3.0) -> '3', altri valori con str(). Non dipende dalla colonna, a differenza del vecchio
+    fillna('').astype(str): una colonna numerica con celle vuote (allargata a float da pandas)
+    dava '1.0', ora '1', come la stessa cella in una colonna senza vuoti.
+    """
+    if value is None: return ''
+    if isinstance(value, float):
+        if math.isnan(value): return ''
+        if value.is_integer(): return str(int(value))
+    return str(value)
+
+def iter_xlsx_rows(source):
+    """Righe del primo foglio di un .xlsx (openpyxl read_only), una tupla di valori alla volta."""
+    from openpyxl import load_workbook
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        for row in workbook.worksheets[0].iter_rows(values_only=True):
+            yield row
+    finally:
+        workbook.close()
+
+def iter_xls_rows(source):
+    """Righe di un .xls legacy (non supportato da openpyxl): lettura via pandas, senza copie."""
+    import pandas as pd
+    for row in pd.read_excel(source, header=None).itertuples(index=False, name=None):
+        yield row
+
+def iter_csv_rows(text_stream, delimiter):
+    """
+    Righe di un CSV con il modulo csv. Le righe completamente vuote vengono saltate
+    (come skip_blank_lines di pandas); una riga di soli separatori resta un separatore di blocco.
+    """
+    for row in csv.reader(text_stream, delimiter=delimiter, skipinitialspace=True):
+        if row: yield row
+
+def sniff_csv_format(binary_stream):
+    """
+    Rileva codifica e delimitatore di un CSV leggendo solo un prefisso limitato
+    (CSV_SNIFF_BYTES), poi riporta lo stream all'inizio.
+    Codifica: BOM -> 'utf-8-sig'; prefisso UTF-8 valido -> 'utf-8'; altrimenti 'cp1252'
+    (tipico dei CSV salvati da Excel in locale italiano).
+    Delimitatore: csv.Sniffer limitato a virgola/punto e virgola, con fallback sul conteggio.
+    Restituisce (encoding, delimiter).
+    """
+    start = binary_stream.tell()
+    prefix = binary_stream.read(CSV_SNIFF_BYTES)
+    binary_stream.seek(start)
+
+    if prefix.startswith(codecs.BOM_UTF8):
+        encoding = 'utf-8-sig'
+    else:
+        try:
+            # final=False: un carattere multibyte troncato alla fine del prefisso non è un errore
+            codecs.getincrementaldecoder('utf-8')().decode(prefix, final=False)
+            encoding = 'utf-8'
+        except UnicodeDecodeError:
+            encoding = 'cp1252'
+    sample = codecs.getincrementaldecoder(encoding)(errors='replace').decode(prefix, final=False)
+    if len(prefix) == CSV_SNIFF_BYTES and '\n' in sample:
+        sample = sample[:sample.rindex('\n')] # Scarta l'ultima riga, probabilmente incompleta
+
+    try:
+        delimiter = csv.Sniffer().sniff(sample, delimiters=CSV_DELIMITERS).delimiter
+    except csv.Error:
+        delimiter = ';' if sample.count(';') > sample.count(',') else ','
+    return encoding, delimiter
+
+# ================================================================
+# Analisi Blocchi / Block Parsing
+# ================================================================
+def parse_question_rows(rows, status_callback):
+    """
+    Analizza righe (sequenze di celle) in un solo passaggio, rilevando i blocchi
+    separati da righe vuote e il tipo di ogni blocco.
+    L'original_index di ogni domanda è la posizione (da 0) della riga nel file.
+    Restituisce (all_questions, blocks_summary): all_questions è una QuestionBank colonnare
+    (sequenza di viste con le chiavi 'question', 'answers', 'original_index', 'type', 'block_id').
+    """
+    all_questions = QuestionBank()
+    blocks_summary = []
+    current_block_id = 1
+    current_block_count = 0
+    current_block_type = None
+
+    def finalize_block():
+        if current_block_count:
+            blocks_summary.append({
+                'block_id': current_block_id,
+                'type': current_block_type if current_block_type is not None else 'Indeterminato',
+                'count': current_block_count
+            })
+
+    for index, row in enumerate(rows):
+        row_list = [s.strip() if type(s) is str else _cell_to_str(s).strip() for s in row]
+        if not any(row_list):
+            # Riga vuota: finalizza blocco precedente e prepara il prossimo
+            finalize_block()
+            current_block_id += 1
+            current_block_count = 0
+            current_block_type = None
+            continue
+
+        question_text = row_list[0]
+        answers = [ans for ans in row_list[1:] if ans]
+        if not question_text: continue
+
+        question_type = 'Scelta Multipla' if len(answers) >= 2 else 'Aperte'
+        if current_block_type is None:
+            current_block_type = question_type
+        elif question_type != current_block_type:
+            status_callback("warning", "FH_BLOCK_MIXED_TYPES", block_id=current_block_id, expected=current_block_type, found=question_type, row_num=index + 1)
+            # Decide se ignorare o accettare (qui ignora)
+            continue
+
+        # Le domande di un blocco sono consecutive: vengono aggiunte direttamente alle colonne
+        all_questions.append(question_text, answers if current_block_type == 'Scelta Multipla' else [],
+                             index, current_block_type, current_block_id) # Usa il tipo del BLOCCO
+        current_block_count += 1
+
+    # Equivale alla riga vuota virtuale finale della versione precedente
+    finalize_block()
+    return all_questions, blocks_summary
+
+# ================================================================
+# Caricamento File / File Loading
+# ================================================================
+def load_questions_from_excel(uploaded_file, status_callback, file_hash=None, cache=PARSE_CACHE, profiler=None):
     """
     Carica domande/risposte da file Excel (.xlsx, .xls) o CSV (.csv).
     Rileva blocchi separati da righe vuote e determina il tipo di ogni blocco.
-    Chiama status_callback solo per errori o warning significativi.
+    Le righe vengono lette in streaming (openpyxl read_only / modulo csv), senza DataFrame.
+    Il risultato è memorizzato in cache sullo SHA-256 del contenuto (file_hash, calcolato se None):
+    lo stesso file caricato di nuovo, anche da un'altra sessione, non viene rianalizzato
+    e i warning dell'analisi originale vengono riproposti. cache=None disabilita la cache.
+    Chiama status_callback solo per errori o warning significativi. Non dipende da Streamlit:
+    lo stato della sessione (file, domande, blocchi) è aggiornato dal chiamante (app.py).
+    profiler: Profiler (instrumentation) che riceve le fasi parse.hash, parse.cache_lookup,
+    parse.rows, parse.cache_store e i contatori parse.questions, parse.blocks, parse.cache_hits.
     Restituisce:
-        - all_questions: Lista di tutti i dizionari domanda, ognuno con 'block_id' e 'type'.
+        - all_questions: QuestionBank colonnare; ogni elemento è una vista domanda con 'block_id' e 'type'.
         - blocks_summary: Lista di dizionari che descrivono ogni blocco {'block_id', 'type', 'count'}.
         - error_key: Chiave errore (str) o None se successo.
     """
@@ -17,120 +164,65 @@ def load_questions_from_excel(uploaded_file, status_callback):
         return None, None, "UPLOAD_FIRST_WARNING"
 
     file_name = uploaded_file.name
-    df = None
+    if profiler is None: profiler = NULL_PROFILER
 
     try:
         _, file_extension = os.path.splitext(file_name)
         file_extension = file_extension.lower()
 
-        # Legge sempre il file fornito
-        if file_extension in ['.xlsx', '.xls']:
-            excel_df = pd.read_excel(uploaded_file, header=None)
-            df = excel_df.fillna('').astype(str)
+        cache_key = None
+        if cache is not None and file_extension in ('.xlsx', '.xls', '.csv'):
+            if file_hash is None:
+                with profiler.phase("parse.hash"): file_hash = content_hash(uploaded_file)
+            cache_key = ParseCache.make_key(file_hash, file_extension)
+            with profiler.phase("parse.cache_lookup"): cached = cache.get(cache_key)
+            if cached is not None:
+                all_questions, blocks_summary, parse_warnings = cached
+                profiler.count("parse.cache_hits")
+                profiler.count("parse.questions", len(all_questions)); profiler.count("parse.blocks", len(blocks_summary))
+                for msg_type, msg_key, kwargs in parse_warnings: status_callback(msg_type, msg_key, **kwargs)
+                status_callback("info", "FH_USING_CACHE", filename=file_name)
+                return all_questions, blocks_summary, None
+
+        # Registra i warning dell'analisi per riproporli ai successivi hit della cache
+        parse_warnings = []
+        def recording_callback(msg_type, msg_key, **kwargs):
+            if msg_type == "warning": parse_warnings.append((msg_type, msg_key, kwargs))
+            status_callback(msg_type, msg_key, **kwargs)
+
+        if file_extension == '.xlsx':
+            with profiler.phase("parse.rows"):
+                all_questions, blocks_summary = parse_question_rows(iter_xlsx_rows(uploaded_file), recording_callback)
+        elif file_extension == '.xls':
+            with profiler.phase("parse.rows"):
+                all_questions, blocks_summary = parse_question_rows(iter_xls_rows(uploaded_file), recording_callback)
         elif file_extension == '.csv':
+            # Codifica e delimitatore da un prefisso limitato, poi un'unica lettura in streaming del buffer
+            uploaded_file.seek(0)
+            encoding, delimiter = sniff_csv_format(uploaded_file)
+            text_stream = io.TextIOWrapper(uploaded_file, encoding=encoding, newline='')
             try:
-                content_bytes = uploaded_file.getvalue()
-                content_str = content_bytes.decode('utf-8-sig')
-                from io import StringIO
-                csv_file_like = StringIO(content_str)
-                csv_df = pd.read_csv(csv_file_like, header=None, sep=',', skipinitialspace=True, lineterminator='\n') # Aggiunto lineterminator
-                df = csv_df.fillna('').astype(str)
-            except Exception as e_comma:
-                try:
-                    uploaded_file.seek(0)
-                    content_bytes = uploaded_file.getvalue()
-                    content_str = content_bytes.decode('utf-8-sig')
-                    from io import StringIO
-                    csv_file_like = StringIO(content_str)
-                    csv_df = pd.read_csv(csv_file_like, header=None, sep=';', skipinitialspace=True, lineterminator='\n') # Aggiunto lineterminator
-                    df = csv_df.fillna('').astype(str)
-                except Exception as e_semicolon:
-                    status_callback("error", "FH_CSV_READ_ERROR", filename=file_name, error=f"Comma: {e_comma}, Semicolon: {e_semicolon}")
-                    return None, None, "FH_CSV_READ_ERROR"
+                with profiler.phase("parse.rows"):
+                    all_questions, blocks_summary = parse_question_rows(iter_csv_rows(text_stream, delimiter), recording_callback)
+            except (csv.Error, UnicodeDecodeError) as e_csv:
+                status_callback("error", "FH_CSV_READ_ERROR", filename=file_name, error=f"{encoding}, '{delimiter}': {e_csv}")
+                return None, None, "FH_CSV_READ_ERROR"
+            finally:
+                text_stream.detach() # Non chiude il buffer caricato
         else:
             status_callback("error", "FH_UNSUPPORTED_FORMAT", filename=file_name, extension=file_extension)
             return None, None, "FH_UNSUPPORTED_FORMAT"
-
-        # Logica di analisi blocchi
-        all_questions = []
-        blocks_summary = []
-        current_block_id = 1
-        current_block_questions = []
-        current_block_type = None
-        first_question_in_block = True
-
-        # Aggiunge riga vuota virtuale alla fine
-        if df is not None:
-             df.loc[len(df)] = [""] * df.shape[1]
-        else:
-             # Se df è None dopo la lettura, c'è stato un errore non catturato prima?
-             raise ValueError("Failed to read the uploaded file into a DataFrame.")
-
-
-        for index, row in df.iterrows():
-            # Controlla se la riga è vuota (considerando anche stringhe vuote)
-            is_empty_row = all(s is None or str(s).strip() == "" for s in row)
-
-            if is_empty_row:
-                # Finalizza blocco precedente
-                if current_block_questions:
-                    if current_block_type is None: current_block_type = 'Indeterminato'
-                    blocks_summary.append({
-                        'block_id': current_block_id,
-                        'type': current_block_type,
-                        'count': len(current_block_questions)
-                    })
-                    all_questions.extend(current_block_questions)
-                # Prepara per il prossimo blocco
-                current_block_id += 1
-                current_block_questions = []
-                current_block_type = None
-                first_question_in_block = True
-            else:
-                # Processa riga non vuota
-                row_list = [str(s).strip() for s in row]
-                question_text = row_list[0]
-                answers = [ans for ans in row_list[1:] if ans]
-
-                if question_text:
-                    question_type = 'Scelta Multipla' if len(answers) >= 2 else 'Aperte'
-
-                    if first_question_in_block:
-                        current_block_type = question_type
-                        first_question_in_block = False
-                    elif question_type != current_block_type:
-                        status_callback("warning", "FH_BLOCK_MIXED_TYPES", block_id=current_block_id, expected=current_block_type, found=question_type, row_num=index + 1)
-                        # Decide se ignorare o accettare (qui ignora)
-                        continue
-
-                    question_dict = {
-                        'question': question_text,
-                        'answers': answers if current_block_type == 'Scelta Multipla' else [],
-                        'original_index': index,
-                        'type': current_block_type, # Usa il tipo del BLOCCO
-                        'block_id': current_block_id
-                    }
-                    current_block_questions.append(question_dict)
-
-        # Rimuove blocchi vuoti
-        blocks_summary = [b for b in blocks_summary if b['count'] > 0]
+        profiler.count("parse.questions", len(all_questions)); profiler.count("parse.blocks", len(blocks_summary))
 
         if not all_questions:
             status_callback("error", "FH_NO_VALID_QUESTIONS", filename=file_name)
             return None, None, "FH_NO_VALID_QUESTIONS"
 
-        # Salva in sessione per evitare ricaricamenti non necessari *durante la stessa esecuzione*
-        st.session_state.excel_df = df # Salva il DataFrame processato
-        st.session_state.processed_filename = file_name # Salva nome file processato
-        st.session_state.all_questions = all_questions # Salva lista domande processate
-        st.session_state.blocks_summary = blocks_summary # Salva sommario blocchi
+        if cache_key is not None:
+            with profiler.phase("parse.cache_store"): cache.put(cache_key, all_questions, blocks_summary, parse_warnings)
 
         return all_questions, blocks_summary, None
 
     except Exception as e:
         status_callback("error", "FH_UNEXPECTED_ERROR", filename=file_name, error=str(e))
-        if 'processed_filename' in st.session_state: del st.session_state['processed_filename']
-        if 'excel_df' in st.session_state: del st.session_state['excel_df']
-        if 'all_questions' in st.session_state: del st.session_state['all_questions']
-        if 'blocks_summary' in st.session_state: del st.session_state['blocks_summary']
         return None, None, "FH_UNEXPECTED_ERROR"
@@ -0,0 +1,120 @@
+# instrumentation.py
+# Strumentazione della pipeline (analisi file, campionamento, rendering PDF): tempi per fase,
+# contatori ed eventi di avanzamento di una singola esecuzione, esportabili come profilo JSON.
+import json
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+
+PROFILE_FORMAT_VERSION = 1
+MAX_TIMELINE_EVENTS = 2000 # Oltre questo numero le fasi sono solo sommate (es. layout di migliaia di copie)
+MAX_PROGRESS_EVENTS = 5000
+
+# ================================================================
+# Profiler / Profiler
+# ================================================================
+class Profiler:
+    """
+    Raccoglie i dati di una esecuzione:
+    - phase(name): context manager che somma durata e numero di chiamate della fase
+      (e le registra nella timeline, con l'istante di inizio relativo all'avvio del profiler);
+    - count(name, amount, label): contatori, eventualmente suddivisi per etichetta (es. block_id);
+    - progress(key, done, total): eventi di avanzamento con il loro istante.
+    wrap_callback(status_callback) restituisce uno status_callback che registra i messaggi
+    "progress" e conta warning/error prima di inoltrarli. to_dict()/to_json() esportano il profilo.
+    Pensato per un'esecuzione alla volta (un job), ma i metodi sono protetti da un lock.
+    """
+    def __init__(self, run_id=None, metadata=None):
+        self.run_id = run_id or uuid.uuid4().hex
+        self.metadata = dict(metadata or {})
+        self.phases = {} # nome -> [secondi totali, chiamate]
+        self.timeline = [] # (nome, inizio relativo, secondi)
+        self.counters = {} # nome -> int, oppure {etichetta: int}
+        self.progress_events = [] # (istante relativo, chiave, done, total)
+        self.current_phase = None # Fase più interna in corso (letta dall'interfaccia)
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self._dropped_events = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        previous_phase, self.current_phase = self.current_phase, name
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.current_phase = previous_phase
+            with self._lock:
+                totals = self.phases.setdefault(name, [0.0, 0])
+                totals[0] += elapsed; totals[1] += 1
+                if len(self.timeline) < MAX_TIMELINE_EVENTS: self.timeline.append((name, start - self._start, elapsed))
+                else: self._dropped_events += 1
+
+    def count(self, name, amount=1, label=None):
+        with self._lock:
+            if label is None:
+                self.counters[name] = self.counters.get(name, 0) + amount
+            else:
+                by_label = self.counters.setdefault(name, {})
+                by_label[label] = by_label.get(label, 0) + amount
+
+    def progress(self, key, done, total):
+        with self._lock:
+            if len(self.progress_events) < MAX_PROGRESS_EVENTS:
+                self.progress_events.append((time.perf_counter() - self._start, key, done, total))
+            else: self._dropped_events += 1
+
+    def wrap_callback(self, status_callback):
+        """status_callback che registra avanzamento e messaggi nel profilo e poi li inoltra."""
+        def profiling_callback(msg_type, msg_key, **kwargs):
+            if msg_type == "progress": self.progress(msg_key, kwargs.get("done", 0), kwargs.get("total", 0))
+            elif msg_type in ("warning", "error"): self.count(f"messages.{msg_type}", label=msg_key)
+            status_callback(msg_type, msg_key, **kwargs)
+        return profiling_callback
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self._start
+
+    # --- Esportazione / Export ---
+    def to_dict(self):
+        """Profilo serializzabile in JSON (le etichette dei contatori diventano stringhe)."""
+        with self._lock:
+            return {
+                'version': PROFILE_FORMAT_VERSION,
+                'run_id': self.run_id,
+                'started_at': time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started_at)),
+                'elapsed_seconds': round(self.elapsed, 6),
+                'metadata': self.metadata,
+                'phases': {name: {'seconds': round(seconds, 6), 'calls': calls}
+                           for name, (seconds, calls) in self.phases.items()},
+                'counters': {name: ({str(label): n for label, n in value.items()} if isinstance(value, dict) else value)
+                             for name, value in self.counters.items()},
+                'timeline': [{'phase': name, 'start': round(start, 6), 'seconds': round(seconds, 6)}
+                             for name, start, seconds in self.timeline],
+                'progress': [{'t': round(t, 6), 'key': key, 'done': done, 'total': total}
+                             for t, key, done, total in self.progress_events],
+                'dropped_events': self._dropped_events,
+            }
+
+    def to_json(self, indent=2):
+        return json.dumps(self.to_dict(), ensure_ascii=False, indent=indent, default=str)
+
+    def write_json(self, path):
+        with open(path, "w", encoding="utf-8") as f: f.write(self.to_json())
+
+class NullProfiler:
+    """Profiler che non registra nulla: il default delle funzioni strumentate (costo trascurabile)."""
+    run_id = None
+    current_phase = None
+    _null_context = nullcontext()
+
+    def phase(self, name): return self._null_context
+    def count(self, name, amount=1, label=None): pass
+    def progress(self, key, done, total): pass
+    def wrap_callback(self, status_callback): return status_callback
+
+NULL_PROFILER = NullProfiler()
@@ -0,0 +1,136 @@
+# jobs.py
+# Esecuzione in background di generazione e validazione, indipendente dai rerun dello script Streamlit.
+# Il modulo è importato una sola volta dal processo, quindi JOB_MANAGER è condiviso tra le sessioni.
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from config import JOB_MAX_WORKERS, JOB_RESULT_TTL_SECONDS
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+# ================================================================
+# Job
+# ================================================================
+class Job:
+    """
+    Un lavoro in background. La funzione del job riceve il Job come primo argomento e usa
+    job.status_callback come status_callback dei moduli (core_logic, pdf_generator, test):
+    i messaggi "progress" (done/total) aggiornano job.progress, gli altri vengono raccolti
+    in job.messages. cleanup_paths: file (o cartelle) temporanei da eliminare quando il job viene scartato.
+    profiler: Profiler (instrumentation) facoltativo impostato dalla funzione del job, per mostrare la fase in corso.
+    """
+    def __init__(self, session_id, kind):
+        self.job_id = uuid.uuid4().hex
+        self.session_id = session_id
+        self.kind = kind
+        self.status = JOB_PENDING
+        self.progress = {} # msg_key -> (done, total), nell'ordine di arrivo delle fasi
+        self.messages = []
+        self.result = None
+        self.error = None
+        self.cleanup_paths = []
+        self.profiler = None
+        self.created_at = time.monotonic()
+        self.finished_at = None
+        self._discarded = False
+        self._lock = threading.Lock()
+
+    def status_callback(self, msg_type, msg_key, **kwargs):
+        with self._lock:
+            if msg_type == "progress":
+                self.progress[msg_key] = (kwargs.get("done", 0), kwargs.get("total", 0))
+            else:
+                self.messages.append((msg_type, msg_key, kwargs))
+
+    def snapshot(self):
+        """Copia coerente di (stato, avanzamento, messaggi) da mostrare nell'interfaccia."""
+        with self._lock:
+            return self.status, dict(self.progress), list(self.messages)
+
+    @property
+    def finished(self):
+        return self.status in (JOB_DONE, JOB_FAILED)
+
+    def _run(self, func, args, kwargs):
+        self.status = JOB_RUNNING
+        result, error = None, None
+        try:
+            result = func(self, *args, **kwargs)
+        except Exception as e:
+            error = e
+        with self._lock:
+            self.result, self.error = result, error
+            self.status = JOB_FAILED if error is not None else JOB_DONE
+            self.finished_at = time.monotonic()
+            discarded = self._discarded
+        if discarded: self._cleanup() # Scartato durante l'esecuzione
+
+    def _discard(self):
+        """Segna il job come scartato; i file temporanei sono eliminati ora o alla fine del lavoro."""
+        with self._lock:
+            self._discarded = True
+            finished = self.finished
+        if finished: self._cleanup()
+
+    def _cleanup(self):
+        for path in self.cleanup_paths:
+            if os.path.isdir(path): shutil.rmtree(path, ignore_errors=True)
+            else:
+                try: os.remove(path)
+                except OSError: pass
+        self.cleanup_paths = []
+
+# ================================================================
+# Gestore dei Job / Job Manager
+# ================================================================
+class JobManager:
+    """
+    Pool di thread condiviso con i job indicizzati per (sessione, job_id). Lo script salva solo
+    il job_id in st.session_state: un rerun (secondo click, widget modificato) non interrompe
+    il lavoro e il risultato resta disponibile finché il job non viene scartato o scade
+    (ttl_seconds dopo la fine).
+    """
+    def __init__(self, max_workers=JOB_MAX_WORKERS, ttl_seconds=JOB_RESULT_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="evilprof-job")
+        self._jobs = {} # (session_id, job_id) -> Job
+        self._lock = threading.Lock()
+
+    def submit(self, session_id, kind, func, *args, **kwargs):
+        """Accoda func(job, *args, **kwargs) e restituisce il job_id."""
+        self._expire()
+        job = Job(session_id, kind)
+        with self._lock: self._jobs[(session_id, job.job_id)] = job
+        self._executor.submit(job._run, func, args, kwargs)
+        return job.job_id
+
+    def get(self, session_id, job_id):
+        """Il Job della sessione, o None se inesistente, scaduto o di un'altra sessione."""
+        if job_id is None: return None
+        with self._lock: return self._jobs.get((session_id, job_id))
+
+    def discard(self, session_id, job_id):
+        """Rimuove il job ed elimina i suoi file temporanei (se è ancora in esecuzione, a fine lavoro)."""
+        with self._lock: job = self._jobs.pop((session_id, job_id), None)
+        if job is not None: job._discard()
+
+    def jobs_for(self, session_id):
+        with self._lock: return [job for (sid, _), job in self._jobs.items() if sid == session_id]
+
+    def _expire(self):
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, job in self._jobs.items()
+                       if job.finished and now - job.finished_at > self.ttl_seconds]
+            expired_jobs = [self._jobs.pop(key) for key in expired]
+        for job in expired_jobs: job._discard()
+
+# Istanza condivisa da tutte le sessioni del processo
+JOB_MANAGER = JobManager()
@@ -42,12 +42,26 @@ TEXTS = {
         "CORRECT_ERRORS_ERROR": "Correggi gli errori nei parametri prima di generare.",
         "GENERATING_DATA_SPINNER": "⏳ Generazione verifiche...",
         "VALIDATION_LOGIC_SPINNER": "⏳ Esecuzione test funzionale...",
+        "JOB_QUEUED": "In coda: il lavoro partirà appena si libera un worker.",
+        "CL_TESTS_SAMPLED": "Verifiche campionate: {done}/{total}",
+        "CL_GLOBAL_SEARCH": "Ottimizzazione globale del lotto: {done}/{total} iterazioni",
+        "CL_SEATING_BLOCKS": "Blocchi assegnati ai posti: {done}/{total}",
+        "PG_COPIES_RENDERED": "Copie impaginate: {done}/{total}",
+        "MC_CHUNKS_COMPLETED": "Simulazione Monte Carlo: {done}/{total} gruppi di run completati",
         "GENERATION_FAILED_ERROR": "❌ Generazione fallita a causa di errori critici: {error}",
         "DATA_READY_PDF_INFO": "Dati per {num_tests} verifiche pronti. Avvio generazione PDF...",
         "PDF_CREATION_SPINNER": "⏳ Creazione del file PDF in corso...",
         "PDF_SUCCESS": "✅ Generazione PDF completata!",
         "PDF_DOWNLOAD_BUTTON_LABEL": "📥 Scarica PDF Generato",
         "PDF_DOWNLOAD_BUTTON_HELP": "Clicca per scaricare il file '{pdf_filename}'",
+        "ZIP_DOWNLOAD_BUTTON_LABEL": "📥 Scarica ZIP (un PDF per copia)",
+        "PDF_STREAMED_INFO": "ℹ️ Lotto grande ({num_copies} copie): le copie sono state generate una alla volta su file per limitare la memoria usata.",
+        "JOB_CURRENT_PHASE": "Fase in corso: {phase}",
+        "PROFILE_EXPANDER": "⏱️ Profilo dell'esecuzione ({seconds:.2f} s)",
+        "PROFILE_PHASE_COLUMN": "Fase",
+        "PROFILE_SECONDS_COLUMN": "Secondi",
+        "PROFILE_CALLS_COLUMN": "Chiamate",
+        "PROFILE_DOWNLOAD_BUTTON_LABEL": "📥 Scarica profilo (JSON)",
         "PDF_GENERATION_ERROR": "❌ Errore durante la creazione del file PDF.",
         "INITIAL_INFO_NEW": "Carica un file Excel/CSV, specifica quante domande prendere da ogni blocco nella sidebar e premi 'Genera Verifiche PDF'.",
         "VALIDATION_NO_MESSAGES": "Il test funzionale non ha prodotto messaggi specifici.",
@@ -84,11 +98,11 @@ EvilProf (Versione Blocchi) genera verifiche PDF selezionando un numero esatto d
 L'applicazione include un test funzionale che esegue un'analisi statistica approfondita sulla logica di campionamento:
 
 1.  Utilizza un file predefinito (`test_set_4_by_12_questions.xlsx`) contenente 4 blocchi di 12 domande ciascuno (2 blocchi MC, 2 blocchi OE).
-2.  Esegue una simulazione Monte Carlo (30 ripetizioni) per diversi scenari di selezione.
+2.  Esegue una simulazione Monte Carlo (200 ripetizioni, in parallelo su più processi) per diversi scenari di selezione.
 3.  Per ogni scenario, varia il numero di domande richieste per blocco (`k`) da 1 a 11.
 4.  Genera sequenze di 15 test consecutivi per ogni `k` e ogni run Monte Carlo, applicando la logica di campionamento appropriata (WRSwOR se `12 > 2k`, Simple Random se `12 <= 2k`).
 5.  Calcola la similarità media tra test consecutivi a diverse "distanze" (da 1 a 14 test di distanza) usando il **coefficiente di Sørensen-Dice**. Un valore di 0 indica nessuna domanda in comune, 1 indica test identici.
-6.  Salva i risultati medi finali (per ogni `k` e distanza) in un file Excel (`similarity_analysis_unified_dice_mc_15t.xlsx`), che può essere scaricato dall'interfaccia dopo l'esecuzione del test.
+6.  Salva i risultati medi finali (per ogni `k` e distanza, con intervalli di confidenza al 95% in un secondo foglio) in un file Excel (`similarity_analysis_unified_dice_mc_15t.xlsx`), che può essere scaricato dall'interfaccia dopo l'esecuzione del test.
 
 **Interpretazione dei Risultati del Test:**
 
@@ -121,6 +135,8 @@ L'applicazione include un test funzionale che esegue un'analisi statistica appro
         "BLOCK_CRITICAL_SAMPLING_ERROR": "Errore Critico Campionamento Blocco {block_id}: Impossibile campionare {k} da {n} candidati.",
         "BLOCK_WRSWOR_ERROR": "Errore Critico WRSwOR Blocco {block_id} (k={k}): {error}",
         "CL_FINAL_FALLBACK_ACTIVE": "‼️ ATTENZIONE GENERALE: Il fallback WRSwOR è stato attivato per almeno un blocco durante la generazione. La diversità *all'interno* di quei blocchi potrebbe non essere garantita per tutti i test.",
+        "CL_SEATING_CONFLICTS": "⚠️ Blocco {block_id}: troppe poche domande per la disposizione dei posti, {pairs} coppie di posti vicini hanno domande in comune (servono almeno k × il numero di colori del grafo, 4 per una griglia con diagonali).",
+        "CL_GLOBAL_TIME_BUDGET_REACHED": "⚠️ Ottimizzazione globale interrotta dopo {seconds} s ({iterations} iterazioni): il lotto è valido, ma con lo stesso seed una nuova generazione potrebbe non riprodurlo esattamente.",
         "BLOCK_K_ADJUSTED_IN_FALLBACK": "⚠️ Attenzione Blocco {block_id}: Richieste {requested} domande, ma solo {actual} disponibili durante il fallback. Numero adattato.",
         "PG_PDF_GENERATION_START": "⚙️ Inizio generazione PDF...",
         "PG_WEASYPRINT_UNAVAILABLE": "Libreria WeasyPrint non trovata o non funzionante. Impossibile generare PDF.",
@@ -129,6 +145,7 @@ L'applicazione include un test funzionale che esegue un'analisi statistica appro
         "PG_PDF_CONVERSION_COMPLETE": "⚙️ Conversione PDF completata.",
         "PG_WEASYPRINT_DEPENDENCY_ERROR": "ERRORE WeasyPrint: Dipendenze mancanti (GTK+/Pango/Cairo?). Dettagli: {error}",
         "PG_WEASYPRINT_OTHER_ERROR": "ERRORE durante la generazione PDF con WeasyPrint: {error}",
+        "PG_COPY_RENDER_ERROR": "⚠️ Copia {copy_number} non generata (errore WeasyPrint): {error}. Le altre copie sono incluse nel PDF.",
         "TEST_FILE_NOT_FOUND": "ERRORE: File di test '{filename}' non trovato. Assicurati che sia nella stessa cartella dell'app.",
         "TEST_LOADING_DATA": "Caricamento dati dal file di test '{filename}'...",
         "TEST_NO_QUESTIONS_FOUND": "ERRORE: Nessuna domanda valida trovata nel file di test '{filename}'.",
@@ -144,6 +161,17 @@ L'applicazione include un test funzionale che esegue un'analisi statistica appro
         "MC_TEST_RUN_PROGRESS": "Progresso Monte Carlo: Run {current_run}/{total_runs}...",
         "MC_TEST_FAILED_FOR_KPB_IN_RUN": "⚠️ Fallita analisi per k/blocco={k_per_block} (Metodo: {method}) nella run {run}.",
         "MC_TEST_ALL_COMPLETE": "--- Simulazione Monte Carlo completata. ---",
+        "MC_ANALYTIC_CROSS_CHECK": "Verifica incrociata con il modello analitico (pesi uniformi): scarto massimo {max_deviation}, {outside_ci} celle su {cells} fuori dall'IC 95% (circa il 5% è atteso).",
+        "ANALYTIC_EXPANDER": "📈 Similarità attesa (modello analitico)",
+        "ANALYTIC_INTRO": "Indice di Dice **esatto** atteso tra verifiche a distanza d (1 = consecutive), calcolato senza simulazione per il campionamento con pesi uniformi (pesatura di recenza \"Nessuna\"): Simple Random se k ≥ n/2, altrimenti estrazione dalle domande non usate nel test precedente.",
+        "ANALYTIC_RECENCY_NOTE": "La pesatura di recenza selezionata non è uniforme: le curve sono un riferimento (a distanza 1 il valore è comunque esatto).",
+        "ANALYTIC_BLOCK_SIZE_LABEL": "Domande per blocco (n)",
+        "ANALYTIC_MAX_DISTANCE_LABEL": "Distanza massima",
+        "ANALYTIC_CURRENT_REQUESTS": "Con le richieste attuali: Dice atteso **{dice_1:.3f}** tra verifiche consecutive, **{dice_2:.3f}** a distanza 2.",
+        "ANALYTIC_CURRENT_SERIES": "Richieste attuali",
+        "ANALYTIC_SHOW_CHART": "Mostra il grafico",
+        "ANALYTIC_DISTANCE_AXIS": "Distanza",
+        "ANALYTIC_DICE_AXIS": "Dice atteso",
         "STAT_TEST_EXCEL_CREATED": "✅ File Excel con risultati statistici '{filename}' creato.",
         "STAT_TEST_EXCEL_SAVE_ERROR": "❌ Errore durante il salvataggio del file Excel '{filename}': {error}",
         "STAT_TEST_NO_DATA_FOR_EXCEL": "⚠️ Nessun dato dettagliato raccolto per creare il file Excel.",
@@ -151,7 +179,33 @@ L'applicazione include un test funzionale che esegue un'analisi statistica appro
         "DOWNLOAD_STATS_EXCEL_HELP": "Scarica il file Excel con l'analisi di similarità Dice (WRSwOR/Semplice) per distanza e k/blocco.",
         "CL_VALIDATION_UNEXPECTED_ERROR": "❌ Errore imprevisto durante l'esecuzione del test funzionale: {error}",
         # NUOVA CHIAVE PER WARNING CAMPIONAMENTO SEMPLICE
-        "BLOCK_SWITCH_TO_SIMPLE_SAMPLING_WARNING": "⚠️ Blocco {block_id}: Selezionando {k_selected} su {n_available} domande, si userà il campionamento casuale semplice (diversità ridotta)."
+        "BLOCK_SWITCH_TO_SIMPLE_SAMPLING_WARNING": "⚠️ Blocco {block_id}: Selezionando {k_selected} su {n_available} domande, si userà il campionamento casuale semplice (diversità ridotta).",
+        "RECENCY_LABEL": "4. Pesatura di Recenza (WRSwOR)",
+        "RECENCY_HELP": "Quanto penalizzare le domande usate di recente nei test successivi (oltre al test immediatamente successivo, sempre escluso).",
+        "RECENCY_OPTION_EXPONENTIAL": "Esponenziale (emivita)",
+        "RECENCY_OPTION_LINEAR": "Lineare",
+        "RECENCY_OPTION_NONE": "Nessuna (pesi uniformi)",
+        "SAMPLING_MODE_LABEL": "Modalità di campionamento",
+        "SAMPLING_MODE_HELP": "Sequenziale: ogni copia evita le domande della precedente (con pesatura di recenza). Globale: l'intero lotto è ottimizzato per ridurre le domande in comune tra QUALSIASI coppia di copie. Per posti: la copia i va al posto i dell'aula (per righe) e i posti vicini non hanno domande in comune.",
+        "SAMPLING_MODE_OPTION_SEQUENTIAL": "Sequenziale (copia per copia)",
+        "SAMPLING_MODE_OPTION_GLOBAL": "Globale (intero lotto)",
+        "SAMPLING_MODE_OPTION_SEATING": "Per posti (aula)",
+        "SAMPLING_MODE_RECENCY_NOTE": "In questa modalità la pesatura di recenza non si applica.",
+        "SEATING_ROWS_LABEL": "File di banchi",
+        "SEATING_COLS_LABEL": "Posti per fila",
+        "SEATING_DIAGONAL_LABEL": "Vicini anche in diagonale",
+        "SEATING_DIAGONAL_HELP": "Se attivo ogni posto ha fino a 8 vicini (servono almeno 4k domande per blocco), altrimenti 4 (davanti, dietro e ai lati).",
+        "SEATING_NUM_TESTS_NOTE": "Una copia per posto: {num_tests} copie (la copia n va al posto n, contando per file da sinistra).",
+        "HALF_LIFE_LABEL": "Emivita penalità (n. test)",
+        "HALF_LIFE_HELP": "Dopo quanti test la penalità di una domanda già usata si dimezza.",
+        "SEED_LABEL": "5. Seed (opzionale)",
+        "SEED_HELP": "Lascia vuoto per un seed casuale. Con lo stesso file, parametri e seed si ottengono esattamente le stesse verifiche.",
+        "COPIES_LABEL": "6. Ristampa solo le copie (opzionale)",
+        "COPIES_HELP": "Numeri delle copie da includere nel PDF, separati da virgola (es. 3, 7). Usa lo stesso seed della generazione originale.",
+        "SEED_INVALID_ERROR": "ERRORE: Il seed '{value}' non è un numero intero valido.",
+        "COPIES_INVALID_ERROR": "ERRORE: Copie '{value}' non valide. Inserire numeri tra 1 e {num_tests} separati da virgola.",
+        "PDF_SEED_INFO": "🔑 Seed usato: {seed} (inseriscilo nel campo Seed per rigenerare le stesse verifiche o ristampare singole copie).",
+        "PDF_COPY_INFO": "Copia {copy_number} - Seed {seed}"
     },
     "en": {
         # ... (tutte le altre chiavi esistenti rimangono invariate) ...
@@ -194,12 +248,26 @@ L'applicazione include un test funzionale che esegue un'analisi statistica appro
         "CORRECT_ERRORS_ERROR": "Please correct the parameter errors before generating.",
         "GENERATING_DATA_SPINNER": "⏳ Generating tests...",
         "VALIDATION_LOGIC_SPINNER": "⏳ Running functional test...",
+        "JOB_QUEUED": "Queued: the job will start as soon as a worker is free.",
+        "CL_TESTS_SAMPLED": "Tests sampled: {done}/{total}",
+        "CL_GLOBAL_SEARCH": "Global batch optimization: {done}/{total} iterations",
+        "CL_SEATING_BLOCKS": "Blocks assigned to seats: {done}/{total}",
+        "PG_COPIES_RENDERED": "Copies laid out: {done}/{total}",
+        "MC_CHUNKS_COMPLETED": "Monte Carlo simulation: {done}/{total} run groups completed",
         "GENERATION_FAILED_ERROR": "❌ Generation failed due to critical errors: {error}",
         "DATA_READY_PDF_INFO": "Data for {num_tests} tests ready. Starting PDF generation...",
         "PDF_CREATION_SPINNER": "⏳ Creating PDF file...",
         "PDF_SUCCESS": "✅ PDF Generation Complete!",
         "PDF_DOWNLOAD_BUTTON_LABEL": "📥 Download Generated PDF",
         "PDF_DOWNLOAD_BUTTON_HELP": "Click to download '{pdf_filename}'",
+        "ZIP_DOWNLOAD_BUTTON_LABEL": "📥 Download ZIP (one PDF per copy)",
+        "PDF_STREAMED_INFO": "ℹ️ Large batch ({num_copies} copies): copies were generated one at a time to a file to limit memory use.",
+        "JOB_CURRENT_PHASE": "Current phase: {phase}",
+        "PROFILE_EXPANDER": "⏱️ Run profile ({seconds:.2f} s)",
+        "PROFILE_PHASE_COLUMN": "Phase",
+        "PROFILE_SECONDS_COLUMN": "Seconds",
+        "PROFILE_CALLS_COLUMN": "Calls",
+        "PROFILE_DOWNLOAD_BUTTON_LABEL": "📥 Download profile (JSON)",
         "PDF_GENERATION_ERROR": "❌ Error during PDF creation.",
         "INITIAL_INFO_NEW": "Upload an Excel/CSV file, specify how many questions to take from each block in the sidebar, and press 'Generate PDF Tests'.",
         "VALIDATION_NO_MESSAGES": "The functional test produced no specific messages.",
@@ -235,11 +303,11 @@ EvilProf (Block Version) generates PDF tests by selecting an exact number of que
 The application includes a functional test that performs an in-depth statistical analysis of the sampling logic:
 
 1.  It uses a predefined file (`test_set_4_by_12_questions.xlsx`) containing 4 blocks of 12 questions each (2 MC blocks, 2 OE blocks).
-2.  It runs a Monte Carlo simulation (30 repetitions) for different selection scenarios.
+2.  It runs a Monte Carlo simulation (200 repetitions, in parallel across processes) for different selection scenarios.
 3.  For each scenario, it varies the number of questions requested per block (`k`) from 1 to 11.
 4.  It generates sequences of 15 consecutive tests for each `k` and each Monte Carlo run, applying the appropriate sampling logic (WRSwOR if `12 > 2k`, Simple Random if `12 <= 2k`).
 5.  It calculates the average similarity between consecutive tests at different "distances" (from 1 to 14 tests apart) using the **Sørensen-Dice coefficient**. A value of 0 indicates no common questions, 1 indicates identical tests.
-6.  It saves the final average results (for each `k` and distance) to an Excel file (`similarity_analysis_unified_dice_mc_15t.xlsx`), which can be downloaded from the interface after running the test.
+6.  It saves the final average results (for each `k` and distance, with 95% confidence intervals in a second sheet) to an Excel file (`similarity_analysis_unified_dice_mc_15t.xlsx`), which can be downloaded from the interface after running the test.
 
 **Interpreting the Test Results:**
 
@@ -272,6 +340,8 @@ The application includes a functional test that performs an in-depth statistical
         "BLOCK_CRITICAL_SAMPLING_ERROR": "Critical Sampling Error Block {block_id}: Cannot sample {k} from {n} candidates.",
         "BLOCK_WRSWOR_ERROR": "Critical WRSwOR Error Block {block_id} (k={k}): {error}",
         "CL_FINAL_FALLBACK_ACTIVE": "‼️ GENERAL WARNING: WRSwOR fallback was activated for at least one block during generation. Diversity *within* those blocks might not be guaranteed for all tests.",
+        "CL_SEATING_CONFLICTS": "⚠️ Block {block_id}: too few questions for the seating layout, {pairs} pairs of neighbouring seats share questions (at least k × the number of graph colours is needed, 4 for a grid with diagonals).",
+        "CL_GLOBAL_TIME_BUDGET_REACHED": "⚠️ Global optimization stopped after {seconds} s ({iterations} iterations): the batch is valid, but regenerating with the same seed might not reproduce it exactly.",
         "BLOCK_K_ADJUSTED_IN_FALLBACK": "⚠️ Warning Block {block_id}: Requested {requested} questions, but only {actual} available during fallback. Number adjusted.",
         "PG_PDF_GENERATION_START": "⚙️ Starting PDF generation...",
         "PG_WEASYPRINT_UNAVAILABLE": "WeasyPrint library not found or not functional. Cannot generate PDF.",
@@ -280,6 +350,7 @@ The application includes a functional test that performs an in-depth statistical
         "PG_PDF_CONVERSION_COMPLETE": "⚙️ PDF conversion complete.",
         "PG_WEASYPRINT_DEPENDENCY_ERROR": "ERROR WeasyPrint: Missing dependencies (GTK+/Pango/Cairo?). Details: {error}",
         "PG_WEASYPRINT_OTHER_ERROR": "ERROR during PDF generation with WeasyPrint: {error}",
+        "PG_COPY_RENDER_ERROR": "⚠️ Copy {copy_number} was not generated (WeasyPrint error): {error}. The other copies are included in the PDF.",
         "TEST_FILE_NOT_FOUND": "ERROR: Test file '{filename}' not found. Ensure it's in the same folder as the app.",
         "TEST_LOADING_DATA": "Loading data from test file '{filename}'...",
         "TEST_NO_QUESTIONS_FOUND": "ERROR: No valid questions found in test file '{filename}'.",
@@ -295,6 +366,17 @@ The application includes a functional test that performs an in-depth statistical
         "MC_TEST_RUN_PROGRESS": "Monte Carlo Progress: Run {current_run}/{total_runs}...",
         "MC_TEST_FAILED_FOR_KPB_IN_RUN": "⚠️ Analysis failed for k/block={k_per_block} (Method: {method}) in run {run}.",
         "MC_TEST_ALL_COMPLETE": "--- Monte Carlo simulation completed. ---",
+        "MC_ANALYTIC_CROSS_CHECK": "Cross-check against the analytic model (uniform weights): max deviation {max_deviation}, {outside_ci} of {cells} cells outside the 95% CI (about 5% is expected).",
+        "ANALYTIC_EXPANDER": "📈 Expected similarity (analytic model)",
+        "ANALYTIC_INTRO": "**Exact** expected Dice index between tests at distance d (1 = consecutive), computed without simulation for uniform-weight sampling (recency weighting \"None\"): Simple Random when k ≥ n/2, otherwise drawing from the questions not used in the previous test.",
+        "ANALYTIC_RECENCY_NOTE": "The selected recency weighting is not uniform: the curves are a reference (the distance-1 value is still exact).",
+        "ANALYTIC_BLOCK_SIZE_LABEL": "Questions per block (n)",
+        "ANALYTIC_MAX_DISTANCE_LABEL": "Maximum distance",
+        "ANALYTIC_CURRENT_REQUESTS": "With the current requests: expected Dice **{dice_1:.3f}** between consecutive tests, **{dice_2:.3f}** at distance 2.",
+        "ANALYTIC_CURRENT_SERIES": "Current requests",
+        "ANALYTIC_SHOW_CHART": "Show chart",
+        "ANALYTIC_DISTANCE_AXIS": "Distance",
+        "ANALYTIC_DICE_AXIS": "Expected Dice",
         "STAT_TEST_EXCEL_CREATED": "✅ Excel file with statistical results '{filename}' created.",
         "STAT_TEST_EXCEL_SAVE_ERROR": "❌ Error saving Excel file '{filename}': {error}",
         "STAT_TEST_NO_DATA_FOR_EXCEL": "⚠️ No detailed data collected to create the Excel file.",
@@ -303,7 +385,33 @@ The application includes a functional test that performs an in-depth statistical
         "CL_VALIDATION_UNEXPECTED_ERROR": "❌ Unexpected error during functional test execution: {error}",
         "VALIDATION_NO_MESSAGES": "The functional test produced no specific messages.",
         # NEW KEY FOR SIMPLE SAMPLING WARNING
-        "BLOCK_SWITCH_TO_SIMPLE_SAMPLING_WARNING": "⚠️ Block {block_id}: Selecting {k_selected} out of {n_available} questions will use simple random sampling (reduced diversity)."
+        "BLOCK_SWITCH_TO_SIMPLE_SAMPLING_WARNING": "⚠️ Block {block_id}: Selecting {k_selected} out of {n_available} questions will use simple random sampling (reduced diversity).",
+        "RECENCY_LABEL": "4. Recency Weighting (WRSwOR)",
+        "RECENCY_HELP": "How strongly recently used questions are penalized in later tests (beyond the immediately following test, which is always excluded).",
+        "RECENCY_OPTION_EXPONENTIAL": "Exponential (half-life)",
+        "RECENCY_OPTION_LINEAR": "Linear",
+        "RECENCY_OPTION_NONE": "None (uniform weights)",
+        "SAMPLING_MODE_LABEL": "Sampling mode",
+        "SAMPLING_MODE_HELP": "Sequential: each copy avoids the questions of the previous one (with recency weighting). Global: the whole batch is optimized to reduce shared questions between ANY pair of copies. Seating: copy i goes to seat i of the room (row by row) and neighbouring seats share no questions.",
+        "SAMPLING_MODE_OPTION_SEQUENTIAL": "Sequential (copy by copy)",
+        "SAMPLING_MODE_OPTION_GLOBAL": "Global (whole batch)",
+        "SAMPLING_MODE_OPTION_SEATING": "Seating (room layout)",
+        "SAMPLING_MODE_RECENCY_NOTE": "Recency weighting does not apply in this mode.",
+        "SEATING_ROWS_LABEL": "Rows of desks",
+        "SEATING_COLS_LABEL": "Seats per row",
+        "SEATING_DIAGONAL_LABEL": "Diagonal neighbours",
+        "SEATING_DIAGONAL_HELP": "If enabled each seat has up to 8 neighbours (at least 4k questions per block are needed), otherwise 4 (front, back and sides).",
+        "SEATING_NUM_TESTS_NOTE": "One copy per seat: {num_tests} copies (copy n goes to seat n, counting row by row from the left).",
+        "HALF_LIFE_LABEL": "Penalty half-life (no. of tests)",
+        "HALF_LIFE_HELP": "After how many tests the penalty of an already used question halves.",
+        "SEED_LABEL": "5. Seed (optional)",
+        "SEED_HELP": "Leave empty for a random seed. The same file, parameters and seed always produce exactly the same tests.",
+        "COPIES_LABEL": "6. Reprint only these copies (optional)",
+        "COPIES_HELP": "Numbers of the copies to include in the PDF, comma separated (e.g. 3, 7). Use the same seed as the original generation.",
+        "SEED_INVALID_ERROR": "ERROR: The seed '{value}' is not a valid integer.",
+        "COPIES_INVALID_ERROR": "ERROR: Invalid copies '{value}'. Enter numbers between 1 and {num_tests} separated by commas.",
+        "PDF_SEED_INFO": "🔑 Seed used: {seed} (enter it in the Seed field to regenerate the same tests or reprint single copies).",
+        "PDF_COPY_INFO": "Copy {copy_number} - Seed {seed}"
     }
 }
 
@@ -338,3 +446,12 @@ def format_text(lang_code, key, **kwargs):
      except Exception as e_gen: # Catch other potential formatting errors
          print(f"WARN: Generic formatting error for text key '{key}' with args {kwargs} for lang '{lang_code}': {e_gen}")
          return raw_text
+
+def get_pdf_strings(lang_code):
+     """Testi stampati nel PDF (titolo, intestazione, copia/seed) nella lingua indicata, per pdf_generator."""
+     return {
+         "title_format": get_text(lang_code, "PDF_TEST_TITLE"), "name_label": get_text(lang_code, "PDF_NAME_LABEL"),
+         "date_label": get_text(lang_code, "PDF_DATE_LABEL"), "class_label": get_text(lang_code, "PDF_CLASS_LABEL"),
+         "missing_question": get_text(lang_code, "PDF_MISSING_QUESTION"), "no_options": get_text(lang_code, "PDF_NO_OPTIONS"),
+         "copy_info": get_text(lang_code, "PDF_COPY_INFO")
+     }
@@ -0,0 +1,174 @@
+# parse_cache.py
+# Cache dei file domande già analizzati, indicizzata sullo SHA-256 del contenuto caricato.
+# Il modulo è importato una sola volta dal processo Streamlit, quindi la cache è condivisa tra le sessioni.
+import hashlib
+import json
+import os
+import threading
+import zlib
+from collections import OrderedDict
+
+from config import PARSE_CACHE_MAX_BYTES, PARSE_CACHE_DIR
+from question_bank import QuestionBank
+
+HASH_CHUNK_BYTES = 1024 * 1024
+PARSE_CACHE_FORMAT_VERSION = 2 # Da incrementare se cambia il parser o il formato serializzato
+
+# ================================================================
+# Hash del Contenuto / Content Hash
+# ================================================================
+def content_hash(binary_stream):
+    """
+    SHA-256 (hex) del contenuto di uno stream binario (BytesIO, UploadedFile, file aperto),
+    letto a blocchi senza copiarlo in memoria. La posizione dello stream viene ripristinata.
+    """
+    start = binary_stream.tell()
+    binary_stream.seek(0)
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: binary_stream.read(HASH_CHUNK_BYTES), b''):
+        digest.update(chunk)
+    binary_stream.seek(start)
+    return digest.hexdigest()
+
+# ================================================================
+# Serializzazione Compatta / Compact Serialization
+# ================================================================
+def _serialize(all_questions, blocks_summary, warnings):
+    """
+    JSON compresso con zlib, nella stessa forma colonnare della QuestionBank:
+    testi, offset e testi delle risposte, original_index; block_id e tipo si ricostruiscono
+    da blocks_summary (le domande di ogni blocco sono contigue e nell'ordine del sommario).
+    """
+    bank = QuestionBank.from_questions(all_questions)
+    payload = {
+        'v': PARSE_CACHE_FORMAT_VERSION,
+        'blocks': [[b['block_id'], b['type'], b['count']] for b in blocks_summary],
+        'texts': bank.texts,
+        'answer_offsets': bank.answer_offsets.tolist(),
+        'answer_texts': bank.answer_texts,
+        'original_indices': bank.original_indices.tolist(),
+        'warnings': [list(w) for w in warnings],
+    }
+    return zlib.compress(json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+def _deserialize(blob):
+    """Inverso di _serialize. Restituisce (all_questions come QuestionBank, blocks_summary, warnings)."""
+    payload = json.loads(zlib.decompress(blob).decode('utf-8'))
+    if payload.get('v') != PARSE_CACHE_FORMAT_VERSION: raise ValueError("Formato cache non compatibile")
+    blocks_summary = [{'block_id': block_id, 'type': block_type, 'count': count}
+                      for block_id, block_type, count in payload['blocks']]
+    texts, offsets, answer_texts = payload['texts'], payload['answer_offsets'], payload['answer_texts']
+    original_indices = payload['original_indices']
+    bank = QuestionBank()
+    position = 0
+    for block in blocks_summary:
+        for _ in range(block['count']):
+            bank.append(texts[position], answer_texts[offsets[position]:offsets[position + 1]],
+                        original_indices[position], block['type'], block['block_id'])
+            position += 1
+    if position != len(texts): raise ValueError("Sommario blocchi non coerente con le domande")
+    warnings = [(msg_type, msg_key, kwargs) for msg_type, msg_key, kwargs in payload['warnings']]
+    return bank, blocks_summary, warnings
+
+# ================================================================
+# Cache LRU / LRU Cache
+# ================================================================
+class ParseCache:
+    """
+    Cache LRU thread-safe di banche domande serializzate, limitata in byte (dati compressi).
+    Con cache_dir le voci vengono anche scritte su disco (una per file) e rilette
+    dopo un riavvio; anche la cartella è limitata a max_bytes (eliminando le voci meno recenti).
+    """
+    def __init__(self, max_bytes=PARSE_CACHE_MAX_BYTES, cache_dir=PARSE_CACHE_DIR):
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self._entries = OrderedDict() # key -> blob compresso
+        self._size = 0
+        self._lock = threading.Lock()
+        if cache_dir: os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(file_hash, file_extension):
+        """La stessa sequenza di byte può essere analizzata diversamente in base all'estensione."""
+        return f"{file_hash}{file_extension.lower()}.v{PARSE_CACHE_FORMAT_VERSION}"
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, key + ".json.z")
+
+    def get(self, key):
+        """Restituisce (all_questions, blocks_summary, warnings) oppure None se assente."""
+        with self._lock:
+            blob = self._entries.get(key)
+            if blob is not None: self._entries.move_to_end(key)
+        if blob is None and self.cache_dir:
+            try:
+                with open(self._disk_path(key), 'rb') as f: blob = f.read()
+                os.utime(self._disk_path(key)) # Aggiorna la recenza per la pulizia su disco
+            except OSError:
+                return None
+            self._store_in_memory(key, blob)
+        if blob is None: return None
+        try:
+            return _deserialize(blob)
+        except (ValueError, KeyError, IndexError, zlib.error):
+            self.discard(key) # Voce corrotta o di un formato precedente
+            return None
+
+    def put(self, key, all_questions, blocks_summary, warnings=()):
+        """Memorizza il risultato di un'analisi riuscita (i warning vengono riproposti ai successivi hit)."""
+        blob = _serialize(all_questions, blocks_summary, warnings)
+        if len(blob) > self.max_bytes: return
+        self._store_in_memory(key, blob)
+        if self.cache_dir:
+            path = self._disk_path(key)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp_path, 'wb') as f: f.write(blob)
+                os.replace(tmp_path, path) # Scrittura atomica: nessun lettore vede file parziali
+                self._prune_disk()
+            except OSError:
+                pass # La persistenza è facoltativa: la cache in memoria resta valida
+
+    def discard(self, key):
+        with self._lock:
+            blob = self._entries.pop(key, None)
+            if blob is not None: self._size -= len(blob)
+        if self.cache_dir:
+            try: os.remove(self._disk_path(key))
+            except OSError: pass
+
+    def _store_in_memory(self, key, blob):
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None: self._size -= len(previous)
+            self._entries[key] = blob
+            self._size += len(blob)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def _prune_disk(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json.z"): continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes: break
+            try: os.remove(os.path.join(self.cache_dir, name))
+            except OSError: continue
+            total -= size
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size_bytes(self):
+        return self._size
+
+# Istanza condivisa da tutte le sessioni del processo
+PARSE_CACHE = ParseCache()
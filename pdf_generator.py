@@ -1,28 +1,58 @@
 # pdf_generator.py (Fixed type check for multiple choice)
+import hashlib
+import importlib.util
+import io
+import os
 import random
-import streamlit as st
+import tempfile
+import threading
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 
-# Import e controllo per WeasyPrint
-try:
-    from weasyprint import HTML, CSS
-    WEASYPRINT_AVAILABLE = True
-except ImportError:
-    WEASYPRINT_AVAILABLE = False
-except OSError as e:
-     st.error(f"Errore nell'import di WeasyPrint (probabili dipendenze mancanti come Pango/Cairo): {e}")
-     WEASYPRINT_AVAILABLE = False
+from config import PDF_COPY_CACHE_MAX_BYTES
+from instrumentation import NULL_PROFILER
 
+# WeasyPrint (con i binding Pango/Cairo) viene importato al primo rendering, non all'avvio:
+# weasyprint_available() verifica solo che il pacchetto sia installato, load_weasyprint() lo carica.
+HTML = CSS = FontConfiguration = None
+_weasyprint_error = None
 
-def generate_pdf_data(tests_data_lists, subject_name, status_callback, pdf_strings):
+def weasyprint_available():
     """
-    Genera dati PDF. Chiama status_callback solo per errori WeasyPrint.
+    Verifica economica (senza importare WeasyPrint): False se il pacchetto non è installato
+    o se un caricamento precedente è fallito. Le librerie native mancanti emergono solo al caricamento.
     """
-    if not WEASYPRINT_AVAILABLE:
-        status_callback("error", "PG_WEASYPRINT_UNAVAILABLE")
-        return None
+    if _weasyprint_error is not None: return False
+    return HTML is not None or importlib.util.find_spec("weasyprint") is not None
+
+def load_weasyprint():
+    """Importa WeasyPrint se non è già stato fatto. Restituisce None se riuscito, altrimenti l'eccezione."""
+    global HTML, CSS, FontConfiguration, _weasyprint_error
+    if HTML is None and _weasyprint_error is None:
+        try:
+            import weasyprint
+            try:
+                from weasyprint.text.fonts import FontConfiguration as font_configuration_class
+            except ImportError: # WeasyPrint < 53
+                from weasyprint.fonts import FontConfiguration as font_configuration_class
+            HTML, CSS, FontConfiguration = weasyprint.HTML, weasyprint.CSS, font_configuration_class
+        except (ImportError, OSError) as e: # OSError: dipendenze mancanti come Pango/Cairo
+            _weasyprint_error = e
+    return _weasyprint_error
+
+# pypdf (opzionale): unisce i PDF delle singole copie ("per_copy" e output su file in un unico PDF)
+PYPDF_AVAILABLE = importlib.util.find_spec("pypdf") is not None
 
-    # CSS (invariato)
-    css_style = """
+# "single": un unico documento HTML per tutte le copie (un solo write_pdf);
+# "per_copy": un documento WeasyPrint per copia, con le pagine unite nel PDF finale
+RENDER_MODES = ("single", "per_copy")
+# Formati di generate_pdf_file: ZIP di PDF per copia oppure PDF unico (richiede pypdf)
+OUTPUT_FORMATS = ("zip", "pdf")
+# Copie in rendering (o già pronte ma non ancora unite) per processo worker di "per_copy"
+RENDER_IN_FLIGHT_PER_WORKER = 2
+
+PDF_CSS = """
          @page { size: A4; margin: 2cm; }
          body { font-family: Verdana, sans-serif; font-size: 11pt; line-height: 1.4; }
          .test-container { }
@@ -37,9 +67,247 @@ def generate_pdf_data(tests_data_lists, subject_name, status_callback, pdf_strin
          .answer { display: flex; align-items: baseline; margin-left: 2.5em; margin-top: 0.1em; margin-bottom: 0.3em; padding-left: 0; text-indent: 0; }
          .checkbox { flex-shrink: 0; margin-right: 0.6em; font-family: 'DejaVu Sans', sans-serif; }
          .answer-text { }
+         .copy-info { font-size: 8pt; color: #555; text-align: right; margin-bottom: 0.4em; }
+    """
+
+def copy_rng(seed, copy_number):
+    """
+    Generatore per il mescolamento delle risposte di una singola copia, derivato da
+    (seed, numero copia): ogni copia è riproducibile indipendentemente dalle altre.
+    """
+    return random.Random(f"{seed}:{copy_number}")
+
+def _escape_text(text):
+    """Escaping usato nel PDF per testi di domande e risposte."""
+    return str(text).strip().replace('\r', '').replace('<', '&lt;').replace('>', '&gt;')
+
+class HtmlFragmentCache:
+    """
+    Frammenti HTML pre-escapati per domanda, calcolati alla prima occorrenza e riusati
+    in tutte le copie: testo della domanda (chiusura del paragrafo inclusa) e un frammento
+    <p class="answer"> per ogni risposta, nell'ordine originale (il mescolamento è per copia).
+    La chiave è original_index, quindi una cache va usata con una sola banca domande.
+    """
+    __slots__ = ('checkbox_char', 'missing_question_text', '_fragments')
+
+    def __init__(self, checkbox_char="☐", missing_question_text="MISSING QUESTION"):
+        self.checkbox_char = checkbox_char
+        self.missing_question_text = missing_question_text
+        self._fragments = {}
+
+    def fragments(self, question_data):
+        """
+        Restituisce (html_domanda, frammenti_risposte): frammenti_risposte è None per le
+        domande aperte, una tupla (eventualmente vuota) per quelle a scelta multipla.
+        """
+        key = question_data.get('original_index')
+        cached = self._fragments.get(key) if key is not None else None
+        if cached is not None: return cached
+        question_html = _escape_text(question_data.get('question', self.missing_question_text)) + '</p>\n'
+        answer_fragments = None
+        if question_data.get('type', 'Aperte') == 'Scelta Multipla': # Default ad Aperte se manca tipo
+            answer_fragments = tuple(
+                f'<p class="answer"><span class="checkbox">{self.checkbox_char}</span><span class="answer-text">{_escape_text(answer)}</span></p>\n'
+                for answer in question_data.get('answers', [])
+            )
+        cached = (question_html, answer_fragments)
+        if key is not None: self._fragments[key] = cached
+        return cached
+
+    def __len__(self):
+        return len(self._fragments)
+
+# ================================================================
+# Renderer Persistente / Persistent Renderer
+# ================================================================
+class PdfRenderer:
+    """
+    Renderer WeasyPrint riusabile tra le richieste: il foglio di stile (PDF_CSS) viene
+    analizzato una sola volta e la FontConfiguration (ricerca dei font Verdana/DejaVu Sans)
+    è condivisa da tutti i rendering. Il layout è serializzato da un lock, perché
+    FontConfiguration e Pango non sono garantiti thread-safe tra le sessioni Streamlit.
+    """
+    def __init__(self, css_text=PDF_CSS):
+        load_error = load_weasyprint()
+        if load_error is not None: raise load_error
+        self.font_config = FontConfiguration()
+        self.stylesheet = CSS(string=css_text, font_config=self.font_config)
+        self._lock = threading.Lock()
+
+    def render(self, body_html):
+        """Layout di un frammento <body> con lo stile condiviso: restituisce un Document WeasyPrint."""
+        with self._lock:
+            return HTML(string=_html_document(body_html)).render(stylesheets=[self.stylesheet], font_config=self.font_config)
+
+    def write_pdf(self, body_html):
+        return self.render(body_html).write_pdf()
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+def get_renderer():
+    """PdfRenderer condiviso dal processo, creato al primo utilizzo (anche nei processi worker)."""
+    global _renderer
+    if _renderer is None:
+        with _renderer_lock:
+            if _renderer is None: _renderer = PdfRenderer()
+    return _renderer
+
+# ================================================================
+# Rendering per Copia / Per-Copy Rendering
+# ================================================================
+class _CopyRenderCache:
+    """
+    LRU thread-safe (condivisa tra le sessioni) dei PDF delle singole copie, indicizzata sull'hash
+    dell'HTML della copia e limitata in byte: rigenerare una copia identica non ripete il layout.
+    Contiene solo byte PDF, mai Document WeasyPrint (alberi di layout molto più grandi).
     """
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict() # hash HTML -> byte PDF
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None: self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, pdf_bytes):
+        if len(pdf_bytes) > self.max_bytes: return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None: self._size -= len(previous)
+            self._entries[key] = pdf_bytes
+            self._size += len(pdf_bytes)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self):
+        with self._lock: self._entries.clear(); self._size = 0
 
-    html_parts = []
+    @property
+    def size_bytes(self):
+        return self._size
+
+_COPY_RENDER_CACHE = _CopyRenderCache(PDF_COPY_CACHE_MAX_BYTES)
+
+def _html_document(body_html):
+    """Documento HTML senza <style>: il foglio di stile è quello già analizzato da PdfRenderer."""
+    return f'<!DOCTYPE html><html><head><meta charset="UTF-8"><title>Verifiche Generate</title></head><body>{body_html}</body></html>'
+
+def _copy_container(copy_html, page_break):
+    page_break_class = " page-break" if page_break else ""
+    return f'<div class="test-container{page_break_class}">\n{copy_html}\n</div>'
+
+def _render_copy_pdf(copy_html):
+    """Rendering di una copia (nel processo corrente o in un worker): solo i byte PDF, il Document viene subito rilasciato."""
+    return get_renderer().write_pdf(_copy_container(copy_html, page_break=False))
+
+def _iter_copy_pdfs(keyed_copies, max_workers, profiler):
+    """
+    Genera (numero copia, byte PDF oppure l'eccezione del rendering) nell'ordine del lotto, una copia
+    alla volta: dalla cache, nel processo corrente o, con max_workers > 1, da un ProcessPoolExecutor.
+    Nel pool restano al più RENDER_IN_FLIGHT_PER_WORKER * max_workers copie non ancora restituite:
+    la successiva viene inviata solo dopo averne restituita una, così i PDF non si accumulano.
+    """
+    executor = None
+    if max_workers is not None and max_workers > 1 and len(keyed_copies) > 1:
+        executor = ProcessPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {}
+        to_submit = iter([(copy_number, copy_html) for copy_number, copy_html, html_hash in keyed_copies
+                          if _COPY_RENDER_CACHE.get(html_hash) is None] if executor is not None else ())
+        max_in_flight = RENDER_IN_FLIGHT_PER_WORKER * max_workers if executor is not None else 0
+        for copy_number, copy_html, html_hash in keyed_copies:
+            while len(futures) < max_in_flight:
+                next_number, next_html = next(to_submit, (None, None))
+                if next_number is None: break
+                futures[next_number] = executor.submit(_render_copy_pdf, next_html)
+            future = futures.pop(copy_number, None)
+            pdf_bytes = _COPY_RENDER_CACHE.get(html_hash) if future is None else None
+            if pdf_bytes is not None:
+                profiler.count("pdf.copy_cache_hits")
+                yield copy_number, pdf_bytes
+                continue
+            try:
+                with profiler.phase("pdf.layout"): pdf_bytes = future.result() if future is not None else _render_copy_pdf(copy_html)
+            except Exception as e:
+                yield copy_number, e
+                continue
+            _COPY_RENDER_CACHE.put(html_hash, pdf_bytes)
+            yield copy_number, pdf_bytes
+    finally:
+        if executor is not None: executor.shutdown(cancel_futures=True)
+
+def _render_per_copy(copies, status_callback, max_workers=None, profiler=NULL_PROFILER):
+    """
+    Renderizza ogni copia come documento WeasyPrint separato e unisce le pagine nel PDF finale.
+    Con pypdf: il PDF di ogni copia (in cache, limitata in byte) è aggiunto subito al PdfWriter,
+    quindi in memoria c'è il layout di una sola copia alla volta; con max_workers > 1 le copie
+    sono renderizzate da un ProcessPoolExecutor. Senza pypdf si ripiega sull'unione dei Document
+    (documents[0].copy(pagine).write_pdf()), con memoria proporzionale al numero di copie.
+    Una copia che fallisce genera il warning PG_COPY_RENDER_ERROR ed è esclusa dal PDF.
+    """
+    if not PYPDF_AVAILABLE: return _render_per_copy_documents(copies, status_callback, profiler)
+    from pypdf import PdfReader, PdfWriter
+    keyed_copies = [(copy_number, copy_html, hashlib.sha256(copy_html.encode('utf-8')).hexdigest())
+                    for copy_number, copy_html in copies]
+    writer = PdfWriter()
+    written = 0
+    last_error = None
+    for done, (copy_number, result) in enumerate(_iter_copy_pdfs(keyed_copies, max_workers, profiler), 1):
+        if isinstance(result, Exception):
+            last_error = result
+            profiler.count("pdf.copy_render_errors")
+            status_callback("warning", "PG_COPY_RENDER_ERROR", copy_number=copy_number, error=result)
+        else:
+            with profiler.phase("pdf.merge"): writer.append(PdfReader(io.BytesIO(result)))
+            written += 1
+        status_callback("progress", "PG_COPIES_RENDERED", done=done, total=len(keyed_copies))
+    if not written: raise last_error or ValueError("Nessuna copia da renderizzare")
+    profiler.count("pdf.copies_rendered", written)
+    output = io.BytesIO()
+    with profiler.phase("pdf.write"): writer.write(output)
+    return output.getvalue()
+
+def _render_per_copy_documents(copies, status_callback, profiler=NULL_PROFILER):
+    """Ripiego senza pypdf: un Document per copia, pagine unite da WeasyPrint (nessuna cache)."""
+    renderer = get_renderer()
+    documents = []
+    last_error = None
+    for position, (copy_number, copy_html) in enumerate(copies, 1):
+        status_callback("progress", "PG_COPIES_RENDERED", done=position - 1, total=len(copies))
+        try:
+            with profiler.phase("pdf.layout"): documents.append(renderer.render(_copy_container(copy_html, page_break=False)))
+        except Exception as e:
+            last_error = e
+            profiler.count("pdf.copy_render_errors")
+            status_callback("warning", "PG_COPY_RENDER_ERROR", copy_number=copy_number, error=e)
+    if not documents: raise last_error or ValueError("Nessuna copia da renderizzare")
+    status_callback("progress", "PG_COPIES_RENDERED", done=len(copies), total=len(copies))
+    profiler.count("pdf.copies_rendered", len(documents))
+    all_pages = [page for document in documents for page in document.pages]
+    with profiler.phase("pdf.write"): return documents[0].copy(all_pages).write_pdf()
+
+def _weasyprint_ready(status_callback):
+    """Carica WeasyPrint se necessario; in caso di errore lo segnala e restituisce False."""
+    load_error = load_weasyprint() if weasyprint_available() else ImportError("weasyprint")
+    if isinstance(load_error, OSError):
+        status_callback("error", "PG_WEASYPRINT_DEPENDENCY_ERROR", error=load_error)
+        return False
+    if load_error is not None:
+        status_callback("error", "PG_WEASYPRINT_UNAVAILABLE")
+        return False
+    return True
+
+def _iter_copies_html(tests_data_lists, subject_name, pdf_strings, seed=None, copy_numbers=None, fragment_cache=None):
+    """
+    Genera (numero copia, HTML interno della copia) una copia alla volta, nell'ordine del lotto.
+    Le risposte di ogni copia sono mescolate con copy_rng(seed, n) (o un generatore nuovo senza seed).
+    """
     checkbox_char = "☐"
     safe_subject_name = subject_name.replace('<', '&lt;').replace('>', '&gt;') if subject_name else "Materia Non Specificata"
     title_format = pdf_strings.get("title_format", "Test for {subject_name}")
@@ -48,40 +316,73 @@ def generate_pdf_data(tests_data_lists, subject_name, status_callback, pdf_strin
     class_label = pdf_strings.get("class_label", "Class:")
     missing_question_text = pdf_strings.get("missing_question", "MISSING QUESTION")
     no_options_text = pdf_strings.get("no_options", "<em>(No answer options provided)</em>")
+    copy_info_format = pdf_strings.get("copy_info", "Copy {copy_number} - Seed {seed}")
+    selected_copies = set(copy_numbers) if copy_numbers is not None else None
+    if fragment_cache is None: fragment_cache = HtmlFragmentCache(checkbox_char, missing_question_text)
+    no_options_html = f'<p class="answer">{no_options_text}</p>\n'
+
+    # Intestazione identica per tutte le copie: costruita una sola volta
+    test_title = title_format.format(subject_name=safe_subject_name)
+    header_html = (
+        f'<h2>{test_title}</h2>\n<div class="pdf-header-info">\n'
+        f'  <div class="header-line"><span class="header-label">{name_label}</span><span class="header-underline"></span></div>\n'
+        f'  <div class="header-line"><span class="header-label">{date_label}</span><span class="header-underline date-line"></span><span class="header-label class-label">{class_label}</span><span class="header-underline class-line"></span></div>\n</div>\n'
+    )
 
     for index, single_test_data in enumerate(tests_data_lists):
-        test_title = title_format.format(subject_name=safe_subject_name)
-        test_html = f'<h2>{test_title}</h2>\n<div class="pdf-header-info">\n'
-        test_html += f'  <div class="header-line"><span class="header-label">{name_label}</span><span class="header-underline"></span></div>\n'
-        test_html += f'  <div class="header-line"><span class="header-label">{date_label}</span><span class="header-underline date-line"></span><span class="header-label class-label">{class_label}</span><span class="header-underline class-line"></span></div>\n</div>\n'
-        q_counter = 1
-        for question_data in single_test_data:
-            q_text = question_data.get('question', missing_question_text).strip().replace('\r', '').replace('<', '&lt;').replace('>', '&gt;')
-            q_type = question_data.get('type', 'Aperte') # Default ad Aperte se manca tipo
-            nbsp = "&nbsp;"
-            test_html += f'<p class="question">{q_counter}.{nbsp}{q_text}</p>\n'
-
-            # --- CORREZIONE QUI: Usa 'Scelta Multipla' ---
-            # --- CORRECTION HERE: Use 'Scelta Multipla' ---
-            if q_type == 'Scelta Multipla':
-            # --- FINE CORREZIONE ---
-                answers = question_data.get('answers', []).copy(); random.shuffle(answers)
-                if not answers: test_html += f'<p class="answer">{no_options_text}</p>\n'
+        copy_number = index + 1
+        if selected_copies is not None and copy_number not in selected_copies: continue
+        answers_rng = copy_rng(seed, copy_number) if seed is not None else random.Random()
+        parts = []
+        if seed is not None:
+            parts.append(f'<p class="copy-info">{copy_info_format.format(copy_number=copy_number, seed=seed)}</p>\n')
+        parts.append(header_html)
+        for q_counter, question_data in enumerate(single_test_data, 1):
+            question_html, answer_fragments = fragment_cache.fragments(question_data)
+            parts.append(f'<p class="question">{q_counter}.&nbsp;')
+            parts.append(question_html)
+            # Solo le domande 'Scelta Multipla' hanno risposte; le aperte non hanno output extra
+            if answer_fragments is not None:
+                if not answer_fragments: parts.append(no_options_html)
                 else:
-                    for answer in answers:
-                        ans_text = str(answer).strip().replace('\r', '').replace('<', '&lt;').replace('>', '&gt;')
-                        test_html += f'<p class="answer"><span class="checkbox">{checkbox_char}</span><span class="answer-text">{ans_text}</span></p>\n'
-            # Nessun blocco else necessario, le domande aperte non hanno output extra
-            # No else block needed, open-ended questions have no extra output
-            q_counter += 1
-        page_break_class = " page-break" if index > 0 else ""
-        html_parts.append(f'<div class="test-container{page_break_class}">\n{test_html}\n</div>')
+                    answers = list(answer_fragments); answers_rng.shuffle(answers)
+                    parts.extend(answers)
+        yield copy_number, ''.join(parts)
+
+def generate_pdf_data(tests_data_lists, subject_name, status_callback, pdf_strings, seed=None, copy_numbers=None,
+                      fragment_cache=None, render_mode="single", max_workers=None, profiler=None):
+    """
+    Genera dati PDF. Chiama status_callback per errori WeasyPrint e con msg_type "progress"
+    (PG_COPIES_RENDERED, done/total) man mano che le copie vengono impaginate.
+    seed: se indicato, le risposte di ogni copia sono mescolate con copy_rng(seed, n)
+    e il seed viene stampato su ogni copia. copy_numbers: numeri (da 1) delle sole
+    copie da includere, per ristampare una copia senza rigenerare l'intero lotto.
+    Ogni copia è costruita da frammenti HTML pre-escapati (una sola join per copia);
+    fragment_cache: HtmlFragmentCache da riusare tra più chiamate sulla stessa banca.
+    render_mode="per_copy": ogni copia è un documento a sé (vedi _render_per_copy), con
+    max_workers > 1 renderizzato in processi separati se pypdf è disponibile; una copia
+    che fallisce viene segnalata con un warning senza perdere le altre.
+    profiler: Profiler (instrumentation) che riceve le fasi pdf.load, pdf.html, pdf.layout,
+    pdf.write (pdf.merge con pypdf) e i contatori pdf.copies_rendered, pdf.bytes_rendered, pdf.copy_cache_hits.
+    """
+    if profiler is None: profiler = NULL_PROFILER
+    with profiler.phase("pdf.load"):
+        if not _weasyprint_ready(status_callback): return None
+    if render_mode not in RENDER_MODES: raise ValueError(f"render_mode non valido: {render_mode!r}")
 
-    final_html_content = f'<!DOCTYPE html><html><head><meta charset="UTF-8"><title>Verifiche Generate</title><style>{css_style}</style></head><body>{"".join(html_parts)}</body></html>'
+    with profiler.phase("pdf.html"):
+        copies = list(_iter_copies_html(tests_data_lists, subject_name, pdf_strings, seed, copy_numbers, fragment_cache))
 
     try:
-        html_doc = HTML(string=final_html_content)
-        pdf_bytes = html_doc.write_pdf()
+        if render_mode == "per_copy":
+            pdf_bytes = _render_per_copy(copies, status_callback, max_workers, profiler)
+        else:
+            html_parts = [_copy_container(copy_html, page_break=position > 0) for position, (_, copy_html) in enumerate(copies)]
+            with profiler.phase("pdf.layout"): document = get_renderer().render(''.join(html_parts))
+            with profiler.phase("pdf.write"): pdf_bytes = document.write_pdf()
+            status_callback("progress", "PG_COPIES_RENDERED", done=len(copies), total=len(copies))
+            profiler.count("pdf.copies_rendered", len(copies))
+        profiler.count("pdf.bytes_rendered", len(pdf_bytes))
         return pdf_bytes
     except FileNotFoundError as e:
         status_callback("error", "PG_WEASYPRINT_DEPENDENCY_ERROR", error=e)
@@ -89,3 +390,72 @@ def generate_pdf_data(tests_data_lists, subject_name, status_callback, pdf_strin
     except Exception as e:
         status_callback("error", "PG_WEASYPRINT_OTHER_ERROR", error=e)
         return None
+
+# ================================================================
+# Output su File in Streaming / Streamed File Output
+# ================================================================
+def generate_pdf_file(tests_data_lists, subject_name, status_callback, pdf_strings, seed=None, copy_numbers=None,
+                      fragment_cache=None, output_format="zip", directory=None, profiler=None):
+    """
+    Come generate_pdf_data, ma scrive il risultato in un file temporaneo una copia alla volta,
+    così l'HTML e il layout di una sola copia sono in memoria in ogni momento.
+    output_format="zip": un PDF per copia (copia_001.pdf, ...) aggiunto via via a uno ZIP;
+    output_format="pdf": un unico PDF, con le pagine delle copie unite da pypdf (se pypdf
+    non è installato si ripiega sullo ZIP). Una copia che fallisce viene segnalata con
+    PG_COPY_RENDER_ERROR ed esclusa.
+    profiler: come in generate_pdf_data (pdf.bytes_rendered somma i PDF delle singole copie),
+    più la fase pdf.output (scrittura nello ZIP/PDF) e il contatore pdf.output_bytes.
+    Restituisce (percorso, formato effettivo) oppure (None, None); il file va eliminato dal chiamante.
+    """
+    if profiler is None: profiler = NULL_PROFILER
+    with profiler.phase("pdf.load"):
+        if not _weasyprint_ready(status_callback): return None, None
+    if output_format not in OUTPUT_FORMATS: raise ValueError(f"output_format non valido: {output_format!r}")
+    if output_format == "pdf" and not PYPDF_AVAILABLE: output_format = "zip"
+
+    fd, path = tempfile.mkstemp(suffix=f".{output_format}", prefix="verifiche_", dir=directory)
+    os.close(fd)
+    written = 0
+    last_error = None
+    num_copies = len(tests_data_lists) if copy_numbers is None else \
+        sum(1 for copy_number in set(copy_numbers) if 1 <= copy_number <= len(tests_data_lists))
+    try:
+        renderer = get_renderer()
+        if output_format == "zip":
+            archive = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED)
+        else:
+            from pypdf import PdfReader, PdfWriter
+            writer = PdfWriter()
+        copies = _iter_copies_html(tests_data_lists, subject_name, pdf_strings, seed, copy_numbers, fragment_cache)
+        try:
+            while True:
+                with profiler.phase("pdf.html"): copy_number, copy_html = next(copies, (None, None))
+                if copy_number is None: break
+                try:
+                    with profiler.phase("pdf.layout"): document = renderer.render(_copy_container(copy_html, page_break=False))
+                    with profiler.phase("pdf.write"): pdf_bytes = document.write_pdf()
+                except Exception as e:
+                    last_error = e
+                    profiler.count("pdf.copy_render_errors")
+                    status_callback("warning", "PG_COPY_RENDER_ERROR", copy_number=copy_number, error=e)
+                    continue
+                with profiler.phase("pdf.output"):
+                    if output_format == "zip":
+                        archive.writestr(f"copia_{copy_number:03d}.pdf", pdf_bytes)
+                    else:
+                        writer.append(PdfReader(io.BytesIO(pdf_bytes)))
+                written += 1
+                profiler.count("pdf.copies_rendered"); profiler.count("pdf.bytes_rendered", len(pdf_bytes))
+                status_callback("progress", "PG_COPIES_RENDERED", done=written, total=num_copies)
+        finally:
+            if output_format == "zip": archive.close()
+        if not written: raise last_error or ValueError("Nessuna copia da renderizzare")
+        if output_format == "pdf":
+            with profiler.phase("pdf.merge"), open(path, "wb") as f: writer.write(f)
+        profiler.count("pdf.output_bytes", os.path.getsize(path))
+        return path, output_format
+    except Exception as e:
+        os.remove(path)
+        error_key = "PG_WEASYPRINT_DEPENDENCY_ERROR" if isinstance(e, FileNotFoundError) else "PG_WEASYPRINT_OTHER_ERROR"
+        status_callback("error", error_key, error=e)
+        return None, None
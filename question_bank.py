@@ -0,0 +1,150 @@
+# question_bank.py
+# Rappresentazione colonnare e compatta della banca domande.
+import sys
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+
+# Codici interi dei tipi di domanda (al posto della stringa ripetuta per ogni domanda)
+TYPE_NAMES = ('Aperte', 'Scelta Multipla')
+TYPE_CODES = {name: code for code, name in enumerate(TYPE_NAMES)}
+
+_VIEW_KEYS = ('question', 'answers', 'original_index', 'type', 'block_id')
+
+# ================================================================
+# Vista Domanda / Question View
+# ================================================================
+class QuestionView(Mapping):
+    """
+    Vista in sola lettura di una domanda della QuestionBank, compatibile con i dizionari
+    domanda usati in precedenza ({'question', 'answers', 'original_index', 'type', 'block_id'}):
+    supporta q['question'], q.get(...), dict(q) e il confronto con un dict.
+    'answers' restituisce ogni volta una nuova lista.
+    """
+    __slots__ = ('_bank', '_position')
+
+    def __init__(self, bank, position):
+        self._bank = bank
+        self._position = position
+
+    def __getitem__(self, key):
+        bank, pos = self._bank, self._position
+        if key == 'question': return bank.texts[pos]
+        if key == 'answers': return bank.answers_of(pos)
+        if key == 'original_index': return bank.original_indices[pos]
+        if key == 'type': return TYPE_NAMES[bank.type_codes[pos]]
+        if key == 'block_id': return bank.block_ids[pos]
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(_VIEW_KEYS)
+
+    def __len__(self):
+        return len(_VIEW_KEYS)
+
+    def __repr__(self):
+        return f"QuestionView({dict(self)!r})"
+
+class _OriginalIndexLookup:
+    """Mappa original_index -> QuestionView senza dizionario: ricerca binaria sugli indici ordinati."""
+    __slots__ = ('_bank',)
+
+    def __init__(self, bank):
+        self._bank = bank
+
+    def __getitem__(self, original_index):
+        return QuestionView(self._bank, self._bank.position_of(original_index))
+
+# ================================================================
+# Banca Domande Colonnare / Columnar Question Bank
+# ================================================================
+class QuestionBank:
+    """
+    Banca domande in colonne parallele, una posizione per domanda (in ordine di file):
+    - texts: testi delle domande (stringhe internate);
+    - answer_offsets / answer_texts: risposte di tutte le domande in un'unica lista,
+      quelle della domanda i sono answer_texts[answer_offsets[i]:answer_offsets[i + 1]];
+    - original_indices, block_ids, type_codes: array di interi (tipo come indice in TYPE_NAMES);
+    - block_ranges: block_id -> (start, stop) delle posizioni del blocco (contigue).
+    Si comporta come una sequenza di QuestionView (len, indice, iterazione).
+    """
+    __slots__ = ('texts', 'answer_offsets', 'answer_texts', 'original_indices',
+                 'block_ids', 'type_codes', 'block_ranges', '_position_by_index')
+
+    def __init__(self):
+        self.texts = []
+        self.answer_offsets = array('l', [0])
+        self.answer_texts = []
+        self.original_indices = array('l')
+        self.block_ids = array('l')
+        self.type_codes = array('b')
+        self.block_ranges = {}
+        self._position_by_index = None # Solo se gli original_index non sono crescenti
+
+    # --- Costruzione / Construction ---
+    def append(self, question_text, answers, original_index, question_type, block_id):
+        """Aggiunge una domanda; le domande di uno stesso blocco devono essere consecutive (ValueError altrimenti)."""
+        position = len(self.texts)
+        start, stop = self.block_ranges.get(block_id, (position, position))
+        if stop != position:
+            raise ValueError(f"Domande del blocco {block_id} non consecutive: il blocco termina alla posizione {stop}, "
+                             f"la domanda (original_index {original_index}) è alla posizione {position}")
+        self.texts.append(sys.intern(question_text))
+        self.answer_texts.extend(sys.intern(answer) for answer in answers)
+        self.answer_offsets.append(len(self.answer_texts))
+        if self.original_indices and original_index <= self.original_indices[-1] and self._position_by_index is None:
+            self._position_by_index = {idx: pos for pos, idx in enumerate(self.original_indices)}
+        if self._position_by_index is not None: self._position_by_index[original_index] = position
+        self.original_indices.append(original_index)
+        self.block_ids.append(block_id)
+        self.type_codes.append(TYPE_CODES[question_type])
+        self.block_ranges[block_id] = (start, position + 1)
+
+    @classmethod
+    def from_questions(cls, questions):
+        """Costruisce la banca da dizionari domanda (o viste), raggruppandoli per blocco."""
+        if isinstance(questions, cls): return questions
+        by_block = {}
+        for q in questions: by_block.setdefault(q['block_id'], []).append(q)
+        bank = cls()
+        for block_questions in by_block.values():
+            for q in block_questions:
+                bank.append(q['question'], q.get('answers', []), q['original_index'], q['type'], q['block_id'])
+        return bank
+
+    # --- Accesso / Access ---
+    def answers_of(self, position):
+        return self.answer_texts[self.answer_offsets[position]:self.answer_offsets[position + 1]]
+
+    def position_of(self, original_index):
+        if self._position_by_index is not None: return self._position_by_index[original_index]
+        position = bisect_left(self.original_indices, original_index)
+        if position == len(self.original_indices) or self.original_indices[position] != original_index:
+            raise KeyError(original_index)
+        return position
+
+    @property
+    def by_original_index(self):
+        """Accesso per original_index (bank.by_original_index[idx] -> QuestionView)."""
+        return _OriginalIndexLookup(self)
+
+    def block_original_indices(self, block_id):
+        """array degli original_index del blocco (copia della fetta contigua)."""
+        start, stop = self.block_ranges[block_id]
+        return self.original_indices[start:stop]
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [QuestionView(self, pos) for pos in range(*position.indices(len(self)))]
+        if position < 0: position += len(self)
+        if not 0 <= position < len(self): raise IndexError(position)
+        return QuestionView(self, position)
+
+    def __iter__(self):
+        return (QuestionView(self, pos) for pos in range(len(self)))
+
+    def __repr__(self):
+        return f"QuestionBank({len(self)} domande, {len(self.block_ranges)} blocchi)"
@@ -0,0 +1,185 @@
+# seating.py
+# Generazione consapevole della disposizione dei posti: la copia i va al posto i e due posti vicini
+# (griglia righe x colonne o lista di adiacenza esplicita) non devono avere domande in comune.
+# Assegnazione golosa in stile colorazione di grafi: O(posti * grado * k), senza confronti tra tutte le coppie.
+# Usato da generate_all_tests_data(sampling_mode="seating").
+import json
+from collections import deque
+
+from instrumentation import NULL_PROFILER
+
+# ================================================================
+# Disposizione dei Posti / Seating Layout
+# ================================================================
+def grid_adjacency(rows, cols, diagonal=True):
+    """
+    Vicini di ogni posto di un'aula rows x cols, numerati per righe (posto r * cols + c, da 0).
+    diagonal=True: 8 vicini (anche in diagonale); False: 4 (davanti, dietro, a destra, a sinistra).
+    """
+    if rows < 1 or cols < 1: raise ValueError(f"Disposizione non valida: {rows} x {cols}")
+    offsets = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+    if diagonal: offsets += [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+    return [[(r + dr) * cols + c + dc for dr, dc in offsets if 0 <= r + dr < rows and 0 <= c + dc < cols]
+            for r in range(rows) for c in range(cols)]
+
+def normalize_adjacency(neighbours, num_seats=None):
+    """
+    Lista di adiacenza (posti da 0) resa simmetrica e senza duplicati. Solleva ValueError per posti
+    fuori intervallo o vicini di se stessi. num_seats: numero di posti (default: len(neighbours)).
+    """
+    num_seats = len(neighbours) if num_seats is None else num_seats
+    if len(neighbours) > num_seats: raise ValueError(f"Lista di adiacenza con {len(neighbours)} posti, attesi {num_seats}")
+    adjacency = [set() for _ in range(num_seats)]
+    for seat, seat_neighbours in enumerate(neighbours):
+        for other in seat_neighbours:
+            if not 0 <= other < num_seats: raise ValueError(f"Posto {other + 1} (vicino del posto {seat + 1}) fuori intervallo")
+            if other == seat: raise ValueError(f"Il posto {seat + 1} è indicato come vicino di se stesso")
+            adjacency[seat].add(other); adjacency[other].add(seat)
+    return [sorted(seat_neighbours) for seat_neighbours in adjacency]
+
+def load_adjacency_json(source):
+    """
+    Lista di adiacenza da JSON (percorso o file aperto), con posti numerati da 1 come le copie:
+    una lista in cui l'elemento i contiene i vicini del posto i + 1 ([[2, 4], [1, 3], ...]),
+    oppure un oggetto {"1": [2, 4], "2": [1, 3], ...}. Restituisce la lista normalizzata (posti da 0).
+    """
+    if isinstance(source, str):
+        with open(source, encoding="utf-8") as f: data = json.load(f)
+    else:
+        data = json.load(source)
+    if isinstance(data, dict):
+        seats = {int(seat): seat_neighbours for seat, seat_neighbours in data.items()}
+        num_seats = max(list(seats) + [other for seat_neighbours in seats.values() for other in seat_neighbours], default=0)
+        if min(seats, default=1) < 1: raise ValueError("I posti sono numerati da 1")
+        neighbours = [seats.get(seat, []) for seat in range(1, num_seats + 1)]
+    elif isinstance(data, list):
+        neighbours = data
+    else:
+        raise ValueError("Formato di adiacenza non riconosciuto: attesa una lista o un oggetto JSON")
+    return normalize_adjacency([[int(other) - 1 for other in seat_neighbours] for seat_neighbours in neighbours])
+
+# ================================================================
+# Assegnazione / Assignment
+# ================================================================
+class _SeatCursor:
+    """
+    Distribuzione a rotazione delle posizioni population di un blocco: ogni ciclo è una permutazione nuova,
+    così gli utilizzi restano bilanciati. Le posizioni saltate perché vietate (già date a un vicino)
+    restano in attesa e vengono riproposte per prime al posto successivo: take costa O(k + saltate),
+    cioè O(grado * k), senza scorrere l'intero blocco.
+    """
+    __slots__ = ('population', 'rng', 'pending', 'queue')
+
+    def __init__(self, population, rng):
+        self.population, self.rng = population, rng
+        self.pending = deque() # Posizioni del ciclo corrente saltate in precedenza
+        self.queue = deque() # Resto del ciclo corrente
+
+    def _refill(self, exclude):
+        permutation = [pos for pos in self.population if pos not in exclude]
+        self.rng.shuffle(permutation)
+        self.queue.extend(permutation)
+
+    def take(self, k, forbidden):
+        """Fino a k posizioni distinte fuori da forbidden (meno di k solo se il blocco non ne ha abbastanza)."""
+        chosen, skipped = [], []
+        chosen_set = set()
+        refills = 0
+        while len(chosen) < k:
+            if self.pending: pos = self.pending.popleft()
+            elif self.queue: pos = self.queue.popleft()
+            else:
+                # Ciclo esaurito: le saltate restano in attesa, il nuovo ciclo contiene tutte le altre
+                if refills == 2: break
+                refills += 1
+                self.pending.extend(skipped); skipped = []
+                self._refill(chosen_set | set(self.pending))
+                if not self.queue and not self.pending: break
+                continue
+            if pos in forbidden or pos in chosen_set:
+                skipped.append(pos)
+            else:
+                chosen.append(pos); chosen_set.add(pos)
+        self.pending.extendleft(reversed(skipped))
+        return chosen
+
+def greedy_colouring(neighbours):
+    """Colorazione golosa in ordine di posto: (colore di ogni posto, numero di colori). 4 colori su una griglia con diagonali."""
+    colours = [None] * len(neighbours)
+    for seat, seat_neighbours in enumerate(neighbours):
+        used = {colours[other] for other in seat_neighbours}
+        colour = 0
+        while colour in used: colour += 1
+        colours[seat] = colour
+    return colours, max(colours, default=-1) + 1
+
+def _greedy_block(n, k, neighbours, rng):
+    """Posizioni (0..n-1) per ogni posto, evitando quelle dei vicini già assegnati; conflitti solo se inevitabili."""
+    cursor = _SeatCursor(range(n), rng)
+    seat_positions = [None] * len(neighbours)
+    for seat, seat_neighbours in enumerate(neighbours):
+        assigned = [seat_positions[other] for other in seat_neighbours if seat_positions[other] is not None]
+        forbidden = set().union(*assigned)
+        positions = cursor.take(k, forbidden)
+        if len(positions) < k:
+            # Conflitto: le posizioni vietate meno usate dai vicini
+            usage = {}
+            for other_positions in assigned:
+                for pos in other_positions: usage[pos] = usage.get(pos, 0) + 1
+            taken = set(positions)
+            positions += sorted((pos for pos in forbidden if pos not in taken), key=usage.get)[:k - len(positions)]
+        seat_positions[seat] = positions
+    return seat_positions
+
+def _colour_class_block(n, k, colours, num_colours, rng):
+    """
+    Posizioni per ogni posto con il blocco diviso in num_colours gruppi disgiunti: i posti di un colore
+    estraggono solo dal proprio gruppo, quindi due vicini (colori diversi) non condividono mai domande.
+    Richiede n >= num_colours * k.
+    """
+    permutation = list(range(n))
+    rng.shuffle(permutation)
+    cursors = [_SeatCursor(permutation[colour::num_colours], rng) for colour in range(num_colours)]
+    return [cursors[colour].take(k, ()) for colour in colours]
+
+def _conflicting_pairs(seat_positions, neighbours):
+    """Coppie di vicini con posizioni in comune (O(archi * k))."""
+    position_sets = [set(positions) for positions in seat_positions]
+    return sum(1 for seat, seat_neighbours in enumerate(neighbours) for other in seat_neighbours
+               if other > seat and not position_sets[seat].isdisjoint(position_sets[other]))
+
+def assign_seating(block_indices, block_requests, neighbours, rng, status_callback=None, profiler=None):
+    """
+    Selezioni per posto: {block_id: lista (una per posto) di liste di original_index}, con esattamente k
+    domande per blocco. Per ogni blocco:
+    1. assegnazione golosa in ordine di posto (per righe nelle griglie): ogni posto evita le domande già
+       date ai suoi vicini (al più grado * k), come un colore che evita quelli dei vicini; su una griglia
+       con diagonali basta n >= 5k (4 vicini già assegnati);
+    2. se restano conflitti e n >= C * k (C = colori di greedy_colouring, 4 su una griglia con diagonali),
+       il blocco viene diviso in C gruppi disgiunti, uno per colore, e i conflitti spariscono.
+    Altrimenti le domande mancanti di un posto sono quelle condivise con meno vicini.
+    block_indices: {block_id: sequenza degli original_index}; block_requests: {block_id: k} già validati.
+    Restituisce (selezioni, conflitti) con conflitti = {block_id: coppie di vicini con domande in comune}.
+    """
+    if profiler is None: profiler = NULL_PROFILER
+    num_seats = len(neighbours)
+    selections, conflicts = {}, {}
+    colouring = None
+    with profiler.phase("sampling.seating"):
+        for block_number, (block_id, k) in enumerate(block_requests.items()):
+            indices = block_indices[block_id]
+            n = len(indices)
+            seat_positions = _greedy_block(n, k, neighbours, rng)
+            conflicts[block_id] = _conflicting_pairs(seat_positions, neighbours)
+            if conflicts[block_id]:
+                if colouring is None: colouring = greedy_colouring(neighbours)
+                colours, num_colours = colouring
+                if num_colours * k <= n:
+                    profiler.count("sampling.seating_colour_classes", label=block_id)
+                    seat_positions = _colour_class_block(n, k, colours, num_colours, rng)
+                    conflicts[block_id] = _conflicting_pairs(seat_positions, neighbours)
+            if conflicts[block_id]: profiler.count("sampling.seating_conflicts", conflicts[block_id], label=block_id)
+            selections[block_id] = [[indices[pos] for pos in positions] for positions in seat_positions]
+            if status_callback is not None:
+                status_callback("progress", "CL_SEATING_BLOCKS", done=block_number + 1, total=len(block_requests))
+    return selections, conflicts
@@ -0,0 +1,108 @@
+# similarity_model.py
+# Modello analitico della similarità (Sørensen–Dice) attesa tra verifiche a distanza d,
+# per il campionamento di core_logic con recency_weighting="none" (pesi uniformi).
+# Calcolo esatto in O(d) per blocco (ricorrenza della media), senza simulazione: il Monte Carlo di test.py resta come verifica.
+import importlib.util
+import math
+
+# NumPy solo per le distribuzioni complete (overlap_distributions); il Dice atteso non ne ha bisogno
+NUMPY_AVAILABLE = importlib.util.find_spec("numpy") is not None
+
+METHOD_SIMPLE_RANDOM = "Simple Random"
+METHOD_AVOID_LAST = "WRSwOR"
+
+def block_sampling_method(n, k):
+    """Metodo scelto da generate_all_tests_data per un blocco di n domande con k richieste."""
+    return METHOD_SIMPLE_RANDOM if k * 2 >= n else METHOD_AVOID_LAST
+
+# ================================================================
+# Sovrapposizione per Blocco / Per-Block Overlap
+# ================================================================
+def _log_factorials(n):
+    """log(i!) per i = 0..n, da math.lgamma: le probabilità ipergeometriche restano in virgola mobile."""
+    return [math.lgamma(i + 1) for i in range(n + 1)]
+
+def _hypergeometric_pmf(log_fact, population, successes, draws):
+    """Probabilità di x = 0..draws successi estraendo draws elementi su population, di cui successes favorevoli."""
+    def log_comb(a, b): return log_fact[a] - log_fact[b] - log_fact[a - b]
+    log_total = log_comb(population, draws)
+    return [math.exp(log_comb(successes, x) + log_comb(population - successes, draws - x) - log_total)
+            if x <= successes and draws - x <= population - successes else 0.0 for x in range(draws + 1)]
+
+def _avoid_last_transition(n, k):
+    """
+    Matrice di transizione della catena di Markov sulla sovrapposizione j = |S_0 ∩ S_t|.
+    S_{t+1} è un k-sottoinsieme uniforme del complemento di S_t (n - k domande), che contiene
+    k - j domande di S_0: la nuova sovrapposizione è ipergeometrica (n - k, k - j, k).
+    """
+    log_fact = _log_factorials(n)
+    return [_hypergeometric_pmf(log_fact, n - k, k - j, k) for j in range(k + 1)]
+
+def overlap_distributions(n, k, max_distance):
+    """
+    Distribuzioni di |S_t ∩ S_{t+d}| per d = 1..max_distance (liste di k + 1 probabilità).
+    Simple Random (2k >= n): estrazioni indipendenti, ipergeometrica (n, k, k) a ogni distanza.
+    Avoid-last (2k < n): S_t è uniforme per ogni t, quindi la distribuzione non dipende da t
+    ed è la riga j = k della d-esima potenza della matrice di transizione (prodotti con NumPy se presente).
+    """
+    if not 0 < k <= n: raise ValueError(f"Richiesta non valida: k={k}, n={n}")
+    if block_sampling_method(n, k) == METHOD_SIMPLE_RANDOM:
+        independent = _hypergeometric_pmf(_log_factorials(n), n, k, k)
+        return [list(independent) for _ in range(max_distance)]
+    transition = _avoid_last_transition(n, k)
+    distributions = []
+    if NUMPY_AVAILABLE:
+        import numpy as np
+        transition, distribution = np.array(transition), np.zeros(k + 1)
+        distribution[k] = 1.0 # Distanza 0: S_t con se stesso
+        for _ in range(max_distance):
+            distribution = distribution @ transition
+            distributions.append(distribution.tolist())
+        return distributions
+    distribution = [0.0] * k + [1.0]
+    for _ in range(max_distance):
+        next_distribution = [0.0] * (k + 1)
+        for j, p in enumerate(distribution):
+            if p:
+                # Da j la sovrapposizione successiva è al più k - j
+                for j_next, q in enumerate(transition[j][:k - j + 1]): next_distribution[j_next] += p * q
+        distribution = next_distribution
+        distributions.append(distribution)
+    return distributions
+
+def expected_block_overlap(n, k, max_distance):
+    """
+    Lista delle intersezioni attese E|S_t ∩ S_{t+d}| per d = 1..max_distance, in O(max_distance).
+    Simple Random: k^2 / n. Avoid-last: la media ipergeometrica k(k - j)/(n - k) è lineare in j,
+    quindi E_{d+1} = k(k - E_d)/(n - k) con E_0 = k, esatta senza passare dalle distribuzioni.
+    """
+    if not 0 < k <= n: raise ValueError(f"Richiesta non valida: k={k}, n={n}")
+    if block_sampling_method(n, k) == METHOD_SIMPLE_RANDOM:
+        return [k * k / n] * max_distance
+    expected, overlaps = float(k), []
+    for _ in range(max_distance):
+        expected = k * (k - expected) / (n - k)
+        overlaps.append(expected)
+    return overlaps
+
+# ================================================================
+# Dice Atteso / Expected Dice
+# ================================================================
+def expected_dice_by_distance(block_shapes, max_distance):
+    """
+    Dice atteso tra verifiche a distanza d = 1..max_distance, come {d: valore}.
+    block_shapes: coppie (n, k) dei blocchi richiesti (k = 0 ignorati). Ogni verifica ha
+    K = somma dei k domande e i blocchi sono campionati indipendentemente, quindi
+    Dice = 2 * intersezione / 2K e il valore atteso è la somma delle intersezioni attese / K.
+    """
+    shapes = [(n, k) for n, k in block_shapes if k > 0]
+    total_k = sum(k for _, k in shapes)
+    if not total_k: return {}
+    totals = [0.0] * max_distance
+    for n, k in shapes:
+        for index, overlap in enumerate(expected_block_overlap(n, k, max_distance)): totals[index] += overlap
+    return {d: totals[d - 1] / total_k for d in range(1, max_distance + 1)}
+
+def expected_dice_table(n, k_values, max_distance):
+    """{k: {d: Dice atteso}} per blocchi uguali di n domande (il numero di blocchi non cambia il Dice)."""
+    return {k: expected_dice_by_distance([(n, k)], max_distance) for k in k_values if 0 < k <= n}
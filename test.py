@@ -1,107 +1,88 @@
 # test.py (Correct sampling logic + Excel formatting)
 import pandas as pd
+import numpy as np
 import random
 import os
 import math
+import multiprocessing
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 
 # Importa la funzione di generazione principale da core_logic
 # ASSICURATI CHE core_logic.py SIA LA VERSIONE CON LA LOGICA UNIFICATA
 # MAKE SURE core_logic.py IS THE VERSION WITH THE UNIFIED LOGIC
-from core_logic import generate_all_tests_data
+from config import DEFAULT_RECENCY_WEIGHTING, DEFAULT_RECENCY_HALF_LIFE, VALIDATION_MAX_WORKERS
+from core_logic import generate_all_tests_data, CompiledQuestionBank, new_seed
+from file_handler import iter_xlsx_rows, iter_xls_rows, parse_question_rows
+from similarity_model import block_sampling_method, expected_dice_by_distance
 
 # Costante per il nome del file di test e output
 TEST_EXCEL_FILE = "test_set_4_by_12_questions.xlsx"
 OUTPUT_EXCEL_FILE = "similarity_analysis_unified_dice_mc_15t.xlsx"
 
-def _load_test_questions(status_callback):
+def _load_test_questions(status_callback, test_file=TEST_EXCEL_FILE):
     """
-    Carica domande da TEST_EXCEL_FILE, rileva blocchi e tipi.
+    Carica domande da test_file (default TEST_EXCEL_FILE), rileva blocchi e tipi.
     Restituisce (all_questions, blocks_summary, None) o (None, None, chiave_errore).
     Chiama status_callback solo per errori critici.
     """
-    if not os.path.exists(TEST_EXCEL_FILE):
-        status_callback("error", "TEST_FILE_NOT_FOUND", filename=TEST_EXCEL_FILE)
+    if not os.path.exists(test_file):
+        status_callback("error", "TEST_FILE_NOT_FOUND", filename=test_file)
         return None, None, "TEST_FILE_NOT_FOUND"
     try:
-        _, file_extension = os.path.splitext(TEST_EXCEL_FILE)
+        _, file_extension = os.path.splitext(test_file)
         if file_extension.lower() not in ['.xlsx', '.xls']:
-             status_callback("error", "FH_UNSUPPORTED_FORMAT", filename=TEST_EXCEL_FILE, extension=file_extension)
+             status_callback("error", "FH_UNSUPPORTED_FORMAT", filename=test_file, extension=file_extension)
              return None, None, "FH_UNSUPPORTED_FORMAT"
 
-        df = pd.read_excel(TEST_EXCEL_FILE, header=None)
-        df = df.fillna('').astype(str)
-
-        all_questions = []
-        blocks_summary = []
-        current_block_id = 1
-        current_block_questions = []
-        current_block_type = None
-        first_question_in_block = True
-
-        df.loc[len(df)] = [""] * df.shape[1]
-
-        for index, row in df.iterrows():
-            is_empty_row = all(s is None or str(s).strip() == "" for s in row)
-            if is_empty_row:
-                if current_block_questions:
-                    if current_block_type is None: current_block_type = 'Indeterminato'
-                    blocks_summary.append({
-                        'block_id': current_block_id,
-                        'type': current_block_type,
-                        'count': len(current_block_questions)
-                    })
-                    all_questions.extend(current_block_questions)
-                current_block_id += 1
-                current_block_questions = []
-                current_block_type = None
-                first_question_in_block = True
-            else:
-                row_list = [str(s).strip() for s in row]
-                question_text = row_list[0]
-                answers = [ans for ans in row_list[1:] if ans]
-                if question_text:
-                    question_type = 'Scelta Multipla' if len(answers) >= 2 else 'Aperte'
-                    if first_question_in_block:
-                        current_block_type = question_type
-                        first_question_in_block = False
-                    elif question_type != current_block_type:
-                        status_callback("warning", "FH_BLOCK_MIXED_TYPES", block_id=current_block_id, expected=current_block_type, found=question_type, row_num=index + 1)
-                        continue
-                    question_dict = {
-                        'question': question_text,
-                        'answers': answers if current_block_type == 'Scelta Multipla' else [],
-                        'original_index': index,
-                        'type': current_block_type,
-                        'block_id': current_block_id
-                    }
-                    current_block_questions.append(question_dict)
-
-        blocks_summary = [b for b in blocks_summary if b['count'] > 0]
+        # Stesso parser in streaming usato da file_handler per i file caricati
+        rows = iter_xlsx_rows(test_file) if file_extension.lower() == '.xlsx' else iter_xls_rows(test_file)
+        all_questions, blocks_summary = parse_question_rows(rows, status_callback)
         if not all_questions:
-            status_callback("error", "FH_NO_VALID_QUESTIONS", filename=TEST_EXCEL_FILE)
+            status_callback("error", "FH_NO_VALID_QUESTIONS", filename=test_file)
             return None, None, "FH_NO_VALID_QUESTIONS"
         return all_questions, blocks_summary, None
     except Exception as e:
-        status_callback("error", "TEST_LOAD_ERROR", filename=TEST_EXCEL_FILE, error=str(e))
+        status_callback("error", "TEST_LOAD_ERROR", filename=test_file, error=str(e))
         return None, None, "TEST_LOAD_ERROR"
 
 
-def _calculate_dice(set1, set2):
-    """Calcola il coefficiente di Sørensen–Dice tra due insiemi."""
-    intersection_cardinality = len(set1.intersection(set2))
-    denominator = len(set1) + len(set2)
-    if denominator == 0: return 1.0
-    return 2 * intersection_cardinality / denominator
-
-def _run_single_unified_analysis_for_k(k_per_block, blocks_info, all_questions_list, num_tests_to_generate):
+def _incidence_matrix(tests_data):
+    """
+    Matrice di incidenza test x domande (float32, 1 se la domanda è nel test).
+    Le colonne sono solo le domande effettivamente usate, in ordine di original_index.
+    """
+    question_ids = sorted({q['original_index'] for test in tests_data for q in test})
+    column_of = {idx: col for col, idx in enumerate(question_ids)}
+    incidence = np.zeros((len(tests_data), len(question_ids)), dtype=np.float32)
+    for row, test in enumerate(tests_data):
+        incidence[row, [column_of[q['original_index']] for q in test]] = 1.0
+    return incidence
+
+def _dice_matrix(incidence):
+    """
+    Matrice T x T dei coefficienti di Sørensen–Dice con un solo prodotto matriciale:
+    intersezioni = X @ X.T, cardinalità sulla diagonale. Due test entrambi vuoti (0/0) hanno Dice 1.0.
+    """
+    intersections = (incidence @ incidence.T).astype(np.float64) # Conteggi esatti (interi < 2**24 in float32)
+    sizes = np.diag(intersections)
+    denominators = sizes[:, None] + sizes[None, :]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dice = np.where(denominators > 0, 2.0 * intersections / denominators, 1.0)
+    return dice
+
+def _mean_dice_by_distance(dice, max_distance):
+    """Media del Dice tra coppie (i, i+d) per ogni distanza d: media della d-esima sopradiagonale."""
+    return {d: float(np.diagonal(dice, offset=d).mean()) for d in range(1, max_distance + 1) if d < dice.shape[0]}
+
+def _run_single_unified_analysis_for_k(k_per_block, blocks_info, all_questions_list, num_tests_to_generate, rng=None,
+                                       recency_weighting=DEFAULT_RECENCY_WEIGHTING, recency_half_life=DEFAULT_RECENCY_HALF_LIFE):
     """
     Esegue UNA SINGOLA analisi di similarità per un dato k_per_block,
-    usando la logica unificata (WRSwOR o Simple Random) di core_logic.
+    usando la logica unificata (WRSwOR o Simple Random) di core_logic con la pesatura di recenza indicata.
     Restituisce dizionario {distance: avg_dice_index} e lista messaggi errore generazione.
     NON chiama status_callback.
     """
-    dice_by_distance = {}
     max_distance_to_check = num_tests_to_generate - 1
     generation_error_messages = []
     def nop_callback(*args, **kwargs): pass
@@ -113,7 +94,8 @@ def _run_single_unified_analysis_for_k(k_per_block, blocks_info, all_questions_l
 
     # Chiama la funzione generate_all_tests_data aggiornata da core_logic
     generated_tests_data, gen_messages_internal = generate_all_tests_data(
-        all_questions_list, block_requests, num_tests_to_generate, nop_callback
+        all_questions_list, block_requests, num_tests_to_generate, nop_callback,
+        recency_weighting=recency_weighting, recency_half_life=recency_half_life, rng=rng
     )
     generation_error_messages.extend([msg for msg in gen_messages_internal if msg[0] == 'error' or msg[0] == 'warning']) # Raccoglie anche warning (es. fallback)
 
@@ -122,117 +104,242 @@ def _run_single_unified_analysis_for_k(k_per_block, blocks_info, all_questions_l
              generation_error_messages.append(("error", "STAT_TEST_GENERATION_FAILED_KPB", {"k_per_block": k_per_block}))
         return None, generation_error_messages
 
-    test_sets = [set(q['original_index'] for q in test) for test in generated_tests_data]
-    for d in range(1, max_distance_to_check + 1):
-        dice_indices_for_d = []
-        for i in range(num_tests_to_generate - d):
-            dice_index = _calculate_dice(test_sets[i], test_sets[i + d])
-            dice_indices_for_d.append(dice_index)
-        if dice_indices_for_d:
-            dice_by_distance[d] = dice_indices_for_d
-
+    # Matrice Dice completa da un unico prodotto matriciale, medie per distanza dalle sue diagonali
+    dice = _dice_matrix(_incidence_matrix(generated_tests_data))
     avg_dice_results_for_k = {}
-    for d, indices in dice_by_distance.items():
-         if indices:
-             avg = sum(indices) / len(indices)
-             avg_dice_results_for_k[d] = avg if not math.isnan(avg) else 0.0
-         else:
-             avg_dice_results_for_k[d] = None
+    for d, avg in _mean_dice_by_distance(dice, max_distance_to_check).items():
+         avg_dice_results_for_k[d] = avg if not math.isnan(avg) else 0.0
     # Restituisce anche i messaggi di warning/error raccolti dalla generazione
     return avg_dice_results_for_k, generation_error_messages
 
 # ================================================================
-# Funzione Orchestratore Test Monte Carlo (run_all_tests)
+# Motore Monte Carlo Parallelo / Parallel Monte Carlo Engine
 # ================================================================
-def run_all_tests(status_callback, num_monte_carlo_runs=30):
+# Stato per-processo impostato dall'initializer del pool
+_mc_bank = None
+_mc_blocks_summary = None
+_mc_num_tests = None
+_mc_recency = (DEFAULT_RECENCY_WEIGHTING, DEFAULT_RECENCY_HALF_LIFE)
+
+def _mc_init_worker(all_questions, blocks_summary, num_tests_per_sequence, recency=_mc_recency):
+    global _mc_bank, _mc_blocks_summary, _mc_num_tests, _mc_recency
+    _mc_bank = CompiledQuestionBank(all_questions) if all_questions is not None else None # Compilata una sola volta per processo
+    _mc_blocks_summary = blocks_summary
+    _mc_num_tests = num_tests_per_sequence
+    _mc_recency = recency
+
+def _mc_cell_rng(seed, run, k_block):
+    """Stream casuale indipendente per la cella (run, k): non dipende dallo scheduling."""
+    return random.Random(f"{seed}:{run}:{k_block}")
+
+def _mc_run_chunk(task):
     """
-    Orchestra l'analisi statistica di similarità (Dice) con Monte Carlo,
-    variando k_per_block da 1 a 11, usando la logica unificata (WRSwOR/Simple).
-    Salva i risultati medi finali in un file Excel formattato.
-    Restituisce lista di tuple (type, key, kwargs_dict) con messaggi sommari finali
-    e include un messaggio di successo/fallimento per l'Excel.
-    Chiama status_callback solo per errori critici e messaggi finali.
+    Esegue un gruppo di run Monte Carlo per un singolo k_block.
+    Restituisce un accumulatore parziale da unire nel processo principale:
+    {'k', 'stats': {d: [somma, somma_quadrati, n]}, 'fallback_runs', 'failed_runs', 'errors'}.
     """
-    monte_carlo_summary = []
-    results_accumulator = defaultdict(lambda: defaultdict(lambda: {'sum': 0.0, 'count': 0}))
-    sampling_method_used = {}
-    fallback_counts = defaultdict(int) # Conta fallback per k / Count fallbacks per k
+    seed, k_block, runs = task
+    partial = {'k': k_block, 'stats': {}, 'fallback_runs': 0, 'failed_runs': [], 'errors': []}
+    for run in runs:
+        avg_dice_by_distance, gen_errors = _run_single_unified_analysis_for_k(
+            k_block, _mc_blocks_summary, _mc_bank, _mc_num_tests, _mc_cell_rng(seed, run, k_block), *_mc_recency
+        )
+        partial['errors'].extend(msg for msg in gen_errors if msg[0] == 'error')
+        if any(m[1] == "BLOCK_FALLBACK_WARNING" for m in gen_errors):
+            partial['fallback_runs'] += 1
+        if avg_dice_by_distance is None:
+            partial['failed_runs'].append(run)
+            continue
+        for d, avg_d in avg_dice_by_distance.items():
+            if avg_d is None: continue
+            acc = partial['stats'].setdefault(d, [0.0, 0.0, 0])
+            acc[0] += avg_d; acc[1] += avg_d * avg_d; acc[2] += 1
+    return partial
+
+def _mc_tasks(seed, k_values, num_runs, num_workers):
+    """Divide le celle (run, k) in gruppi: pochi task per worker per contenere l'overhead."""
+    runs_per_task = max(1, math.ceil(num_runs * len(k_values) / (num_workers * 4)))
+    runs_per_task = min(runs_per_task, num_runs)
+    all_runs = list(range(1, num_runs + 1))
+    return [(seed, k_block, all_runs[i:i + runs_per_task])
+            for k_block in k_values for i in range(0, num_runs, runs_per_task)]
+
+def _confidence_half_width(acc):
+    """Semiampiezza dell'intervallo di confidenza al 95% (approssimazione normale) della media."""
+    total, total_sq, count = acc
+    if count < 2: return None
+    variance = max(0.0, (total_sq - total * total / count) / (count - 1))
+    return 1.96 * math.sqrt(variance / count)
 
-    # 1. Carica dati e info blocchi
-    all_questions, blocks_summary, error_key = _load_test_questions(status_callback)
-    if error_key:
-        monte_carlo_summary.append(("error", "TEST_ABORTED_LOAD_FAILED", {}))
-        return monte_carlo_summary, None
-
-    expected_blocks = 4
-    expected_q_per_block = 12
-    if not blocks_summary or len(blocks_summary) != expected_blocks:
-        monte_carlo_summary.append(("error", "TEST_WRONG_BLOCK_COUNT", {"found": len(blocks_summary) if blocks_summary else 0, "expected": expected_blocks}))
-        return monte_carlo_summary, None
-    for block in blocks_summary:
-        if block['count'] != expected_q_per_block:
-             monte_carlo_summary.append(("error", "TEST_WRONG_Q_PER_BLOCK_COUNT", {"block_id": block['block_id'], "found": block['count'], "expected": expected_q_per_block}))
-             return monte_carlo_summary, None
-
-    # 2. Definisci parametri
-    num_tests_per_sequence = 15
-    k_per_block_values = range(1, 12)
+# ================================================================
+# Analisi di Similarità Generica / Generic Similarity Analysis
+# ================================================================
+def _sampling_method_for_k(blocks_summary, k_block):
+    """Metodo usato da core_logic per k_block sui blocchi abbastanza grandi ("Mixed" se diverso tra blocchi)."""
+    methods = {block_sampling_method(block['count'], k_block) for block in blocks_summary if block['count'] >= k_block}
+    return methods.pop() if len(methods) == 1 else "Mixed"
+
+def run_similarity_analysis(all_questions, blocks_summary, status_callback, k_values, num_tests_per_sequence=15,
+                            num_monte_carlo_runs=30, seed=None, max_workers=None,
+                            recency_weighting=DEFAULT_RECENCY_WEIGHTING, recency_half_life=DEFAULT_RECENCY_HALF_LIFE):
+    """
+    Analisi Monte Carlo della similarità (Dice) per una banca qualsiasi: per ogni k in k_values
+    ogni blocco con almeno k domande contribuisce k domande a verifica, su sequenze di
+    num_tests_per_sequence verifiche. Le celle (run, k) sono distribuite su un ProcessPoolExecutor,
+    ognuna con il proprio stream casuale derivato dal seed: il risultato non dipende dal numero di worker.
+    Chiama status_callback con msg_type "progress" (MC_CHUNKS_COMPLETED) a ogni gruppo di run completato.
+    Restituisce un dizionario con:
+        - rows: righe {'k_per_block', 'distance', 'avg_dice', 'ci95_half_width', 'num_samples', 'method', 'fallback_runs'};
+        - methods, fallback_runs: per k;
+        - analytic: {k: {d: Dice esatto}} del modello a pesi uniformi (similarity_model);
+        - messages: warning/error della simulazione (e MC_ANALYTIC_CROSS_CHECK con recency_weighting="none").
+    """
+    if seed is None: seed = new_seed()
+    messages = []
+    results_accumulator = defaultdict(lambda: defaultdict(lambda: [0.0, 0.0, 0]))
+    fallback_counts = defaultdict(int) # Conta fallback per k / Count fallbacks per k
+    largest_block = max((block['count'] for block in blocks_summary), default=0)
+    for k_block in k_values:
+        if not 0 < k_block <= largest_block: messages.append(("warning", "STAT_TEST_K_INVALID", {"k": k_block}))
+    k_values = [k_block for k_block in k_values if 0 < k_block <= largest_block]
+    # Determina il metodo che verrà usato da core_logic
+    sampling_method_used = {k_block: _sampling_method_for_k(blocks_summary, k_block) for k_block in k_values}
     max_distance_overall = 0
-    progress_update_frequency = 5
-
-    # 3. Ciclo Monte Carlo Esterno
-    for run in range(1, num_monte_carlo_runs + 1):
-        # --- RIMOSSO MESSAGGIO PROGRESSO RUN ---
-
-        # Ciclo sui valori di k_per_block interno
-        for k_block in k_per_block_values:
-            # Determina il metodo che verrà usato da core_logic
-            method = "WRSwOR" if (k_block * 2 < expected_q_per_block) else "Simple Random"
-            if k_block not in sampling_method_used:
-                sampling_method_used[k_block] = method
-
-            # Esegui una singola analisi per questo k_block
-            avg_dice_by_distance, gen_errors = _run_single_unified_analysis_for_k(
-                k_block, blocks_summary, all_questions, num_tests_per_sequence
-            )
-            # Accumula errori critici dalla generazione
-            monte_carlo_summary.extend([msg for msg in gen_errors if msg[0] == 'error'])
-            # Conta i warning di fallback per questo k
-            if any(m[1] == "BLOCK_FALLBACK_WARNING" for m in gen_errors):
-                fallback_counts[k_block] += 1
-
-            if avg_dice_by_distance is not None:
-                for d, avg_d in avg_dice_by_distance.items():
-                    if avg_d is not None:
-                        results_accumulator[k_block][d]['sum'] += avg_d
-                        results_accumulator[k_block][d]['count'] += 1
-                        max_distance_overall = max(max_distance_overall, d)
-            else:
-                # Segnala fallimento per questo k in questa run (solo warning)
-                monte_carlo_summary.append(("warning", "MC_TEST_FAILED_FOR_KPB_IN_RUN", {"k_per_block": k_block, "run": run, "method": method}))
-
-    # 4. Calcola Medie Finali e Prepara Output per Excel
-    detailed_results_for_excel = []
+
+    # Celle Monte Carlo (run, k) distribuite sui worker
+    num_workers = max_workers or min(VALIDATION_MAX_WORKERS, os.cpu_count() or 1)
+    tasks = _mc_tasks(seed, k_values, num_monte_carlo_runs, num_workers) if k_values else []
+    init_args = (all_questions, blocks_summary, num_tests_per_sequence, (recency_weighting, recency_half_life))
+    partial_results = []
+    def collect_partial(partial):
+        partial_results.append(partial)
+        status_callback("progress", "MC_CHUNKS_COMPLETED", done=len(partial_results), total=len(tasks))
+    if num_workers == 1:
+        _mc_init_worker(*init_args)
+        try:
+            for task in tasks: collect_partial(_mc_run_chunk(task))
+        finally:
+            _mc_init_worker(None, None, None) # Non lascia la banca compilata nelle variabili del modulo
+    elif tasks:
+        # "spawn": processi nuovi anche da un thread del server Streamlit (fork con più thread può bloccarsi);
+        # tutto lo stato arriva ai worker tramite initargs
+        with ProcessPoolExecutor(max_workers=num_workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_mc_init_worker, initargs=init_args) as executor:
+            for partial in executor.map(_mc_run_chunk, tasks): collect_partial(partial)
+
+    # Unione degli accumulatori parziali (nell'ordine dei task: risultato deterministico)
+    for partial in partial_results:
+        k_block = partial['k']
+        # Accumula errori critici dalla generazione
+        messages.extend(partial['errors'])
+        fallback_counts[k_block] += partial['fallback_runs']
+        for run in partial['failed_runs']:
+            # Segnala fallimento per questo k in questa run (solo warning)
+            messages.append(("warning", "MC_TEST_FAILED_FOR_KPB_IN_RUN", {"k_per_block": k_block, "run": run, "method": sampling_method_used[k_block]}))
+        for d, (total, total_sq, count) in partial['stats'].items():
+            acc = results_accumulator[k_block][d]
+            acc[0] += total; acc[1] += total_sq; acc[2] += count
+            max_distance_overall = max(max_distance_overall, d)
+
+    # Medie finali per (k, distanza)
+    rows = []
     sorted_k = sorted(results_accumulator.keys())
     if not max_distance_overall and any(results_accumulator.values()): max_distance_overall = 1
 
     for k_block in sorted_k:
         for d in range(1, max_distance_overall + 1):
             data = results_accumulator[k_block].get(d)
-            final_avg, num_samples = (data['sum'] / data['count'], data['count']) if data and data['count'] > 0 else (None, 0)
-            detailed_results_for_excel.append({
+            final_avg, num_samples = (data[0] / data[2], data[2]) if data and data[2] > 0 else (None, 0)
+            rows.append({
                 'k_per_block': k_block,
                 'distance': d,
                 'avg_dice': final_avg,
+                'ci95_half_width': _confidence_half_width(data) if data else None,
                 'num_samples': num_samples,
                 'method': sampling_method_used.get(k_block, 'Unknown'),
                 'fallback_runs': fallback_counts.get(k_block, 0) # Aggiunge conteggio fallback
             })
 
+    # Valori esatti del modello analitico (pesi uniformi): con "none" il Monte Carlo ne è la verifica incrociata
+    analytic_results = {k_block: expected_dice_by_distance([(block['count'], k_block) for block in blocks_summary
+                                                            if block['count'] >= k_block], max_distance_overall)
+                        for k_block in sorted_k}
+    if recency_weighting == "none":
+        deviations = [(abs(row['avg_dice'] - analytic_results[row['k_per_block']][row['distance']]), row['ci95_half_width'])
+                      for row in rows if row['avg_dice'] is not None and row['k_per_block'] in analytic_results]
+        if deviations:
+            messages.append(("info", "MC_ANALYTIC_CROSS_CHECK", {
+                "max_deviation": f"{max(deviation for deviation, _ in deviations):.4f}",
+                "outside_ci": sum(1 for deviation, half_width in deviations if half_width is not None and deviation > half_width),
+                "cells": len(deviations)}))
+
+    return {'rows': rows, 'methods': sampling_method_used, 'fallback_runs': dict(fallback_counts),
+            'analytic': analytic_results, 'messages': messages}
+
+# ================================================================
+# Funzione Orchestratore Test Monte Carlo (run_all_tests)
+# ================================================================
+def run_all_tests(status_callback, num_monte_carlo_runs=30, seed=None, max_workers=None, output_excel_file=OUTPUT_EXCEL_FILE,
+                  recency_weighting=DEFAULT_RECENCY_WEIGHTING, recency_half_life=DEFAULT_RECENCY_HALF_LIFE,
+                  test_file=TEST_EXCEL_FILE, num_tests_per_sequence=15, k_per_block_values=None):
+    """
+    Orchestra l'analisi statistica di similarità (Dice) con Monte Carlo (run_similarity_analysis)
+    sulla banca test_file, usando la logica unificata (WRSwOR/Simple).
+    Salva i risultati medi finali (e gli intervalli di confidenza al 95%) in un file Excel formattato.
+    Restituisce lista di tuple (type, key, kwargs_dict) con messaggi sommari finali
+    e include un messaggio di successo/fallimento per l'Excel.
+    Chiama status_callback per errori critici e, con msg_type "progress" (MC_CHUNKS_COMPLETED),
+    a ogni gruppo di run Monte Carlo completato.
+    seed: rende riproducibile l'intera simulazione (None = seed casuale).
+    max_workers: processi del pool (None = VALIDATION_MAX_WORKERS, al più il n. di CPU; 1 = esecuzione nel processo corrente).
+    output_excel_file: percorso del file Excel (es. un file temporaneo per ogni job in background).
+    recency_weighting, recency_half_life: pesatura usata dalla simulazione (come in generate_all_tests_data).
+    test_file: banca da analizzare; solo il file predefinito (4 blocchi da 12) viene verificato nella forma.
+    num_tests_per_sequence: verifiche per sequenza; k_per_block_values: valori di k
+    (None = da 1 alla dimensione del blocco più piccolo meno 1, cioè 1..11 per il file predefinito).
+    Il foglio 'Analytic_Uniform' riporta i valori esatti di similarity_model (pesi uniformi, "none");
+    con recency_weighting="none" il Monte Carlo ne è la verifica incrociata (messaggio MC_ANALYTIC_CROSS_CHECK).
+    """
+    monte_carlo_summary = []
+
+    # 1. Carica dati e info blocchi
+    all_questions, blocks_summary, error_key = _load_test_questions(status_callback, test_file)
+    if error_key:
+        monte_carlo_summary.append(("error", "TEST_ABORTED_LOAD_FAILED", {}))
+        return monte_carlo_summary, None
+
+    if test_file == TEST_EXCEL_FILE:
+        expected_blocks = 4
+        expected_q_per_block = 12
+        if not blocks_summary or len(blocks_summary) != expected_blocks:
+            monte_carlo_summary.append(("error", "TEST_WRONG_BLOCK_COUNT", {"found": len(blocks_summary) if blocks_summary else 0, "expected": expected_blocks}))
+            return monte_carlo_summary, None
+        for block in blocks_summary:
+            if block['count'] != expected_q_per_block:
+                 monte_carlo_summary.append(("error", "TEST_WRONG_Q_PER_BLOCK_COUNT", {"block_id": block['block_id'], "found": block['count'], "expected": expected_q_per_block}))
+                 return monte_carlo_summary, None
+
+    # 2. Definisci parametri
+    block_sizes = sorted({block['count'] for block in blocks_summary})
+    if k_per_block_values is None: k_per_block_values = range(1, max(2, block_sizes[0]))
+    # Etichette "k su n" se tutti i blocchi hanno la stessa dimensione
+    if len(block_sizes) == 1:
+        k_label, index_name = (lambda k: f"{k} su {block_sizes[0]}"), f"k / n (n={block_sizes[0]} per blocco)"
+    else:
+        k_label, index_name = (lambda k: f"{k}"), f"k per blocco (n = {', '.join(map(str, block_sizes))})"
+
+    # 3-4. Simulazione Monte Carlo e medie per (k, distanza)
+    analysis = run_similarity_analysis(all_questions, blocks_summary, status_callback, list(k_per_block_values),
+                                       num_tests_per_sequence, num_monte_carlo_runs, seed, max_workers,
+                                       recency_weighting, recency_half_life)
+    monte_carlo_summary.extend(analysis['messages'])
+    detailed_results_for_excel = analysis['rows']
+    sampling_method_used, fallback_counts, analytic_results = analysis['methods'], analysis['fallback_runs'], analysis['analytic']
+
     # 5. Crea e salva il file Excel
     excel_created = False
     excel_filename = None
-    if detailed_results_for_excel:
+    if any(row['avg_dice'] is not None for row in detailed_results_for_excel):
         try:
             df_results = pd.DataFrame(detailed_results_for_excel)
             # Pivot per avere k vs distanza
@@ -248,8 +355,8 @@ def run_all_tests(status_callback, num_monte_carlo_runs=30):
             df_pivot = df_pivot.sort_index(ascending=True)
 
             # 2. Formatta l'indice in stringa DOPO l'ordinamento
-            df_pivot.index = [f"{k} su {expected_q_per_block}" for k in df_pivot.index] # <-- FORMATO TESTUALE
-            df_pivot.index.name = f"k / n (n={expected_q_per_block} per blocco)"
+            df_pivot.index = [k_label(k) for k in df_pivot.index] # <-- FORMATO TESTUALE
+            df_pivot.index.name = index_name
             # --- FINE CORREZIONE ---
 
             # Ordina e formatta colonne distanza
@@ -258,14 +365,30 @@ def run_all_tests(status_callback, num_monte_carlo_runs=30):
             df_pivot = df_pivot.reindex(distance_cols + other_cols, axis=1)
             df_pivot.columns = [f"Distanza {col}" if isinstance(col, int) else col for col in df_pivot.columns]
 
-            df_pivot.to_excel(OUTPUT_EXCEL_FILE, sheet_name='Similarity_Analysis')
-            monte_carlo_summary.append(("success", "STAT_TEST_EXCEL_CREATED", {"filename": OUTPUT_EXCEL_FILE}))
+            # Foglio con le semiampiezze degli intervalli di confidenza al 95% (stesso layout)
+            df_ci = pd.pivot_table(df_results, values='ci95_half_width', index='k_per_block', columns='distance').sort_index()
+            df_ci.index = [k_label(k) for k in df_ci.index]
+            df_ci.index.name = df_pivot.index.name
+            df_ci.columns = [f"Distanza {col} (±IC95%)" for col in df_ci.columns]
+
+            # Foglio con i valori esatti del modello analitico (recency_weighting="none")
+            df_analytic = pd.DataFrame.from_dict(analytic_results, orient='index').sort_index()
+            df_analytic.index = [k_label(k) for k in df_analytic.index]
+            df_analytic.index.name = df_pivot.index.name
+            df_analytic.columns = [f"Distanza {col} (esatto, pesi uniformi)" for col in df_analytic.columns]
+
+            with pd.ExcelWriter(output_excel_file) as writer:
+                df_pivot.to_excel(writer, sheet_name='Similarity_Analysis')
+                df_ci.to_excel(writer, sheet_name='Confidence_95')
+                df_analytic.to_excel(writer, sheet_name='Analytic_Uniform')
+            monte_carlo_summary.append(("success", "STAT_TEST_EXCEL_CREATED", {"filename": os.path.basename(output_excel_file)}))
             excel_created = True
-            excel_filename = OUTPUT_EXCEL_FILE
+            excel_filename = output_excel_file
         except Exception as e:
-            monte_carlo_summary.append(("error", "STAT_TEST_EXCEL_SAVE_ERROR", {"filename": OUTPUT_EXCEL_FILE, "error": str(e)}))
-    elif any(results_accumulator.values()):
-         monte_carlo_summary.append(("warning", "STAT_TEST_NO_DATA_FOR_EXCEL", {}))
+            monte_carlo_summary.append(("error", "STAT_TEST_EXCEL_SAVE_ERROR", {"filename": os.path.basename(output_excel_file), "error": str(e)}))
+    elif sampling_method_used:
+        # Simulazione eseguita (almeno un k valido) ma nessuna media di Dice: nessun Excel da scrivere
+        monte_carlo_summary.append(("warning", "STAT_TEST_NO_DATA_FOR_EXCEL", {}))
 
     # 6. Messaggio finale completamento
     monte_carlo_summary.append(("info", "MC_TEST_ALL_COMPLETE", {}))
@@ -0,0 +1,6 @@
+# tests/conftest.py
+# I moduli dell'app sono nella radice del repository (layout piatto): la rende importabile anche con `pytest`.
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,37 @@
+# tests/test_file_handler.py
+import io
+
+from file_handler import _cell_to_str, load_questions_from_excel
+
+def _nop_callback(*args, **kwargs): pass
+
+def _load(data, name):
+    stream = io.BytesIO(data)
+    stream.name = name
+    all_questions, blocks_summary, error_key = load_questions_from_excel(stream, _nop_callback, cache=None)
+    assert error_key is None
+    return all_questions
+
+def test_cell_to_str():
+    assert _cell_to_str(None) == ''
+    assert _cell_to_str(float('nan')) == ''
+    assert _cell_to_str(3.0) == '3'
+    assert _cell_to_str(2.5) == '2.5'
+    assert _cell_to_str(7) == '7'
+
+def test_integer_answers_in_csv_with_blank_rows_stay_integers():
+    # Colonne numeriche con righe vuote di separazione: il vecchio parser pandas dava '1.0', '2.0', ...
+    data = "Quanto fa 0+1?,1,2,3\nQuanto fa 1+1?,2,3,4\n,,,\nQuanto fa 2+1?,3,4,5\n".encode("utf-8")
+    all_questions = _load(data, "banca.csv")
+    assert [q['answers'] for q in all_questions] == [['1', '2', '3'], ['2', '3', '4'], ['3', '4', '5']]
+
+def test_integer_answers_in_xlsx_with_blank_rows_stay_integers():
+    from openpyxl import Workbook
+    workbook = Workbook()
+    sheet = workbook.active
+    for row in (["Quanto fa 0+1?", 1, 2.0, 3], [None, None, None, None], ["Metà di 5?", 2.5, 3, 2]):
+        sheet.append(row)
+    output = io.BytesIO()
+    workbook.save(output)
+    all_questions = _load(output.getvalue(), "banca.xlsx")
+    assert [q['answers'] for q in all_questions] == [['1', '2', '3'], ['2.5', '3', '2']]
@@ -0,0 +1,55 @@
+# tests/test_pdf_generator.py
+from concurrent.futures import Future
+
+import pytest
+
+import pdf_generator
+from instrumentation import NULL_PROFILER
+
+@pytest.fixture(autouse=True)
+def empty_copy_cache():
+    pdf_generator._COPY_RENDER_CACHE.clear()
+    yield
+    pdf_generator._COPY_RENDER_CACHE.clear()
+
+class _RecordingExecutor:
+    """Sostituto di ProcessPoolExecutor: future già completate, registra le copie inviate e non ancora restituite."""
+    def __init__(self, yielded, max_workers):
+        self.yielded, self.submitted, self.max_in_flight = yielded, [], 0
+
+    def submit(self, fn, copy_html):
+        self.submitted.append(copy_html)
+        self.max_in_flight = max(self.max_in_flight, len(self.submitted) - len(self.yielded))
+        future = Future()
+        future.set_result(copy_html.encode("utf-8"))
+        return future
+
+    def shutdown(self, cancel_futures=False): pass
+
+def _run_pool(monkeypatch, keyed_copies, max_workers):
+    yielded, executors = [], []
+    def make_executor(max_workers):
+        executors.append(_RecordingExecutor(yielded, max_workers))
+        return executors[-1]
+    monkeypatch.setattr(pdf_generator, "ProcessPoolExecutor", make_executor)
+    results = []
+    for copy_number, pdf_bytes in pdf_generator._iter_copy_pdfs(keyed_copies, max_workers, NULL_PROFILER):
+        yielded.append(copy_number); results.append((copy_number, pdf_bytes))
+    return results, executors[0]
+
+def test_pool_keeps_a_bounded_window_of_copies_in_flight(monkeypatch):
+    keyed_copies = [(n, f"copia {n}", f"hash {n}") for n in range(1, 201)]
+    results, executor = _run_pool(monkeypatch, keyed_copies, max_workers=3)
+    assert [copy_number for copy_number, _ in results] == list(range(1, 201))
+    assert results[41] == (42, b"copia 42")
+    assert len(executor.submitted) == 200
+    assert executor.max_in_flight == pdf_generator.RENDER_IN_FLIGHT_PER_WORKER * 3
+
+def test_pool_skips_cached_copies(monkeypatch):
+    keyed_copies = [(n, f"copia {n}", f"hash {n}") for n in range(1, 21)]
+    for n in range(1, 21, 2): pdf_generator._COPY_RENDER_CACHE.put(f"hash {n}", b"in cache")
+    results, executor = _run_pool(monkeypatch, keyed_copies, max_workers=2)
+    assert [copy_number for copy_number, _ in results] == list(range(1, 21))
+    assert executor.submitted == [f"copia {n}" for n in range(2, 21, 2)]
+    assert all(pdf_bytes == b"in cache" for copy_number, pdf_bytes in results if copy_number % 2)
+    assert executor.max_in_flight <= pdf_generator.RENDER_IN_FLIGHT_PER_WORKER * 2
@@ -0,0 +1,26 @@
+# tests/test_question_bank.py
+import pytest
+
+from question_bank import QuestionBank
+
+def test_block_ranges_of_contiguous_blocks():
+    bank = QuestionBank()
+    for index, block_id in enumerate([1, 1, 2, 2, 2, 3]):
+        bank.append(f"Domanda {index}", ["A", "B"], index, 'Scelta Multipla', block_id)
+    assert bank.block_ranges == {1: (0, 2), 2: (2, 5), 3: (5, 6)}
+    assert list(bank.block_original_indices(2)) == [2, 3, 4]
+
+def test_append_rejects_a_block_that_resumes_after_another():
+    bank = QuestionBank()
+    bank.append("Domanda 0", [], 0, 'Aperte', 1)
+    bank.append("Domanda 1", [], 1, 'Aperte', 2)
+    with pytest.raises(ValueError):
+        bank.append("Domanda 2", [], 2, 'Aperte', 1)
+    assert len(bank) == 2 and bank.block_ranges == {1: (0, 1), 2: (1, 2)}
+
+def test_from_questions_groups_interleaved_blocks():
+    questions = [{'question': f"Domanda {i}", 'answers': [], 'original_index': i, 'type': 'Aperte', 'block_id': block_id}
+                 for i, block_id in enumerate([1, 2, 1, 2])]
+    bank = QuestionBank.from_questions(questions)
+    assert list(bank.block_original_indices(1)) == [0, 2]
+    assert list(bank.block_original_indices(2)) == [1, 3]